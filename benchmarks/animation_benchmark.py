@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+LED effect timing: one thread per effect (the old LED.fade_on) against the animation engine.
+
+  python3 benchmarks/animation_benchmark.py [leds] [duration]
+
+Fades every LED on at once and reports how late each brightness write was against its ideal
+time, peak thread count, and process CPU time. LEDs are plain objects, so no GPIO is needed.
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.animation
+
+
+class FakeLED:
+	def __init__(self, start_ts, steps, duration):
+		self._value = 0.0
+		self._start_ts = start_ts
+		self._steps = steps
+		self._step_time = duration / steps
+		self.writes = 0
+		self.late = []
+
+	@property
+	def value(self):
+		return self._value
+
+	@value.setter
+	def value(self, value):
+		# Brightness n/steps is due at (n-1) steps after the start
+		ideal = self._start_ts[0] + (round(value * self._steps) - 1) * self._step_time
+		self.late.append(time.monotonic() - ideal)
+		self._value = value
+		self.writes += 1
+
+
+def legacy_fade_on(led, duration):
+	increment = 32
+	on_duration = float(duration) / increment
+	for i in range(increment):
+		led.value = (i+1) / increment
+		time.sleep(on_duration)
+
+
+def summarize(name, leds, threads, cpu, elapsed):
+	late = sorted(item for led in leds for item in led.late if item >= 0)
+	writes = sum(led.writes for led in leds)
+	print("{:<10} writes {:>6}  late p50 {:>6.2f}ms  p99 {:>6.2f}ms  max {:>6.2f}ms  threads {:>3}  cpu {:>6.1f}ms  wall {:>6.1f}ms".format(
+		name, writes, late[len(late) // 2] * 1000, late[int(len(late) * .99)] * 1000, late[-1] * 1000, threads, cpu * 1000, elapsed * 1000))
+
+
+def run_legacy(count, duration):
+	start_ts = [0.0]
+	leds = [FakeLED(start_ts, 32, duration) for i in range(count)]
+	cpu = time.process_time()
+	start_ts[0] = time.monotonic()
+	threads = [threading.Thread(target=legacy_fade_on, args=(led, duration)) for led in leds]
+	for thread in threads:
+		thread.start()
+	peak = threading.active_count()
+	for thread in threads:
+		thread.join()
+	summarize('threads', leds, peak, time.process_time() - cpu, time.monotonic() - start_ts[0])
+
+
+def run_engine(count, duration):
+	animator = pi_control.animation.Animator()
+	frames = pi_control.animation.fade_on(duration, animator.fps)
+	start_ts = [0.0]
+	leds = [FakeLED(start_ts, len(frames), duration) for i in range(count)]
+	done = threading.Semaphore(0)
+	cpu = time.process_time()
+	start_ts[0] = time.monotonic()
+	for led in leds:
+		animator.start(led, frames, 1.0, done.release)
+	peak = threading.active_count()
+	for led in leds:
+		done.acquire()
+	elapsed = time.monotonic() - start_ts[0]
+	animator.stop()
+	summarize('engine', leds, peak, time.process_time() - cpu, elapsed)
+	stats = animator.stats
+	print("engine frames {}  frame jitter mean {:.2f}ms  max {:.2f}ms  engine cpu {:.1f}ms".format(
+		stats['frames'], stats['jitter_mean'] * 1000, stats['jitter_max'] * 1000, stats['cpu'] * 1000))
+
+
+def main():
+	count = 24
+	duration = 1.0
+	if len(sys.argv) > 1:
+		count = int(sys.argv[1])
+	if len(sys.argv) > 2:
+		duration = float(sys.argv[2])
+	run_legacy(count, duration)
+	run_engine(count, duration)
+
+
+if __name__ == '__main__':
+	main()
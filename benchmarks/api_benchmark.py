@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+"""
+Cost of streaming events to control API subscribers, on simulated hardware.
+
+  python3 benchmarks/api_benchmark.py [-s subscribers] [-r rate] [-d seconds] [-o results.json]
+
+Builds a Panel of buttons switching LEDs with the control API on a Unix socket, connects each
+number of subscribers from a separate process, and toggles the buttons at the rate. Reports
+how long each input change takes on the caller's thread, which is what a GPIO callback pays,
+and how long events take to reach subscribers, with any they dropped.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.panel
+import pi_control.ui
+
+from latency_benchmark import git_commit, summarize
+
+SUBSCRIBERS = [0, 10, 100, 500]
+BUTTONS = 4
+DRAIN_SECONDS = 0.5
+
+
+def get_devices(socket_path):
+	devices = { "panel": { "queue_size": 256, "snapshot": False, "api": { "socket": socket_path } }, "outputs": {}, "inputs": {} }
+	for index in range(BUTTONS):
+		devices['outputs']['led_{}'.format(index)] = { "type": "led", "gpio_pin": 4 + BUTTONS + index }
+		devices['inputs']['button_{}'.format(index)] = {
+			"type": "button",
+			"gpio_pin": 4 + index,
+			"debounce": 0,
+			"hold_time": 0,
+			"actions": {
+				"pressed": [ { "name": "led_{}".format(index), "action": "on" } ],
+				"released": [ { "name": "led_{}".format(index), "action": "off" } ]
+			}
+		}
+	return devices
+
+
+"""
+Subscriber process. Connects count clients, tells the parent when they're subscribed, and
+reads until the parent says stop, then sends back delivery latency and counts. One client
+parses every event for latency; the rest only count lines, so this process keeps up.
+"""
+def run_subscribers(socket_path, count, conn):
+	latency = []
+	counts = { "events": 0, "dropped": 0 }
+
+	async def connect():
+		reader, writer = await asyncio.open_unix_connection(socket_path, limit=1 << 20)
+		writer.write(b'{"cmd":"subscribe","events":["status","result"]}\n')
+		await writer.drain()
+		await reader.readline()
+		# The writer is kept, since dropping it closes the connection
+		return reader, writer
+
+	async def probe(reader):
+		while True:
+			line = await reader.readline()
+			if not line:
+				return
+			now = time.monotonic()
+			event = json.loads(line)
+			if event.get('event') == 'dropped':
+				counts['dropped'] += event['count']
+			elif event.get('event') == 'status':
+				latency.append(now - event['ts'])
+
+	async def drain(reader):
+		while True:
+			data = await reader.read(1 << 16)
+			if not data:
+				return
+			counts['events'] += data.count(b'\n')
+			if b'"dropped"' in data:
+				for line in data.split(b'\n'):
+					if line.startswith(b'{"event":"dropped"'):
+						counts['dropped'] += json.loads(line)['count']
+
+	async def main():
+		loop = asyncio.get_event_loop()
+		connections = []
+		for start in range(0, count, 50):
+			connections.extend(await asyncio.gather(*[connect() for index in range(start, min(count, start + 50))]))
+		readers = [reader for reader, writer in connections]
+		tasks = [asyncio.ensure_future(probe(readers[0]))] + [asyncio.ensure_future(drain(reader)) for reader in readers[1:]]
+		conn.send('ready')
+		await loop.run_in_executor(None, conn.recv)
+		for task in tasks:
+			task.cancel()
+		await asyncio.gather(*tasks, return_exceptions=True)
+
+	asyncio.get_event_loop().run_until_complete(main())
+	conn.send({ "latency": summarize(latency), "events": counts['events'], "dropped": counts['dropped'] })
+	conn.close()
+
+
+def run_step(panel, socket_path, subscribers, rate, duration):
+	context = multiprocessing.get_context('spawn')
+	process = None
+	conn = None
+	if subscribers:
+		conn, child_conn = context.Pipe()
+		process = context.Process(target=run_subscribers, args=(socket_path, subscribers, child_conn), daemon=True)
+		process.start()
+		child_conn.close()
+		if not conn.poll(60) or conn.recv() != 'ready':
+			raise RuntimeError("Subscribers didn't connect")
+
+	buttons = list(panel.inputs.values())
+	statuses = {}
+	calls = []
+	interval = 1.0 / rate
+	start = time.monotonic()
+	injected = 0
+	while time.monotonic() - start < duration:
+		due = start + injected * interval
+		now = time.monotonic()
+		if due > now:
+			time.sleep(due - now)
+		button = random.choice(buttons)
+		statuses[button] = 'released' if statuses.get(button) == 'pressed' else 'pressed'
+		call_start = time.perf_counter()
+		button.inject(statuses[button])
+		calls.append(time.perf_counter() - call_start)
+		injected += 1
+	time.sleep(DRAIN_SECONDS)
+
+	result = { "subscribers": subscribers, "injected": injected, "inject": summarize(calls) }
+	if process:
+		conn.send('stop')
+		report = conn.recv() if conn.poll(30) else {}
+		process.join(10)
+		result['delivery'] = report.get('latency', { "count": 0 })
+		result['events_per_subscriber'] = report.get('events', 0) / max(1, subscribers - 1)
+		result['dropped'] = report.get('dropped', 0)
+	return result
+
+
+def main():
+	ui = pi_control.ui.Interface(usage_message="""
+Usage:
+  benchmarks/api_benchmark.py [options]
+
+  Options:
+    -s,  --subscribers    Comma separated subscriber counts; defaults to 0,10,100,500
+    -r,  --rate           Input changes per second; defaults to 1000
+    -d,  --duration       Seconds per step; defaults to 2
+    -o,  --output         Also write the JSON results to this file
+    -h,  --help           This help text
+""")
+	args, opts = ui.get_options({
+		"options": [ {
+			"short": "s",
+			"long": "subscribers",
+			"type": "input"
+		}, {
+			"short": "r",
+			"long": "rate",
+			"type": "input"
+		}, {
+			"short": "d",
+			"long": "duration",
+			"type": "input"
+		}, {
+			"short": "o",
+			"long": "output",
+			"type": "input"
+		} ]
+	})
+	steps = [int(count) for count in opts['subscribers'].split(',')] if opts['subscribers'] else SUBSCRIBERS
+	rate = int(opts['rate'] or 1000)
+	duration = float(opts['duration'] or 2.0)
+
+	random.seed(42)
+	socket_dir = tempfile.mkdtemp(prefix='api_bench_')
+	socket_path = os.path.join(socket_dir, 'api.sock')
+	panel = pi_control.panel.Panel('api_bench', get_devices(socket_path), log_level=3, backend='simulated')
+	results = []
+	print("{:>11} {:>11} {:>11} {:>11} {:>13} {:>13} {:>9}".format('subscribers', 'inject_p50', 'inject_p99', 'inject_max', 'delivery_p50', 'delivery_p99', 'dropped'))
+	try:
+		for subscribers in steps:
+			result = run_step(panel, socket_path, subscribers, rate, duration)
+			results.append(result)
+			inject = result['inject']
+			delivery = result.get('delivery', { "count": 0 })
+			print("{:>11} {:>9.1f}us {:>9.1f}us {:>9.1f}us {:>13} {:>13} {:>9}".format(
+				subscribers, inject['p50_ms'] * 1000, inject['p99_ms'] * 1000, inject['max_ms'] * 1000,
+				"{:.2f}ms".format(delivery['p50_ms']) if delivery['count'] else '-',
+				"{:.2f}ms".format(delivery['p99_ms']) if delivery['count'] else '-',
+				result.get('dropped', '-')
+			))
+	finally:
+		panel.stop()
+		os.rmdir(socket_dir)
+
+	if opts['output']:
+		with open(opts['output'], 'w') as file:
+			json.dump({
+				"commit": git_commit(),
+				"python": platform.python_version(),
+				"rate": rate,
+				"duration": duration,
+				"steps": results
+			}, file, indent=2)
+			file.write("\n")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+Time-to-first-sample for the Sound output's audio engine.
+
+  python3 benchmarks/audio_benchmark.py [plays]
+
+Plays a generated WAV through a real-time null sink (paced like a sound card, no hardware
+needed) with some plays overlapping, and reports the time from play() to the first block
+containing the sound being handed to the sink. If aplay is installed, the old per-play
+process start is timed for comparison.
+"""
+
+import math
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.audio
+
+
+def write_tone(path, seconds=0.25, rate=22050):
+	with wave.open(path, 'wb') as file:
+		file.setnchannels(1)
+		file.setsampwidth(2)
+		file.setframerate(rate)
+		frames = bytearray()
+		for i in range(int(seconds * rate)):
+			frames += struct.pack('<h', int(8000 * math.sin(2 * math.pi * 440 * i / rate)))
+		file.writeframes(bytes(frames))
+
+
+def main():
+	plays = 200
+	if len(sys.argv) > 1:
+		plays = int(sys.argv[1])
+
+	directory = tempfile.mkdtemp()
+	try:
+		path = os.path.join(directory, 'tone.wav')
+		write_tone(path)
+
+		engine = pi_control.audio.AudioEngine(pi_control.audio.NullSink(realtime=True))
+		start = time.perf_counter()
+		engine.load(path)
+		print("decode and cache: {:.2f}ms".format((time.perf_counter() - start) * 1000))
+
+		for i in range(plays):
+			engine.play(path)
+			time.sleep(0.005 if i % 4 else 0.05)
+		time.sleep(0.3)
+		engine.stop()
+
+		latency = engine.latency
+		print("engine plays:     {}".format(latency['count']))
+		for key in ('min', 'p50', 'max'):
+			print("engine {:<4}:      {:.2f}ms".format(key, latency[key] * 1000))
+
+		if shutil.which('aplay'):
+			times = []
+			for i in range(min(plays, 10)):
+				start = time.perf_counter()
+				subprocess.run(['aplay', '-q', '--duration=0', path], stderr=subprocess.DEVNULL)
+				times.append(time.perf_counter() - start)
+			times.sort()
+			print("aplay process p50: {:.2f}ms".format(times[len(times) // 2] * 1000))
+	finally:
+		shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+	main()
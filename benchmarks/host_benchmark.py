@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+
+"""
+Several panels in one process vs spread over worker processes, on simulated hardware.
+
+  python3 benchmarks/host_benchmark.py [-m modes] [-l light_panels] [-r rate] [-d seconds] [-w workers] [-o results.json]
+
+Runs one heavy panel (buttons firing haptic effects, which hold a worker while the I2C bus
+flushes) and some light panels (buttons switching LEDs) under pi_control.host.Host in each mode:
+  shared - every panel in one process, on the host's shared workers, scheduler, and buses
+  sharded - the heavy panel in its own worker process, the light panels together
+  isolated - every panel in its own process, like one daemon per panel
+The heavy panel is stormed at the rate while each light panel gets a steady trickle, and every
+process reports its panels' input to result latency, thread count, and memory. Startup is the
+time for Host() to return with every process running.
+"""
+
+import functools
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.host
+import pi_control.ui
+
+from latency_benchmark import git_commit, summarize
+from storm_benchmark import rss_kb
+
+MODES = ['shared', 'sharded', 'isolated']
+LIGHT_PANELS = 3
+LIGHT_RATE = 20
+HEAVY_RATE = 2000
+# Pins run out past 4 light panels; GPIO 2 and 3 are left for I2C
+HEAVY_BUTTONS = 6
+LIGHT_BUTTONS = 2
+MAX_LIGHT_PANELS = 4
+HEAVY_PIN = 4
+LIGHT_PIN = HEAVY_PIN + HEAVY_BUTTONS
+DRAIN_SECONDS = 1.0
+
+
+def heavy_panel(pin):
+	devices = { "panel": { "queue_size": 256, "snapshot": False }, "outputs": {}, "inputs": {} }
+	for index in range(HEAVY_BUTTONS):
+		devices['outputs']['buzzer_{}'.format(index)] = { "type": "haptic", "source_bus": "i2c", "motor": "lra", "effect": 1 }
+		devices['inputs']['button_{}'.format(index)] = {
+			"type": "button",
+			"gpio_pin": pin + index,
+			"debounce": 0,
+			"hold_time": 0,
+			"actions": {
+				"pressed": [ { "name": "buzzer_{}".format(index), "effect": 1 } ],
+				"released": [ { "name": "buzzer_{}".format(index), "effect": 2 } ]
+			}
+		}
+	return devices
+
+
+def light_panel(pin):
+	devices = { "panel": { "queue_size": 256, "snapshot": False }, "outputs": {}, "inputs": {} }
+	for index in range(LIGHT_BUTTONS):
+		devices['outputs']['led_{}'.format(index)] = { "type": "led", "gpio_pin": pin + LIGHT_BUTTONS + index }
+		devices['inputs']['button_{}'.format(index)] = {
+			"type": "button",
+			"gpio_pin": pin + index,
+			"debounce": 0,
+			"hold_time": 0,
+			"actions": {
+				"pressed": [ { "name": "led_{}".format(index), "action": "on" } ],
+				"released": [ { "name": "led_{}".format(index), "action": "off" } ]
+			}
+		}
+	return devices
+
+
+def get_panels(mode, light_panels):
+	panels = { "heavy": { "config": heavy_panel(HEAVY_PIN) } }
+	for index in range(light_panels):
+		panels['light_{}'.format(index + 1)] = { "config": light_panel(LIGHT_PIN + index * LIGHT_BUTTONS * 2) }
+	for name, spec in panels.items():
+		if mode == 'isolated':
+			spec['process'] = name
+		elif mode == 'sharded' and name == 'heavy':
+			spec['process'] = 'heavy'
+	return panels
+
+
+class Recorder:
+	"""
+	Panel observer that times each action from its input change to its result.
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._pending = {}
+		self._status_ts = None
+		self.latency = []
+		self.outcomes = {}
+
+	def __call__(self, kind, ts, fields):
+		with self._lock:
+			if kind == 'status':
+				self._status_ts = ts
+			elif kind == 'dispatch':
+				self._pending[fields[0]] = self._status_ts or ts
+			elif kind == 'result':
+				outcome = fields[2]
+				self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+				start = self._pending.pop(fields[0], None)
+				if outcome == 'ok' and start is not None:
+					self.latency.append(ts - start)
+
+
+def inject_load(panel, rate, duration, recorder):
+	buttons = list(panel.inputs.values())
+	statuses = {}
+	interval = 1.0 / rate
+	start = time.monotonic()
+	injected = 0
+	while True:
+		now = time.monotonic()
+		if now - start >= duration:
+			break
+		due = start + injected * interval
+		if due > now:
+			time.sleep(due - now)
+		button = random.choice(buttons)
+		statuses[button] = 'released' if statuses.get(button) == 'pressed' else 'pressed'
+		button.inject(statuses[button])
+		injected += 1
+	return injected, time.monotonic() - start
+
+
+"""
+Host setup hook, run in every process once its panels are up. Waits for the go file, loads
+each panel here, and writes this process's results to result_dir/<pid>.json.
+"""
+def start_load(params, host):
+	def run():
+		go_path = os.path.join(params['result_dir'], 'go')
+		while not os.path.exists(go_path):
+			time.sleep(0.01)
+		recorders = {}
+		threads = []
+		counts = {}
+		for name, panel in host.panels.items():
+			recorders[name] = Recorder()
+			panel.add_observer(recorders[name])
+			rate = params['heavy_rate'] if name == 'heavy' else params['light_rate']
+
+			def load(name=name, panel=panel, rate=rate):
+				counts[name] = inject_load(panel, rate, params['duration'], recorders[name])
+			threads.append(threading.Thread(target=load, name='load-' + name))
+		for thread in threads:
+			thread.start()
+		time.sleep(params['duration'] / 2)
+		peak_threads = threading.active_count()
+		for thread in threads:
+			thread.join()
+		time.sleep(DRAIN_SECONDS)
+
+		result = { "pid": os.getpid(), "threads": peak_threads, "rss_kb": rss_kb(), "panels": {} }
+		for name, recorder in recorders.items():
+			injected, seconds = counts[name]
+			with recorder._lock:
+				result['panels'][name] = {
+					"injected": injected,
+					"rate": injected / seconds,
+					"outcomes": dict(recorder.outcomes),
+					"latency": summarize(recorder.latency)
+				}
+		path = os.path.join(params['result_dir'], "{}.json".format(os.getpid()))
+		with open(path + '.tmp', 'w') as file:
+			json.dump(result, file)
+		os.replace(path + '.tmp', path)
+
+	threading.Thread(target=run, name='host-bench', daemon=True).start()
+
+
+def run_mode(mode, light_panels, heavy_rate, duration, workers):
+	result_dir = tempfile.mkdtemp(prefix='host_bench_')
+	params = { "result_dir": result_dir, "heavy_rate": heavy_rate, "light_rate": LIGHT_RATE, "duration": duration }
+	try:
+		start = time.perf_counter()
+		host = pi_control.host.Host(get_panels(mode, light_panels), log_level=3, backend='simulated', workers=workers, setup=functools.partial(start_load, params))
+		startup = time.perf_counter() - start
+		processes = len(host.shards) + (1 if host.panels else 0)
+		with open(os.path.join(result_dir, 'go'), 'w'):
+			pass
+
+		deadline = time.monotonic() + duration + DRAIN_SECONDS + 30
+		reports = []
+		while time.monotonic() < deadline:
+			reports = [name for name in os.listdir(result_dir) if name.endswith('.json')]
+			if len(reports) >= processes:
+				break
+			time.sleep(0.1)
+		host.stop()
+
+		result = { "processes": processes, "startup_seconds": startup, "threads": 0, "rss_kb": 0, "panels": {} }
+		if not host.panels:
+			# The parent only supervises; count it as host overhead
+			result['supervisor_rss_kb'] = rss_kb()
+		for name in reports:
+			with open(os.path.join(result_dir, name)) as file:
+				report = json.load(file)
+			result['threads'] += report['threads']
+			result['rss_kb'] += report['rss_kb']
+			result['panels'].update(report['panels'])
+		if len(reports) < processes:
+			result['missing_reports'] = processes - len(reports)
+		return result
+	finally:
+		shutil.rmtree(result_dir, ignore_errors=True)
+
+
+def light_latency(result):
+	values = [stats['latency'] for name, stats in result['panels'].items() if name != 'heavy' and stats['latency']['count']]
+	if not values:
+		return None, None
+	return max(value['p50_ms'] for value in values), max(value['p99_ms'] for value in values)
+
+
+def main():
+	ui = pi_control.ui.Interface(usage_message="""
+Usage:
+  benchmarks/host_benchmark.py [options]
+
+  Options:
+    -m,  --modes          Comma separated; defaults to shared,sharded,isolated
+    -l,  --light          Light panels beside the heavy one, up to 4; defaults to 3
+    -r,  --rate           Heavy panel events per second; defaults to 2000
+    -d,  --duration       Seconds of load per mode; defaults to 3
+    -w,  --workers        Dispatch workers per process; defaults to 8
+    -o,  --output         Also write the JSON results to this file
+    -h,  --help           This help text
+""")
+	args, opts = ui.get_options({
+		"options": [ {
+			"short": "m",
+			"long": "modes",
+			"type": "input"
+		}, {
+			"short": "l",
+			"long": "light",
+			"type": "input"
+		}, {
+			"short": "r",
+			"long": "rate",
+			"type": "input"
+		}, {
+			"short": "d",
+			"long": "duration",
+			"type": "input"
+		}, {
+			"short": "w",
+			"long": "workers",
+			"type": "input"
+		}, {
+			"short": "o",
+			"long": "output",
+			"type": "input"
+		} ]
+	})
+	modes = opts['modes'].split(',') if opts['modes'] else MODES
+	for mode in modes:
+		if mode not in MODES:
+			ui.error("Unknown mode {}".format(mode))
+			sys.exit(2)
+	light_panels = int(opts['light'] or LIGHT_PANELS)
+	if light_panels < 0 or light_panels > MAX_LIGHT_PANELS:
+		ui.error("light must be 0 to {}".format(MAX_LIGHT_PANELS))
+		sys.exit(2)
+	heavy_rate = int(opts['rate'] or HEAVY_RATE)
+	duration = float(opts['duration'] or 3.0)
+	workers = int(opts['workers'] or pi_control.host.WORKERS)
+
+	random.seed(42)
+	results = {}
+	print("{:<9} {:>5} {:>8} {:>8} {:>9} {:>11} {:>11} {:>11} {:>10}".format('mode', 'procs', 'threads', 'rss_mb', 'startup', 'light_p50', 'light_p99', 'heavy_p99', 'heavy_ok'))
+	for mode in modes:
+		result = run_mode(mode, light_panels, heavy_rate, duration, workers)
+		results[mode] = result
+		p50, p99 = light_latency(result)
+		heavy = result['panels'].get('heavy', {})
+		heavy_p99 = heavy.get('latency', {}).get('p99_ms')
+		print("{:<9} {:>5} {:>8} {:>8.1f} {:>8.3f}s {:>9}ms {:>9}ms {:>9}ms {:>10}".format(
+			mode, result['processes'], result['threads'], result['rss_kb'] / 1024, result['startup_seconds'],
+			'-' if p50 is None else "{:.2f}".format(p50), '-' if p99 is None else "{:.2f}".format(p99),
+			'-' if heavy_p99 is None else "{:.2f}".format(heavy_p99), heavy.get('outcomes', {}).get('ok', 0)
+		))
+
+	if opts['output']:
+		with open(opts['output'], 'w') as file:
+			json.dump({
+				"commit": git_commit(),
+				"python": platform.python_version(),
+				"light_panels": light_panels,
+				"heavy_rate": heavy_rate,
+				"light_rate": LIGHT_RATE,
+				"duration": duration,
+				"workers": workers,
+				"modes": results
+			}, file, indent=2)
+			file.write("\n")
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end latency from a simulated GPIO edge to each output's actuation.
+
+  python3 benchmarks/latency_benchmark.py [-c config.yml] [-e events] [-o results.json]
+
+Builds a Panel from the config (benchmarks/latency.yml by default) on the simulated backend,
+with every HTTP output pointed at a local server. Buttons, selector switches, and rotary
+encoders are driven with edges one at a time to measure latency per output type, then all
+at once to measure throughput. LEDs are timed to their PWM write, haptics to the DRV2605
+play, messages to the SNS publish, and HTTP to the request arriving at the server.
+"""
+
+import http.server
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.panel
+import pi_control.simulated
+import pi_control.ui
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Simulated write kinds for each output type
+PROBE_KINDS = { "gpio": "led", "drv2605": "haptic", "sns": "message" }
+
+
+class Probe:
+	"""
+	Collects the first actuation of each output type after an event is injected.
+	"""
+	def __init__(self):
+		self._condition = threading.Condition()
+		self._expected = set()
+		self._seen = {}
+		self._counts = {}
+		self._last = None
+
+	def start(self, expected):
+		with self._condition:
+			self._expected = set(expected)
+			self._seen = {}
+
+	def hit(self, kind, ts):
+		with self._condition:
+			self._counts[kind] = self._counts.get(kind, 0) + 1
+			self._last = ts
+			if kind in self._expected and kind not in self._seen:
+				self._seen[kind] = ts
+			# wait_counts() is waiting on totals, not first hits
+			self._condition.notify_all()
+
+	def wait(self, timeout=1.0):
+		with self._condition:
+			self._condition.wait_for(lambda: len(self._seen) >= len(self._expected), timeout)
+			return dict(self._seen)
+
+	@property
+	def last(self):
+		return self._last
+
+	def counts(self):
+		with self._condition:
+			return dict(self._counts)
+
+	def wait_counts(self, expected, timeout=10.0):
+		def done():
+			for kind, count in expected.items():
+				if self._counts.get(kind, 0) < count:
+					return False
+			return True
+		with self._condition:
+			self._condition.wait_for(done, timeout)
+			return dict(self._counts)
+
+	def sim_listener(self, entry):
+		ts, kind, target, value = entry
+		if kind in PROBE_KINDS:
+			self.hit(PROBE_KINDS[kind], ts)
+
+
+def start_server(probe):
+	class Handler(http.server.BaseHTTPRequestHandler):
+		protocol_version = 'HTTP/1.1'
+
+		def do_POST(self):
+			probe.hit('http', time.perf_counter())
+			length = int(self.headers.get('Content-Length') or 0)
+			if length:
+				self.rfile.read(length)
+			self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+
+		do_GET = do_POST
+
+		def log_message(self, *args):
+			pass
+
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, name='bench-http', daemon=True).start()
+	return server
+
+
+def local_url(url, base):
+	parts = urllib.parse.urlsplit(url or '/')
+	return base + (parts.path or '/')
+
+
+def prepare_config(path, base):
+	with open(path) as file:
+		config = yaml.load(file, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+	http_outputs = []
+	for name, info in config.get('outputs', {}).items():
+		if info.get('type') == 'http':
+			http_outputs.append(name)
+			info['url'] = local_url(info.get('url'), base)
+	for name, info in config.get('inputs', {}).items():
+		for status, actions in info.get('actions', {}).items():
+			for action in actions:
+				if action.get('name') in http_outputs and 'url' in action:
+					action['url'] = local_url(action['url'], base)
+	return config
+
+
+def get_generators(panel, backend):
+	"""
+	Returns (input name, status, inject) tuples for one round of edges per input.
+	"""
+	rounds = []
+	for name, device in panel.inputs.items():
+		if device.type == 'button' and device.gpio_pin is not None:
+			pin = device.gpio_pin
+			rounds.append([
+				(name, 'pressed', lambda pin=pin: backend.press(pin)),
+				(name, 'released', lambda pin=pin: backend.release(pin))
+			])
+		elif device.gpio_pins and 'up' not in device.gpio_pins:
+			pins = device.gpio_pins
+			steps = []
+			labels = list(pins.keys())
+			for i, label in enumerate(labels):
+				previous = pins[labels[i - 1]]
+				steps.append((name, label, lambda pin=pins[label], previous=previous: (backend.release(previous), backend.press(pin))))
+			rounds.append(steps)
+		elif device.type == 'rotary_encoder':
+			pin = device.gpio_pins['up']
+			rounds.append([
+				(name, 'up', lambda pin=pin: backend.rotate(pin, 1)),
+				(name, 'down', lambda pin=pin: backend.rotate(pin, -1))
+			])
+	return rounds
+
+
+def expected_kinds(panel, input_name, status):
+	kinds = set()
+	plan = panel.get_plan(input_name)
+	if not plan:
+		return kinds
+	for action in plan.get(status):
+		if action.output.type in ('led', 'haptic', 'http', 'message'):
+			kinds.add(action.output.type)
+	return kinds
+
+
+def summarize(values):
+	values = sorted(values)
+	if not values:
+		return { "count": 0 }
+	return {
+		"count": len(values),
+		"mean_ms": sum(values) / len(values) * 1000,
+		"p50_ms": values[len(values) // 2] * 1000,
+		"p99_ms": values[min(len(values) - 1, int(len(values) * .99))] * 1000,
+		"max_ms": values[-1] * 1000
+	}
+
+
+def git_commit():
+	try:
+		result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+		return result.stdout.decode().strip()
+	except Exception:
+		return None
+
+
+def run(config_path, events):
+	probe = Probe()
+	server = start_server(probe)
+	base = "http://127.0.0.1:{}".format(server.server_port)
+	config = prepare_config(config_path, base)
+
+	backend = pi_control.simulated.SimulatedBackend()
+	panel = pi_control.panel.Panel('latency_bench', config, log_level=3, backend=backend)
+	backend.add_listener(probe.sim_listener)
+
+	rounds = get_generators(panel, backend)
+	if not rounds:
+		raise ValueError("No button, selector switch, or rotary encoder inputs in {}".format(config_path))
+	schedule = []
+	while len(schedule) < events:
+		for steps in rounds:
+			schedule.extend(steps)
+	schedule = schedule[:events]
+
+	# Warm up connections and caches
+	for name, status, inject in schedule[:len(rounds) * 4]:
+		probe.start(expected_kinds(panel, name, status))
+		inject()
+		probe.wait()
+
+	# One event at a time
+	latencies = { "input": [] }
+	missing = {}
+	for name, status, inject in schedule:
+		expected = expected_kinds(panel, name, status)
+		probe.start(expected)
+		start = time.perf_counter()
+		inject()
+		latencies['input'].append(time.perf_counter() - start)
+		seen = probe.wait()
+		for kind, ts in seen.items():
+			latencies.setdefault(kind, []).append(ts - start)
+		for kind in expected - set(seen):
+			missing[kind] = missing.get(kind, 0) + 1
+	time.sleep(0.2)
+
+	# Everything at once
+	probe.start(set())
+	before = probe.counts()
+	totals = dict(before)
+	for name, status, inject in schedule:
+		for kind in expected_kinds(panel, name, status):
+			totals[kind] = totals.get(kind, 0) + 1
+	start = time.perf_counter()
+	for name, status, inject in schedule:
+		inject()
+	injected = time.perf_counter() - start
+	after = probe.wait_counts(totals)
+	# Dropped actions never arrive, so time to the last one that did rather than the wait
+	elapsed = max(probe.last or start, start + injected) - start
+	dropped = {}
+	for kind, count in totals.items():
+		if after.get(kind, 0) < count:
+			dropped[kind] = count - after.get(kind, 0)
+
+	panel.stop()
+	server.shutdown()
+
+	return {
+		"benchmark": "latency",
+		"timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		"commit": git_commit(),
+		"python": platform.python_version(),
+		"machine": platform.machine(),
+		"config": os.path.relpath(config_path),
+		"events": events,
+		"latency": { kind: summarize(values) for kind, values in latencies.items() },
+		"missing": missing,
+		"throughput": {
+			"events": len(schedule),
+			"inject_seconds": injected,
+			"seconds": elapsed,
+			"events_per_second": len(schedule) / elapsed if elapsed else None,
+			"dropped": dropped
+		}
+	}
+
+
+def main():
+	ui = pi_control.ui.Interface(usage_message="""
+Usage:
+  benchmarks/latency_benchmark.py [options]
+
+  Options:
+    -c,  --config         Panel config; defaults to benchmarks/latency.yml
+    -e,  --events         Number of input events; defaults to 2000
+    -o,  --output         Also write the JSON results to this file
+    -h,  --help           This help text
+""")
+	args, opts = ui.get_options({
+		"options": [ {
+			"short": "c",
+			"long": "config",
+			"type": "input"
+		}, {
+			"short": "e",
+			"long": "events",
+			"type": "input"
+		}, {
+			"short": "o",
+			"long": "output",
+			"type": "input"
+		} ]
+	})
+	config_path = opts['config'] or os.path.join(BENCH_DIR, 'latency.yml')
+	events = int(opts['events'] or 2000)
+
+	results = run(config_path, events)
+
+	print("{:<10} {:>7} {:>9} {:>9} {:>9}".format('output', 'count', 'p50_ms', 'p99_ms', 'max_ms'))
+	for kind, stats in results['latency'].items():
+		if stats['count']:
+			print("{:<10} {:>7} {:>9.3f} {:>9.3f} {:>9.3f}".format(kind, stats['count'], stats['p50_ms'], stats['p99_ms'], stats['max_ms']))
+	throughput = results['throughput']
+	print("throughput: {:.0f} events/s ({} events in {:.3f}s), dropped {}".format(throughput['events_per_second'], throughput['events'], throughput['seconds'], throughput['dropped'] or 'none'))
+
+	if opts['output']:
+		with open(opts['output'], 'w') as file:
+			json.dump(results, file, indent=2)
+			file.write("\n")
+
+
+if __name__ == '__main__':
+	main()
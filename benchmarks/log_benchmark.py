@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+Per-call cost of Device.log at each message level, for a quiet (warn) and a debug daemon.
+
+  python3 benchmarks/log_benchmark.py [iterations]
+
+Printed output goes to /dev/null so only the logging pipeline is timed. The legacy column
+is the old inspect.stack() implementation, kept here for comparison.
+"""
+
+import inspect
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.log
+
+
+class Current(pi_control.log.Logger):
+	def __init__(self, log_level):
+		self._log_level = log_level
+		self._name = 'bench'
+
+	def call(self, level):
+		self.log("{} changed", level, self._name)
+
+
+class Legacy:
+	def __init__(self, log_level):
+		self._log_level = log_level
+		self._name = 'bench'
+
+	def convert_log_level(self, name):
+		return pi_control.log.convert_log_level(name)
+
+	def log(self, message, level='debug'):
+		log_level = self.convert_log_level(level)
+		if log_level > self._log_level:
+			return
+		cnt = 0
+		for i in range(len(inspect.stack())):
+			function = inspect.stack()[i].function
+			if function not in ('<module>', '__init__', 'inner'):
+				cnt += 1
+		indent = '  ' * cnt
+		if level not in ['start', 'end']:
+			indent = '  ' + indent
+		function = inspect.stack()[1].function
+		filename = re.sub(r'^.*\/', '', inspect.stack()[1].filename)
+		line = inspect.stack()[1].lineno
+		if log_level < 7:
+			print("  {}:{}() {}: {}".format(filename, function, line, message))
+		else:
+			print("{}{}:{}() {}: {}".format(indent, filename, function, line, message))
+
+	def call(self, level):
+		self.log(self._name + " changed", level)
+
+
+def time_calls(logger, level, iterations):
+	call = logger.call
+	start = time.perf_counter()
+	for i in range(iterations):
+		call(level)
+	return (time.perf_counter() - start) / iterations
+
+
+def main():
+	iterations = 20000
+	if len(sys.argv) > 1:
+		iterations = int(sys.argv[1])
+	legacy_iterations = max(1, iterations // 100)
+
+	levels = ['emerg', 'alert', 'crit', 'error', 'warn', 'notice', 'info', 'debug', 'start']
+	results = []
+	stdout = sys.stdout
+	with open(os.devnull, 'w') as devnull:
+		sys.stdout = devnull
+		try:
+			for daemon_level in (4, 7):
+				for level in levels:
+					current = time_calls(Current(daemon_level), level, iterations)
+					legacy = time_calls(Legacy(daemon_level), level, legacy_iterations)
+					results.append((daemon_level, level, current, legacy))
+		finally:
+			sys.stdout = stdout
+
+	print("{:>12} {:>8} {:>12} {:>12} {:>8}".format('daemon_level', 'level', 'current_us', 'legacy_us', 'speedup'))
+	for daemon_level, level, current, legacy in results:
+		print("{:>12} {:>8} {:>12.3f} {:>12.3f} {:>7.1f}x".format(daemon_level, level, current * 1e6, legacy * 1e6, legacy / current))
+
+
+if __name__ == '__main__':
+	main()
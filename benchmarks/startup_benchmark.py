@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""
+Panel startup time, split into import, config parse, driver import, and device init.
+
+  python3 benchmarks/startup_benchmark.py [config.yml] [runs]
+
+Each run starts a fresh interpreter so module imports are cold, builds the Panel on the
+simulated backend, and prints Panel.startup_times. Reports the median of each phase.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import pi_control.panel
+panel = pi_control.panel.Panel('startup_bench', sys.argv[1], log_level=3, backend='simulated')
+times = dict(panel.startup_times)
+times['devices'] = len(times['devices'])
+times['process'] = time.perf_counter() - start
+panel.stop()
+sys.stdout.write('STARTUP ' + json.dumps(times) + '\\n')
+"""
+
+
+def run_once(config_path):
+	result = subprocess.run([sys.executable, '-c', CHILD, config_path], cwd=ROOT_DIR, stdout=subprocess.PIPE, check=True)
+	for line in result.stdout.decode().splitlines():
+		if line.startswith('STARTUP '):
+			return json.loads(line[8:])
+	raise ValueError("No startup times from child process")
+
+
+def main():
+	config_path = os.path.join(BENCH_DIR, 'latency.yml')
+	if len(sys.argv) > 1:
+		config_path = os.path.abspath(sys.argv[1])
+	runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+	samples = [run_once(config_path) for i in range(runs)]
+	print("{} runs of {}".format(runs, os.path.relpath(config_path)))
+	for phase in ('import', 'config', 'drivers', 'expanders', 'outputs', 'inputs', 'total', 'process'):
+		values = [sample[phase] for sample in samples]
+		print("{:<10} median {:8.2f}ms  max {:8.2f}ms".format(phase, statistics.median(values) * 1000, max(values) * 1000))
+
+
+if __name__ == '__main__':
+	main()
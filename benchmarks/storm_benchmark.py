@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+
+"""
+Event storms against a Panel on simulated hardware, to find the rate where it falls behind.
+
+  python3 benchmarks/storm_benchmark.py [-c config.yml] [-s scenarios] [-r rates] [-d seconds] [-o results.json] [-b baseline.json]
+
+Builds a fresh Panel from the config (benchmarks/storm.yml by default) for each scenario and
+drives it at rising event rates:
+  chatter - one button toggled as fast as the rate, mostly inside its debounce
+  spin - a rotary encoder turned one detent per event
+  noise - a potentiometer jittering around a range boundary
+  crowd - every other button toggled round robin
+  mixed - all of the above interleaved
+Each step records accepted changes, actions dispatched and how they ended, late actions,
+duplicates (an LED written the same value, or the same HTTP request sent, twice in a row),
+how long the backlog took to drain, thread count, and memory growth. A scenario stops at the
+first step that fails, and the report names the rate and what broke first. With -b, the max
+rates are compared with an earlier report.
+"""
+
+import http.server
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pi_control.panel
+import pi_control.simulated
+import pi_control.ui
+
+from latency_benchmark import git_commit, prepare_config, summarize
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ['chatter', 'spin', 'noise', 'crowd', 'mixed']
+RATES = [50, 100, 200, 500, 1000, 2000, 5000]
+
+# A step fails when any of these is exceeded
+LATE_MS = 50.0
+DRAIN_SECONDS = 1.0
+MIN_RATE_RATIO = 0.9
+
+
+class Tally:
+	"""
+	Panel observer that counts one step's changes and actions and times each action from
+	its input change to its result. Also watches LED writes and HTTP requests for repeats.
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._last_write = {}
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self.statuses = 0
+			self.dispatched = 0
+			self.results = 0
+			self.outcomes = {}
+			self.latency = []
+			self.duplicates = 0
+			self._pending = {}
+			self._status_ts = None
+
+	def __call__(self, kind, ts, fields):
+		with self._lock:
+			if kind == 'status':
+				self.statuses += 1
+				self._status_ts = ts
+			elif kind == 'dispatch':
+				self.dispatched += 1
+				self._pending[fields[0]] = self._status_ts or ts
+			elif kind == 'result':
+				action_id, output, outcome, seconds = fields
+				self.results += 1
+				self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+				start = self._pending.pop(action_id, None)
+				if outcome == 'ok' and start is not None:
+					self.latency.append(ts - start)
+
+	def write(self, target, value):
+		with self._lock:
+			if self._last_write.get(target) == value:
+				self.duplicates += 1
+			self._last_write[target] = value
+
+	def sim_listener(self, entry):
+		ts, kind, target, value = entry
+		if kind == 'gpio':
+			self.write(('gpio', target), value)
+
+	def drained(self):
+		with self._lock:
+			return self.results >= self.dispatched
+
+
+def start_server(tally):
+	class Handler(http.server.BaseHTTPRequestHandler):
+		protocol_version = 'HTTP/1.1'
+
+		def do_POST(self):
+			length = int(self.headers.get('Content-Length') or 0)
+			body = self.rfile.read(length) if length else b''
+			tally.write(('http', self.headers.get('Host')), (self.path, body))
+			self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+
+		do_GET = do_POST
+
+		def log_message(self, *args):
+			pass
+
+	server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, name='storm-http', daemon=True).start()
+	return server
+
+
+def rss_kb():
+	try:
+		with open('/proc/self/statm') as file:
+			return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+	except (OSError, ValueError, IndexError):
+		import resource
+		return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_generators(panel, backend):
+	"""
+	Returns { scenario: [inject, ...] } for the inputs the config has. Each call of an
+	inject makes one event.
+	"""
+	buttons = [device for device in panel.inputs.values() if device.type == 'button' and device.gpio_pin is not None]
+	encoders = [device for device in panel.inputs.values() if device.type == 'rotary_encoder']
+	knobs = [device for device in panel.inputs.values() if device.type == 'potentiometer']
+
+	def toggle(pin):
+		button = backend.get_button(pin)
+		return lambda: button.release() if button.is_pressed else button.press()
+
+	def spin(pin):
+		return lambda: backend.rotate(pin, 1 if random.random() < 0.8 else -1)
+
+	def jitter(device):
+		# Around the first range boundary, so noise crosses it
+		boundary = device._thresholds[0] / 100 if device._thresholds else 0.5
+		port, spi_device = device._source_device._spi_port, device._source_device._spi_device
+		return lambda: backend.set_adc(device.source_channel, min(max(boundary + random.uniform(-0.03, 0.03), 0.0), 1.0), port, spi_device)
+
+	generators = {}
+	if buttons:
+		generators['chatter'] = [toggle(buttons[0].gpio_pin)]
+	if encoders:
+		generators['spin'] = [spin(device.gpio_pins['up']) for device in encoders]
+	if knobs:
+		generators['noise'] = [jitter(device) for device in knobs]
+	if len(buttons) > 1:
+		generators['crowd'] = [toggle(device.gpio_pin) for device in buttons[1:]]
+	mixed = [inject for injects in generators.values() for inject in injects]
+	if mixed:
+		generators['mixed'] = mixed
+	return generators
+
+
+def run_step(panel, tally, injects, rate, duration):
+	tally.reset()
+	events = max(int(rate * duration), 1)
+	threads = [threading.active_count()]
+	sampling = threading.Event()
+
+	def sample():
+		while not sampling.wait(0.05):
+			threads.append(threading.active_count())
+
+	sampler = threading.Thread(target=sample, name='storm-sampler', daemon=True)
+	sampler.start()
+	rss_before = rss_kb()
+
+	start = time.perf_counter()
+	for i in range(events):
+		ahead = start + i / rate - time.perf_counter()
+		if ahead > 0.0005:
+			time.sleep(ahead)
+		injects[i % len(injects)]()
+	injected = time.perf_counter() - start
+
+	# Let debounce re-checks and polls catch up, then wait for the backlog
+	drain_start = time.perf_counter()
+	time.sleep(0.1)
+	while not tally.drained() and time.perf_counter() - drain_start < DRAIN_SECONDS * 5:
+		time.sleep(0.005)
+	drain = time.perf_counter() - drain_start - 0.1
+	sampling.set()
+	sampler.join()
+
+	latency = summarize(tally.latency)
+	late = sum(1 for value in tally.latency if value * 1000 > LATE_MS)
+	step = {
+		"rate": rate,
+		"events": events,
+		"achieved_rate": events / injected if injected else float(events),
+		"statuses": tally.statuses,
+		"dispatched": tally.dispatched,
+		"outcomes": dict(tally.outcomes),
+		"late": late,
+		"duplicates": tally.duplicates,
+		"latency": latency,
+		"drain_seconds": max(drain, 0.0),
+		"stalled": not tally.drained(),
+		"queue_depth": panel.dispatcher.depth,
+		"threads_max": max(threads),
+		"rss_growth_kb": rss_kb() - rss_before
+	}
+
+	# What broke first, in the order it would be noticed
+	failure = None
+	if step['achieved_rate'] < rate * MIN_RATE_RATIO:
+		failure = 'injector'
+	elif tally.outcomes.get('dropped'):
+		failure = 'dropped'
+	elif step['stalled'] or step['drain_seconds'] > DRAIN_SECONDS:
+		failure = 'backlog'
+	elif latency['count'] and latency['p99_ms'] > LATE_MS:
+		failure = 'late'
+	elif tally.duplicates:
+		failure = 'duplicates'
+	step['failure'] = failure
+	return step
+
+
+def run(config_path, scenarios, rates, duration):
+	tally = Tally()
+	server = start_server(tally)
+	base = "http://127.0.0.1:{}".format(server.server_port)
+	results = {}
+	for scenario in scenarios:
+		backend = pi_control.simulated.SimulatedBackend()
+		panel = pi_control.panel.Panel('storm_bench', prepare_config(config_path, base), log_level=3, backend=backend)
+		generators = get_generators(panel, backend)
+		if scenario not in generators:
+			panel.stop()
+			results[scenario] = { "skipped": "no inputs for this scenario in the config" }
+			continue
+		tally._last_write = {}
+		backend.add_listener(tally.sim_listener)
+		panel.add_observer(tally)
+		steps = []
+		rss_start = rss_kb()
+		for rate in rates:
+			step = run_step(panel, tally, generators[scenario], rate, duration)
+			steps.append(step)
+			print("{:<8} {:>6}/s  achieved {:>7.0f}/s  actions {:>6}  p99 {:>8.2f}ms  drain {:>6.3f}s  threads {:>3}  {}".format(
+				scenario, rate, step['achieved_rate'], step['dispatched'], step['latency'].get('p99_ms', 0.0),
+				step['drain_seconds'], step['threads_max'], step['failure'] or 'ok'), flush=True)
+			if step['failure']:
+				break
+		panel.stop()
+		passed = [step['rate'] for step in steps if not step['failure']]
+		failed = [step for step in steps if step['failure']]
+		results[scenario] = {
+			"max_rate": max(passed) if passed else 0,
+			"breaks_at": failed[0]['rate'] if failed else None,
+			"breaks_by": failed[0]['failure'] if failed else None,
+			"rss_growth_kb": rss_kb() - rss_start,
+			"steps": steps
+		}
+	server.shutdown()
+
+	return {
+		"benchmark": "storm",
+		"timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		"commit": git_commit(),
+		"python": platform.python_version(),
+		"machine": platform.machine(),
+		"config": os.path.relpath(config_path),
+		"duration": duration,
+		"limits": { "late_ms": LATE_MS, "drain_seconds": DRAIN_SECONDS, "min_rate_ratio": MIN_RATE_RATIO },
+		"scenarios": results
+	}
+
+
+def compare(results, baseline):
+	print("{:<8} {:>14} {:>14}  {}".format('scenario', 'baseline max', 'this max', 'breaks by'))
+	for scenario, result in results['scenarios'].items():
+		before = baseline.get('scenarios', {}).get(scenario, {})
+		if 'max_rate' not in result:
+			continue
+		print("{:<8} {:>12}/s {:>12}/s  {} -> {}".format(scenario, before.get('max_rate', '-'), result['max_rate'], before.get('breaks_by') or '-', result['breaks_by'] or '-'))
+
+
+def main():
+	ui = pi_control.ui.Interface(usage_message="""
+Usage:
+  benchmarks/storm_benchmark.py [options]
+
+  Options:
+    -c,  --config         Panel config; defaults to benchmarks/storm.yml
+    -s,  --scenarios      Comma separated; defaults to chatter,spin,noise,crowd,mixed
+    -r,  --rates          Comma separated events per second; defaults to 50,100,200,500,1000,2000,5000
+    -d,  --duration       Seconds per step; defaults to 1
+    -o,  --output         Also write the JSON results to this file
+    -b,  --baseline       Compare with the JSON results of an earlier run
+    -h,  --help           This help text
+""")
+	args, opts = ui.get_options({
+		"options": [ {
+			"short": "c",
+			"long": "config",
+			"type": "input"
+		}, {
+			"short": "s",
+			"long": "scenarios",
+			"type": "input"
+		}, {
+			"short": "r",
+			"long": "rates",
+			"type": "input"
+		}, {
+			"short": "d",
+			"long": "duration",
+			"type": "input"
+		}, {
+			"short": "o",
+			"long": "output",
+			"type": "input"
+		}, {
+			"short": "b",
+			"long": "baseline",
+			"type": "input"
+		} ]
+	})
+	config_path = opts['config'] or os.path.join(BENCH_DIR, 'storm.yml')
+	scenarios = opts['scenarios'].split(',') if opts['scenarios'] else SCENARIOS
+	for scenario in scenarios:
+		if scenario not in SCENARIOS:
+			ui.error("Unknown scenario {}".format(scenario))
+			sys.exit(2)
+	rates = [int(rate) for rate in opts['rates'].split(',')] if opts['rates'] else RATES
+	duration = float(opts['duration'] or 1.0)
+
+	random.seed(42)
+	results = run(config_path, scenarios, rates, duration)
+	for scenario, result in results['scenarios'].items():
+		if 'skipped' in result:
+			print("{:<8} skipped, {}".format(scenario, result['skipped']))
+		else:
+			print("{:<8} max {}/s, breaks at {} by {}".format(scenario, result['max_rate'], result['breaks_at'] or '-', result['breaks_by'] or '-'))
+
+	if opts['baseline']:
+		with open(opts['baseline']) as file:
+			compare(results, json.load(file))
+
+	if opts['output']:
+		with open(opts['output'], 'w') as file:
+			json.dump(results, file, indent=2)
+			file.write("\n")
+
+
+if __name__ == '__main__':
+	main()
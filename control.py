@@ -1,8 +1,11 @@
 #!/usr/bin/env python3.7
 
+import signal
+import sys
+import threading
 import time
 
-import pi_control.panel
+import pi_control.host
 import pi_control.ui
 
 ui = pi_control.ui.Interface(use_slack_format=True, log_level=4, usage_message = """
@@ -10,7 +13,9 @@ Usage:
   /opt/control/control.py [options]
   
   Options:
+    -c,  --config         Panel config, or a host config listing several panels; defaults to /opt/control/control.yml
     -n,  --dry_run        Show likely output, but don't actually make changes.
+    -s,  --simulate       Use simulated GPIO, I2C, and SPI instead of the Pi's hardware.
     -h,  --help           This help text
     -v,  --verbose        Print extra output.
     -vv, --more_verbose   Print all output.
@@ -24,8 +29,15 @@ Usage:
 def main():
 	args, opts = ui.get_options({
 		"options": [ {
+			"short": "c",
+			"long": "config",
+			"type": "input"
+		}, {
 			"short": "n",
 			"long": "dry_run"
+		}, {
+			"short": "s",
+			"long": "simulate"
 		}, {
 			"short": "v",
 			"long": "verbose"
@@ -42,6 +54,11 @@ def main():
 	if opts['dry_run']:
 		dry_run = True
 	
+	# Otherwise each panel's config picks, defaulting to hardware
+	backend = None
+	if opts['simulate']:
+		backend = 'simulated'
+	
 	log_level = 4
 	if opts['v']:
 		log_level = 5
@@ -50,13 +67,28 @@ def main():
 	elif opts['x']:
 		log_level = 7
 	
-	panel = pi_control.panel.Panel('monitor_panel', '/opt/control/control.yml', dry_run=dry_run, log_level=log_level)
+	config_path = opts['config'] or '/opt/control/control.yml'
+	panels, settings = pi_control.host.load_host_config(config_path, name='monitor_panel')
+	if backend:
+		settings['backend'] = backend
+	host = pi_control.host.Host(panels, dry_run=dry_run, log_level=log_level, **settings)
+	
+	# systemctl reload sends SIGHUP; rebuild changed devices off the signal handler
+	signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(target=host.reload, name='reload', daemon=True).start())
+	
+	def stop(signum, frame):
+		host.stop()
+		sys.exit(0)
+	signal.signal(signal.SIGTERM, stop)
 	
 	while 42:
 		time.sleep(1)
+		host.check()
 # 		print('tick')
 
 
 
-main()
+# Worker processes are spawned and import this file, so only start from the command line
+if __name__ == '__main__':
+	main()
 
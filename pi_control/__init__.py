@@ -1,10 +1,9 @@
 # print("Loaded pi-control init")
 
-from inspect import ismethod
+import types
 
 
 def is_method(instance, method):
-	if hasattr(instance, method) and ismethod(getattr(instance, method)):
+	if hasattr(instance, method) and isinstance(getattr(instance, method), types.MethodType):
 		return True
 	return False
-
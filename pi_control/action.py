@@ -0,0 +1,112 @@
+# print("Loaded pi_control action module")
+
+import types
+
+"""
+2026-10-18 Actions compiled once at startup into an immutable plan per input.
+2026-10-18 Actions carry the state key they leave their output in, so repeats can be skipped.
+
+Each action in control.yml is validated by its output's prepare() when the panel starts, so
+config errors show up at boot and firing an event only walks a list of prepared actions.
+"""
+
+"""
+import pi_control.action
+"""
+
+class Action:
+	"""
+	action = pi_control.action.Action(output, params, init=False, dedupe=None)
+	result = action.run()
+
+	dedupe defaults to the output's setting. state_key is worked out here, once, even when
+	dedupe is off, so the output's state stays known after the action runs.
+	"""
+	__slots__ = ('_output', '_params', '_init', '_dedupe', '_state_key')
+
+	def __init__(self, output, params, init=False, dedupe=None):
+		self._output = output
+		self._params = types.MappingProxyType(dict(params))
+		self._init = bool(init)
+		if dedupe is None:
+			dedupe = getattr(output, 'dedupe', False)
+		self._dedupe = bool(dedupe)
+		state_key = getattr(output, 'state_key', None)
+		self._state_key = state_key(self._params) if state_key else None
+
+	@property
+	def output(self):
+		return self._output
+
+	@property
+	def name(self):
+		return self._output.name
+
+	@property
+	def params(self):
+		return self._params
+
+	@property
+	def init(self):
+		return self._init
+
+	@property
+	def dedupe(self):
+		return self._dedupe
+
+	@property
+	def state_key(self):
+		return self._state_key
+
+	def run(self):
+		return self._output.run(self._params)
+
+	def __repr__(self):
+		return "<Action {} {}>".format(self._output.name, self._params.get('action'))
+
+
+class Plan:
+	"""
+	plan = pi_control.action.compile_plan(input_device, outputs)
+	actions = plan.get(status)
+	actions = plan.get(status, startup=True)
+	"""
+	__slots__ = ('_actions', '_init_actions')
+
+	def __init__(self, actions):
+		self._actions = types.MappingProxyType({status: tuple(items) for status, items in actions.items()})
+		self._init_actions = types.MappingProxyType({status: tuple(action for action in items if action.init) for status, items in actions.items()})
+
+	@property
+	def statuses(self):
+		return tuple(self._actions.keys())
+
+	def get(self, status, startup=False):
+		if startup:
+			return self._init_actions.get(status, ())
+		return self._actions.get(status, ())
+
+	def items(self):
+		return self._actions.items()
+
+
+def compile_plan(input_device, outputs):
+	actions = {}
+	for status, action_list in input_device._actions.items():
+		if type(action_list) is not list:
+			raise TypeError("Actions for {}.{} must be a list".format(input_device.name, status))
+		actions[status] = []
+		for cnt, action_info in enumerate(action_list):
+			if type(action_info) is not dict or 'name' not in action_info:
+				raise KeyError("Name is required in action {} in action for {}.{}".format(cnt, input_device.name, status))
+			if action_info['name'] not in outputs:
+				raise ValueError("Output {} in action for {}.{} not found".format(action_info['name'], input_device.name, status))
+			output = outputs[action_info['name']]
+			if type(action_info.get('dedupe', False)) is not bool:
+				raise TypeError("dedupe in action {} for {}.{} must be type bool".format(cnt, input_device.name, status))
+			try:
+				params = output.prepare(action_info)
+			except (AttributeError, KeyError, TypeError, ValueError) as err:
+				raise type(err)("Invalid action {} for {}.{}: {}".format(cnt, input_device.name, status, err)) from err
+			actions[status].append(Action(output, params, action_info.get('init', False), action_info.get('dedupe')))
+	return Plan(actions)
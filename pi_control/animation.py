@@ -0,0 +1,217 @@
+# print("Loaded pi_control animation module")
+
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 Single-thread animation engine for PWM LEDs. Replaces the thread per blink/flicker/fade.
+2026-10-18 One engine per frame rate, so panels in a host each keep their animation_fps.
+
+Effects are precomputed as one brightness value per frame. The engine thread picks each
+animation's frame from the time since it started, so late frames don't push the rest of the
+effect back, and starting a new effect on an LED replaces the running one immediately.
+Frames are written under the engine's lock, so a cancelled effect never writes after the
+value set by cancel().
+"""
+
+"""
+import pi_control.animation
+"""
+
+FPS = 50
+
+
+"""
+Curves
+"""
+
+def frames(segments, fps=FPS):
+	"""
+	values = frames([(brightness, seconds), ...], fps)
+	"""
+	values = []
+	elapsed = 0.0
+	for value, seconds in segments:
+		elapsed += seconds
+		count = int(round(elapsed * fps)) - len(values)
+		values.extend([value] * count)
+	return tuple(values)
+
+def blink(iterations=3, duration=3, fps=FPS):
+	segments = []
+	step = float(duration) / (iterations*2 - 1)
+	for i in range(iterations):
+		if i != 0:
+			segments.append((0.0, step))
+		segments.append((1.0, step))
+	return frames(segments, fps)
+
+def flicker_on(duration=.5, fps=FPS):
+	segments = []
+	for i in range(8):
+		if i != 0:
+			segments.append((0.0, (8-i) * float(duration) / 45))
+		segments.append(((i+1) / 8, i * float(duration) / 45))
+	return frames(segments, fps)
+
+def flicker_off(duration=.5, fps=FPS):
+	segments = []
+	for i in range(8):
+		if i != 0:
+			segments.append(((8-i) / 8, (8-i) * float(duration) / 45))
+		segments.append((0.0, i * float(duration) / 45))
+	return frames(segments, fps)
+
+def fade_on(duration=.5, fps=FPS):
+	count = max(1, int(round(float(duration) * fps)))
+	return tuple((i+1) / count for i in range(count))
+
+def fade_off(duration=.5, fps=FPS):
+	count = max(1, int(round(float(duration) * fps)))
+	return tuple((count-i) / count for i in range(count))
+
+
+"""
+Engine
+"""
+
+class Animation:
+	def __init__(self, target, values, final, on_done, start_ts):
+		self.target = target
+		self.values = values
+		self.final = final
+		self.on_done = on_done
+		self.start_ts = start_ts
+		self.last_value = None
+
+
+class Animator(pi_control.log.Logger):
+	"""
+	animator = pi_control.animation.Animator(fps=50)
+	animator.start(led_connection, pi_control.animation.fade_on(1.0, animator.fps), final=1.0, on_done=callback)
+	animator.cancel(led_connection, value=0.0)
+	animator.stats
+	"""
+	def __init__(self, fps=FPS, log_level=4):
+		self._log_level = log_level
+		if type(fps) is not int or fps < 1:
+			raise ValueError("Invalid animation fps {}".format(fps))
+		self._fps = fps
+		self._period = 1.0 / fps
+		self._animations = {}
+		self._condition = threading.Condition()
+		self._stopped = False
+		self._thread = None
+
+		self._frames = 0
+		self._late_total = 0.0
+		self._late_max = 0.0
+		self._cpu = 0.0
+
+	@property
+	def fps(self):
+		return self._fps
+
+	@property
+	def active(self):
+		return len(self._animations)
+
+	@property
+	def stats(self):
+		return {
+			"frames": self._frames,
+			"jitter_mean": self._late_total / self._frames if self._frames else 0.0,
+			"jitter_max": self._late_max,
+			"cpu": self._cpu
+		}
+
+	def start(self, target, values, final=None, on_done=None):
+		animation = Animation(target, values, final, on_done, time.monotonic())
+		with self._condition:
+			self._animations[target] = animation
+			self._condition.notify()
+			if not self._thread:
+				self._stopped = False
+				self._thread = threading.Thread(target=self.run, name='animation', daemon=True)
+				self._thread.start()
+		return animation
+
+	def cancel(self, target, value=None):
+		# Written under the lock so a frame being rendered can't overwrite it
+		with self._condition:
+			animation = self._animations.pop(target, None)
+			if value is not None:
+				target.value = value
+		return animation is not None
+
+	def stop(self):
+		with self._condition:
+			self._stopped = True
+			self._animations = {}
+			self._condition.notify_all()
+		if self._thread:
+			self._thread.join()
+			self._thread = None
+
+	def render(self, now):
+		finished = []
+		with self._condition:
+			for animation in list(self._animations.values()):
+				index = int((now - animation.start_ts) * self._fps)
+				if index < len(animation.values):
+					value = animation.values[index]
+				else:
+					value = animation.final
+					finished.append(animation)
+					del self._animations[animation.target]
+				if value is not None and value != animation.last_value:
+					animation.target.value = value
+					animation.last_value = value
+		for animation in finished:
+			if animation.on_done:
+				animation.on_done()
+
+	def run(self):
+		cpu_ts = time.thread_time()
+		next_ts = time.monotonic()
+		while True:
+			with self._condition:
+				while not self._animations and not self._stopped:
+					self._cpu += time.thread_time() - cpu_ts
+					self._condition.wait()
+					cpu_ts = time.thread_time()
+					next_ts = time.monotonic()
+				if self._stopped:
+					self._cpu += time.thread_time() - cpu_ts
+					return True
+				wait = next_ts - time.monotonic()
+				if wait > 0:
+					self._condition.wait(wait)
+			now = time.monotonic()
+			late = now - next_ts
+			if late >= 0:
+				self._frames += 1
+				self._late_total += late
+				if late > self._late_max:
+					self._late_max = late
+				self.render(now)
+				next_ts += self._period
+				if next_ts < now:
+					next_ts = now + self._period
+
+
+# { fps: Animator }
+_animators = {}
+_animator_lock = threading.Lock()
+
+"""
+animator = pi_control.animation.get_animator(fps=50, log_level=4)
+	One engine per frame rate, shared by every LED that uses it.
+"""
+def get_animator(fps=FPS, log_level=4):
+	with _animator_lock:
+		if fps not in _animators:
+			_animators[fps] = Animator(fps, log_level=log_level)
+		return _animators[fps]
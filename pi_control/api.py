@@ -0,0 +1,520 @@
+# print("Loaded pi_control api module")
+
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import hmac
+import json
+import os
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 Local control API: newline-delimited JSON over a Unix socket and localhost TCP, to
+stream input changes and action results and to fire outputs and inputs.
+
+The server runs an asyncio loop on its own thread. Panel observers only append each event to
+a queue and wake the loop when it's idle, so GPIO callbacks never wait on clients. The loop
+encodes each event once and copies it to every subscriber's bounded queue; a client that
+can't keep up loses its oldest events and is told how many.
+2026-10-18 fire only takes params that pick an action, never ones that change where an output sends
+it. TCP clients need the configured token before they can fire outputs or inputs.
+"""
+
+"""
+import pi_control.api
+server = pi_control.api.ApiServer({ name: panel }, socket='/run/control/api.sock', port=9106)
+server.start()
+server.stop()
+"""
+
+SETTINGS = ['socket', 'port', 'host', 'socket_mode', 'max_queue', 'token']
+# Action params a client may set with fire; the rest, like an HTTP url or bearer_token, come from the config
+FIRE_PARAMS = ('action', 'value', 'effect', 'message', 'file', 'duration', 'iterations', 'dedupe')
+# Commands a TCP client can only send after auth
+TRUSTED_COMMANDS = ('fire', 'input')
+EVENTS = ['status', 'dispatch', 'result']
+EVENT_FIELDS = {
+	"status": ('input', 'status', 'startup', 'delta'),
+	"dispatch": ('id', 'output', 'action', 'input'),
+	"result": ('id', 'output', 'outcome', 'seconds')
+}
+# Events per client waiting to be sent
+MAX_QUEUE = 1024
+# Events from panels waiting for the loop
+MAX_INBOX = 65536
+MAX_LINE = 65536
+# Pending connections, so hundreds of clients can connect at once
+BACKLOG = 512
+
+
+def encode(message):
+	return json.dumps(message, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+
+
+class Client:
+	"""
+	One connection. Replies are always sent; events wait in a queue of max_queue, and when it
+	is full the oldest are dropped and counted.
+	"""
+	def __init__(self, writer, max_queue, trusted=False):
+		self.writer = writer
+		self.trusted = trusted
+		self.max_queue = max_queue
+		self.replies = collections.deque()
+		self.queue = collections.deque(maxlen=max_queue)
+		self.dropped = 0
+		self.ready = asyncio.Event()
+		self.events = None
+		self.panels = None
+		self.closed = False
+
+	@property
+	def subscribed(self):
+		return self.events is not None
+
+	def wants(self, panel_name, kind):
+		return kind in self.events and (self.panels is None or panel_name in self.panels)
+
+	def push(self, lines):
+		# The queue's maxlen drops the oldest
+		overflow = len(self.queue) + len(lines) - self.max_queue
+		if overflow > 0:
+			self.dropped += overflow
+		self.queue.extend(lines)
+		self.ready.set()
+		return max(overflow, 0)
+
+	def reply(self, line):
+		self.replies.append(line)
+		self.ready.set()
+
+	def close(self):
+		self.closed = True
+		self.ready.set()
+
+
+class ApiServer(pi_control.log.Logger):
+	"""
+	server = pi_control.api.ApiServer(panels, socket=None, port=None, host='127.0.0.1', socket_mode=0o660, max_queue=1024, token=None, metrics=None)
+		panels is { name: Panel }. Listens on the Unix socket, the TCP port, or both; port 0
+		picks a free one. Socket clients are trusted, as far as socket_mode lets them connect.
+		TCP clients can only read until they send auth with token, and can't send it if there's
+		no token.
+	server.start()
+	server.addresses
+	server.stop()
+
+	Each request is one JSON object per line, with "cmd" and an optional "id" that is copied
+	into its reply. Replies have "ok" and, when it's false, "error". "panel" picks the panel,
+	and can be left out when there is only one.
+		{"cmd": "ping"}
+		{"cmd": "panels"}
+			Inputs with their statuses, and outputs with their types
+		{"cmd": "state"}
+			Each device's last status and value, and each output's last action
+		{"cmd": "subscribe", "events": ["status", "dispatch", "result"], "panels": [name], "state": true}
+			Streams events until unsubscribe. events and panels default to all. With state, a
+			"state" event per panel comes first.
+		{"cmd": "unsubscribe"}
+		{"cmd": "auth", "token": token}
+			Lets a TCP client use fire and input.
+		{"cmd": "fire", "output": name, "params": {"action": "on"}, "wait": true}
+			Runs one action on the output, with params from FIRE_PARAMS as in an input's action
+			list. A file must be relative, without "..". With wait, the default, the reply comes
+			once the action has run, or with its error.
+		{"cmd": "input", "input": name, "status": status, "startup": false}
+			Acts as if the input changed to status.
+	Events have "event", "panel", "ts" (time.monotonic()), "time" (time.time()), and the
+	journal's fields by name:
+		status: input, status, startup, delta
+		dispatch: id, output, action, input
+		result: id, output, outcome, seconds
+	A "dropped" event with a count comes before the next event after any were dropped.
+	"""
+	def __init__(self, panels, socket=None, port=None, host='127.0.0.1', socket_mode=0o660, max_queue=MAX_QUEUE, token=None, metrics=None, log_level=4):
+		self._log_level = log_level
+		if type(panels) is not dict or not panels:
+			raise TypeError("Invalid panels dictionary")
+		if port is None and socket is None:
+			raise ValueError("Control API needs a port or a socket")
+		if port is not None and (type(port) is not int or not 0 <= port < 65536):
+			raise ValueError("Invalid control API port {}".format(port))
+		if socket is not None and type(socket) is not str:
+			raise TypeError("Invalid control API socket {}".format(socket))
+		if type(socket_mode) is not int:
+			raise TypeError("Invalid control API socket_mode {}".format(socket_mode))
+		if type(max_queue) is not int or max_queue < 1:
+			raise ValueError("Invalid control API max_queue {}".format(max_queue))
+		if token is not None and (type(token) is not str or not token):
+			raise TypeError("Invalid control API token")
+		self._panels = panels
+		self._socket = socket
+		self._port = port
+		self._host = host
+		self._socket_mode = socket_mode
+		self._max_queue = max_queue
+		self._token = token
+		self._loop = None
+		self._thread = None
+		self._servers = []
+		self._error = None
+		self._clients = set()
+		self._subscribers = []
+		self._observers = {}
+		self._inbox = collections.deque()
+		self._wake_pending = False
+		self._wall_offset = 0.0
+		self._commands = {
+			"ping": self.command_ping,
+			"auth": self.command_auth,
+			"panels": self.command_panels,
+			"state": self.command_state,
+			"subscribe": self.command_subscribe,
+			"unsubscribe": self.command_unsubscribe,
+			"fire": self.command_fire,
+			"input": self.command_input
+		}
+
+		self._dropped = None
+		if metrics is not None:
+			metrics.gauge('pi_control_api_clients', 'Connected control API clients', lambda: len(self._clients))
+			metrics.gauge('pi_control_api_subscribers', 'Control API clients streaming events', lambda: len(self._subscribers))
+			self._dropped = metrics.counter('pi_control_api_dropped_total', 'Events dropped because a control API client fell behind')
+
+	@property
+	def addresses(self):
+		addresses = []
+		for server in self._servers:
+			for sock in server.sockets or ():
+				addresses.append(sock.getsockname())
+		return addresses
+
+	def start(self):
+		if self._thread:
+			return
+		self._error = None
+		ready = threading.Event()
+		self._thread = threading.Thread(target=self.run, args=(ready,), name='api', daemon=True)
+		self._thread.start()
+		ready.wait()
+		if self._error:
+			self._thread.join()
+			self._thread = None
+			raise self._error
+		for name, panel in self._panels.items():
+			self._observers[name] = functools.partial(self.publish, name)
+			panel.add_observer(self._observers[name])
+		self.log("Serving the control API on {}", 'info', self.addresses)
+
+	def stop(self):
+		if not self._thread:
+			return
+		for name, observer in self._observers.items():
+			self._panels[name].remove_observer(observer)
+		self._observers = {}
+		self._loop.call_soon_threadsafe(self._loop.stop)
+		self._thread.join(5.0)
+		self._thread = None
+		if self._socket and os.path.exists(self._socket):
+			os.unlink(self._socket)
+
+	def run(self, ready):
+		loop = asyncio.new_event_loop()
+		asyncio.set_event_loop(loop)
+		self._wall_offset = time.time() - time.monotonic()
+		try:
+			if self._socket:
+				if os.path.exists(self._socket):
+					os.unlink(self._socket)
+				self._servers.append(loop.run_until_complete(asyncio.start_unix_server(functools.partial(self.handle, trusted=True), path=self._socket, limit=MAX_LINE, backlog=BACKLOG)))
+				os.chmod(self._socket, self._socket_mode)
+			if self._port is not None:
+				self._servers.append(loop.run_until_complete(asyncio.start_server(self.handle, self._host, self._port, limit=MAX_LINE, backlog=BACKLOG)))
+		except Exception as err:
+			self._error = err
+			for server in self._servers:
+				server.close()
+			self._servers = []
+			loop.close()
+			ready.set()
+			return
+		self._loop = loop
+		ready.set()
+		loop.run_forever()
+
+		# Closing each connection ends its handler; give them a moment before cancelling
+		for server in self._servers:
+			server.close()
+		for client in list(self._clients):
+			client.close()
+			client.writer.transport.abort()
+		tasks = asyncio.all_tasks(loop)
+		if tasks:
+			loop.run_until_complete(asyncio.wait(tasks, timeout=1.0))
+		tasks = asyncio.all_tasks(loop)
+		for task in tasks:
+			task.cancel()
+		loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+		loop.close()
+		self._servers = []
+		self._clients = set()
+		self._subscribers = []
+		self._inbox.clear()
+		self._wake_pending = False
+		self._loop = None
+
+	"""
+	Panel observer, called on whatever thread the event happened on. Only queues the event.
+	"""
+	def publish(self, panel_name, kind, ts, fields):
+		if not self._subscribers:
+			return
+		if len(self._inbox) >= MAX_INBOX:
+			if self._dropped:
+				self._dropped.inc()
+			return
+		self._inbox.append((panel_name, kind, ts, fields))
+		if not self._wake_pending:
+			self._wake_pending = True
+			loop = self._loop
+			if loop:
+				try:
+					loop.call_soon_threadsafe(self.deliver)
+				except RuntimeError:
+					pass
+
+	def deliver(self):
+		# Cleared before draining, so an event queued during the drain wakes the loop again
+		self._wake_pending = False
+		batch = []
+		while self._inbox:
+			panel_name, kind, ts, fields = self._inbox.popleft()
+			message = { "event": kind, "panel": panel_name, "ts": ts, "time": ts + self._wall_offset }
+			message.update(zip(EVENT_FIELDS[kind], fields))
+			batch.append((panel_name, kind, encode(message)))
+		if not batch:
+			return
+		# Each client gets the whole batch in one go; most want every event
+		everything = [line for panel_name, kind, line in batch]
+		dropped = 0
+		for client in self._subscribers:
+			if client.panels is None and len(client.events) == len(EVENTS):
+				lines = everything
+			else:
+				lines = [line for panel_name, kind, line in batch if client.wants(panel_name, kind)]
+			if lines:
+				dropped += client.push(lines)
+		if dropped and self._dropped:
+			self._dropped.inc(dropped)
+
+	async def handle(self, reader, writer, trusted=False):
+		client = Client(writer, self._max_queue, trusted)
+		self._clients.add(client)
+		sender = asyncio.ensure_future(self.send(client))
+		try:
+			while not client.closed:
+				try:
+					line = await reader.readline()
+				except ValueError:
+					client.reply(encode({ "ok": False, "error": "Request longer than {} bytes".format(MAX_LINE) }))
+					break
+				if not line:
+					break
+				if line.strip():
+					self.command(client, line)
+		except (ConnectionError, OSError, asyncio.CancelledError):
+			pass
+		finally:
+			self.unsubscribe(client)
+			self._clients.discard(client)
+			client.close()
+			try:
+				await asyncio.wait_for(sender, 1.0)
+			except (Exception, asyncio.CancelledError):
+				sender.cancel()
+			writer.close()
+
+	async def send(self, client):
+		writer = client.writer
+		try:
+			while True:
+				await client.ready.wait()
+				client.ready.clear()
+				chunks = []
+				while client.replies:
+					chunks.append(client.replies.popleft())
+				if client.dropped:
+					chunks.append(encode({ "event": "dropped", "count": client.dropped }))
+					client.dropped = 0
+				while client.queue:
+					chunks.append(client.queue.popleft())
+				if chunks:
+					writer.write(b''.join(chunks))
+					await writer.drain()
+				if client.closed:
+					return
+		except (ConnectionError, OSError):
+			client.close()
+
+	def command(self, client, line):
+		message = {}
+		try:
+			message = json.loads(line.decode('utf-8'))
+			if type(message) is not dict:
+				message = {}
+				raise ValueError("Requests must be JSON objects")
+			handler = self._commands.get(message.get('cmd'))
+			if handler is None:
+				raise ValueError("Unknown command {}".format(message.get('cmd')))
+			if message['cmd'] in TRUSTED_COMMANDS and not client.trusted:
+				raise PermissionError("{} needs auth first".format(message['cmd']))
+			reply = handler(client, message)
+		except Exception as err:
+			self.respond(client, message, error=err)
+			return
+		if isinstance(reply, concurrent.futures.Future):
+			asyncio.ensure_future(self.finish(client, message, reply))
+			return
+		self.respond(client, message, reply)
+
+	async def finish(self, client, message, future):
+		try:
+			await asyncio.wrap_future(future)
+		except Exception as err:
+			self.respond(client, message, error=err)
+			return
+		self.respond(client, message)
+
+	def respond(self, client, message, reply=None, error=None):
+		reply = dict(reply or {})
+		reply['ok'] = error is None
+		if error is not None:
+			reply['error'] = str(error) or type(error).__name__
+		if 'id' in message:
+			reply['id'] = message['id']
+		if message.get('cmd'):
+			reply['cmd'] = message['cmd']
+		if not client.closed:
+			client.reply(encode(reply))
+
+	def get_panel(self, message):
+		name = message.get('panel')
+		if name is None:
+			if len(self._panels) != 1:
+				raise ValueError("panel is required")
+			return next(iter(self._panels.values()))
+		if name not in self._panels:
+			raise ValueError("Panel {} not found".format(name))
+		return self._panels[name]
+
+	def get_names(self, message):
+		if message.get('panel') is not None:
+			self.get_panel(message)
+			return [message['panel']]
+		return list(self._panels)
+
+	def unsubscribe(self, client):
+		if client.subscribed:
+			client.events = None
+			self._subscribers = [item for item in self._subscribers if item is not client]
+
+	def command_ping(self, client, message):
+		return None
+
+	def command_auth(self, client, message):
+		token = message.get('token')
+		if self._token is None:
+			raise PermissionError("No token is set for the control API")
+		if type(token) is not str or not hmac.compare_digest(token.encode('utf-8'), self._token.encode('utf-8')):
+			raise PermissionError("Invalid token")
+		client.trusted = True
+		return None
+
+	def command_panels(self, client, message):
+		panels = {}
+		for name in self.get_names(message):
+			panel = self._panels[name]
+			inputs = {}
+			for input_name, device in list(panel.inputs.items()):
+				plan = panel.get_plan(input_name)
+				inputs[input_name] = { "type": device.type, "statuses": list(plan.statuses) if plan else [] }
+			outputs = { output_name: { "type": device.type } for output_name, device in list(panel.outputs.items()) }
+			panels[name] = { "inputs": inputs, "outputs": outputs }
+		return { "panels": panels }
+
+	def panel_state(self, panel):
+		return {
+			"inputs": { name: device.snapshot() for name, device in list(panel.inputs.items()) },
+			"outputs": { name: device.snapshot() for name, device in list(panel.outputs.items()) }
+		}
+
+	def command_state(self, client, message):
+		return { "panels": { name: self.panel_state(self._panels[name]) for name in self.get_names(message) } }
+
+	def command_subscribe(self, client, message):
+		events = message.get('events', EVENTS)
+		if type(events) is not list or any(kind not in EVENTS for kind in events):
+			raise ValueError("events must be a list of {}".format(", ".join(EVENTS)))
+		panels = message.get('panels')
+		if panels is not None:
+			if type(panels) is not list:
+				raise TypeError("panels must be a list")
+			for name in panels:
+				if name not in self._panels:
+					raise ValueError("Panel {} not found".format(name))
+			panels = set(panels)
+		was_subscribed = client.subscribed
+		client.events = set(events)
+		client.panels = panels
+		if not was_subscribed:
+			self._subscribers = self._subscribers + [client]
+		if message.get('state'):
+			now = time.monotonic()
+			for name, panel in self._panels.items():
+				if panels is None or name in panels:
+					event = { "event": "state", "panel": name, "ts": now, "time": now + self._wall_offset }
+					event.update(self.panel_state(panel))
+					client.push([encode(event)])
+		return None
+
+	def command_unsubscribe(self, client, message):
+		self.unsubscribe(client)
+		return None
+
+	def command_fire(self, client, message):
+		panel = self.get_panel(message)
+		params = message.get('params') or {}
+		if type(message.get('output')) is not str:
+			raise TypeError("output is required")
+		if type(params) is not dict:
+			raise TypeError("params must be an object")
+		for key in params:
+			if key not in FIRE_PARAMS:
+				raise ValueError("{} can't be set with fire; params are {}".format(key, ", ".join(FIRE_PARAMS)))
+		if 'file' in params:
+			file = params['file']
+			if type(file) is not str or os.path.isabs(file) or '..' in file.replace('\\', '/').split('/'):
+				raise ValueError("file must be a relative path without ..")
+		future = panel.fire_output(message['output'], params)
+		if message.get('wait', True):
+			return future
+		return None
+
+	def command_input(self, client, message):
+		panel = self.get_panel(message)
+		name = message.get('input')
+		device = panel.get_input(name) if type(name) is str else None
+		if device is None:
+			raise ValueError("Input {} not found".format(name))
+		if 'status' not in message:
+			raise ValueError("status is required")
+		status = message['status']
+		plan = panel.get_plan(name)
+		if plan and plan.statuses and status not in plan.statuses:
+			raise ValueError("Unknown status {} for {}; expected one of {}".format(status, name, ", ".join(str(item) for item in plan.statuses)))
+		device.inject(status, bool(message.get('startup', False)))
+		return None
@@ -0,0 +1,361 @@
+# print("Loaded pi_control audio module")
+
+import array
+import re
+import subprocess
+import threading
+import time
+import warnings
+import wave
+
+import pi_control.log
+
+# audioop does the resampling and mixing in C; it's deprecated in 3.11 and gone in 3.13
+try:
+	with warnings.catch_warnings():
+		warnings.simplefilter('ignore', DeprecationWarning)
+		import audioop
+except ImportError:
+	audioop = None
+
+"""
+2026-10-18 Persistent audio engine with a decoded sample cache. Replaces aplay/mpg123 per sound.
+2026-10-18 One engine per sink rather than per process, so panels in a host can use different sinks.
+
+Everything is converted to one format when loaded, so playing a sound is only mixing cached
+PCM into the next block written to a single long-lived output stream.
+"""
+
+"""
+import pi_control.audio
+"""
+
+RATE = 44100
+CHANNELS = 2
+WIDTH = 2
+FRAME_BYTES = CHANNELS * WIDTH
+
+
+def decode(path):
+	if re.search(r'\.mp3$', path, re.IGNORECASE):
+		return decode_mp3(path)
+	elif re.search(r'\.wav$', path, re.IGNORECASE):
+		return decode_wav(path)
+	raise ValueError("Unsupported sound file {}".format(path))
+
+def decode_mp3(path):
+	cmd = ['mpg123', '-q', '-s', '-e', 's16', '-r', str(RATE), '--stereo', path]
+	result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+	return result.stdout
+
+def decode_wav(path):
+	with wave.open(path, 'rb') as file:
+		channels = file.getnchannels()
+		width = file.getsampwidth()
+		rate = file.getframerate()
+		data = file.readframes(file.getnframes())
+	if (channels, width, rate) == (CHANNELS, WIDTH, RATE):
+		return data
+	if not audioop:
+		raise ValueError("{} must be {} Hz, {} channel, {} bit without audioop".format(path, RATE, CHANNELS, WIDTH * 8))
+	if width == 1:
+		data = audioop.bias(data, 1, -128)
+	if width != WIDTH:
+		data = audioop.lin2lin(data, width, WIDTH)
+	if channels == 2 and CHANNELS == 1:
+		data = audioop.tomono(data, WIDTH, 0.5, 0.5)
+	elif channels == 1 and CHANNELS == 2:
+		data = audioop.tostereo(data, WIDTH, 1, 1)
+	if rate != RATE:
+		data, state = audioop.ratecv(data, WIDTH, CHANNELS, rate, RATE, None)
+	return data
+
+def mix(blocks):
+	if len(blocks) == 1:
+		return blocks[0]
+	if audioop:
+		data = blocks[0]
+		for block in blocks[1:]:
+			data = audioop.add(data, block, WIDTH)
+		return data
+	total = array.array('h', blocks[0])
+	for block in blocks[1:]:
+		samples = array.array('h', block)
+		for i in range(len(total)):
+			value = total[i] + samples[i]
+			total[i] = 32767 if value > 32767 else -32768 if value < -32768 else value
+	return total.tobytes()
+
+
+"""
+Sinks
+"""
+
+class NullSink:
+	"""
+	sink = pi_control.audio.NullSink(realtime=True)
+
+	Discards audio. With realtime, write() blocks for the block's duration like a sound card would.
+	"""
+	def __init__(self, realtime=True):
+		self._realtime = realtime
+		self._next_ts = None
+		self.bytes_written = 0
+
+	def write(self, data):
+		self.bytes_written += len(data)
+		if not self._realtime:
+			return
+		now = time.monotonic()
+		if self._next_ts is None or self._next_ts < now:
+			self._next_ts = now
+		self._next_ts += len(data) / FRAME_BYTES / RATE
+		wait = self._next_ts - now
+		if wait > 0:
+			time.sleep(wait)
+
+	def idle(self):
+		self._next_ts = None
+
+	def close(self):
+		pass
+
+
+class FileSink(NullSink):
+	"""
+	sink = pi_control.audio.FileSink(path, realtime=False)
+
+	Writes everything played to a WAV file, for testing without a sound card.
+	"""
+	def __init__(self, path, realtime=False):
+		super().__init__(realtime)
+		self._file = wave.open(path, 'wb')
+		self._file.setnchannels(CHANNELS)
+		self._file.setsampwidth(WIDTH)
+		self._file.setframerate(RATE)
+
+	def write(self, data):
+		self._file.writeframesraw(data)
+		super().write(data)
+
+	def close(self):
+		self._file.close()
+
+
+class AlsaSink:
+	"""
+	sink = pi_control.audio.AlsaSink(device=None)
+
+	Keeps one aplay process open and streams raw PCM to it. aplay is restarted if it exits.
+	"""
+	def __init__(self, device=None):
+		self._device = device
+		self._process = None
+
+	def open(self):
+		cmd = ['aplay', '-q', '-t', 'raw', '-f', 'S16_LE', '-r', str(RATE), '-c', str(CHANNELS)]
+		if self._device:
+			cmd += ['-D', self._device]
+		self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+	def write(self, data):
+		if not self._process or self._process.poll() is not None:
+			self.open()
+		try:
+			self._process.stdin.write(data)
+			self._process.stdin.flush()
+		except BrokenPipeError:
+			self._process = None
+
+	def idle(self):
+		pass
+
+	def close(self):
+		if self._process:
+			self._process.stdin.close()
+			self._process.wait()
+			self._process = None
+
+
+def get_sink(settings={}):
+	sink = settings.get('sink', 'alsa')
+	if sink == 'alsa':
+		return AlsaSink(settings.get('device'))
+	elif sink == 'file':
+		if 'path' not in settings:
+			raise AttributeError("path is required for the file audio sink")
+		return FileSink(settings['path'], realtime=bool(settings.get('realtime', False)))
+	elif sink == 'null':
+		return NullSink(realtime=bool(settings.get('realtime', True)))
+	raise ValueError("Invalid audio sink {}".format(sink))
+
+
+"""
+Engine
+"""
+
+class Voice:
+	def __init__(self, name, data, queued_ts):
+		self.name = name
+		self.data = data
+		self.position = 0
+		self.queued_ts = queued_ts
+		self.started_ts = None
+		self.stopped = False
+
+	def stop(self):
+		self.stopped = True
+
+
+class AudioEngine(pi_control.log.Logger):
+	"""
+	engine = pi_control.audio.AudioEngine(sink)
+	engine.load(path)
+	voice = engine.play(path)
+	engine.latency
+	"""
+	def __init__(self, sink=None, block_frames=512, log_level=4):
+		self._log_level = log_level
+		self._sink = sink if sink else AlsaSink()
+		self._block_bytes = block_frames * FRAME_BYTES
+		self._samples = {}
+		self._voices = []
+		self._condition = threading.Condition()
+		self._stopped = False
+		self._thread = None
+
+		# Time from play() to the first block with that sound handed to the sink
+		self._latencies = []
+		self.last_latency = None
+
+	@property
+	def sink(self):
+		return self._sink
+
+	@property
+	def samples(self):
+		return self._samples
+
+	@property
+	def latency(self):
+		latencies = sorted(self._latencies)
+		if not latencies:
+			return {}
+		return {
+			"count": len(latencies),
+			"last": self.last_latency,
+			"min": latencies[0],
+			"p50": latencies[len(latencies) // 2],
+			"max": latencies[-1]
+		}
+
+	def load(self, path):
+		if path in self._samples:
+			return self._samples[path]
+		start = time.monotonic()
+		data = decode(path)
+		data = data[:len(data) - len(data) % FRAME_BYTES]
+		self._samples[path] = data
+		self.log("Loaded {} in {:.1f}ms", 'info', path, (time.monotonic() - start) * 1000)
+		return data
+
+	def play(self, path):
+		queued_ts = time.perf_counter()
+		data = self._samples.get(path)
+		if data is None:
+			self.log("{} was not preloaded", 'warn', path)
+			data = self.load(path)
+		voice = Voice(path, data, queued_ts)
+		with self._condition:
+			self._voices.append(voice)
+			self._condition.notify()
+		if not self._thread:
+			self.start()
+		return voice
+
+	def start(self):
+		with self._condition:
+			if self._thread:
+				return
+			self._stopped = False
+			self._thread = threading.Thread(target=self.run, name='audio', daemon=True)
+			self._thread.start()
+
+	def stop(self):
+		with self._condition:
+			self._stopped = True
+			self._condition.notify_all()
+		if self._thread:
+			self._thread.join()
+			self._thread = None
+		self._sink.close()
+
+	def next_block(self):
+		size = self._block_bytes
+		with self._condition:
+			while not self._voices and not self._stopped:
+				self._sink.idle()
+				self._condition.wait()
+			if self._stopped:
+				return None, []
+			voices = list(self._voices)
+		blocks = []
+		starting = []
+		for voice in voices:
+			if voice.stopped:
+				continue
+			block = voice.data[voice.position:voice.position + size]
+			if voice.position == 0:
+				starting.append(voice)
+			voice.position += size
+			if len(block) < size:
+				block += bytes(size - len(block))
+			blocks.append(block)
+		with self._condition:
+			self._voices = [voice for voice in self._voices if not voice.stopped and voice.position < len(voice.data)]
+		if not blocks:
+			return bytes(size), []
+		return mix(blocks), starting
+
+	def run(self):
+		while True:
+			block, starting = self.next_block()
+			if block is None:
+				return True
+			if starting:
+				now = time.perf_counter()
+				for voice in starting:
+					voice.started_ts = now
+					self.last_latency = now - voice.queued_ts
+					self._latencies.append(self.last_latency)
+				del self._latencies[:-1000]
+			self._sink.write(block)
+
+
+# { sink key: (settings, engine) }
+_engines = {}
+_engine_lock = threading.Lock()
+
+def sink_key(settings):
+	sink = settings.get('sink', 'alsa')
+	if sink == 'alsa':
+		return (sink, settings.get('device'))
+	return (sink, settings.get('path'))
+
+"""
+engine = pi_control.audio.get_engine(settings={}, log_level=4)
+	One engine per sink, so panels sharing a process share a sound card but can play to
+	different ones. Settings that differ from the engine already on that sink are logged and
+	ignored.
+"""
+def get_engine(settings={}, log_level=4):
+	key = sink_key(settings)
+	with _engine_lock:
+		if key in _engines:
+			engine_settings, engine = _engines[key]
+			if settings != engine_settings:
+				engine.log("Audio settings {} differ from {} already used for this sink; keeping those", 'warn', settings, engine_settings)
+			return engine
+		engine = AudioEngine(get_sink(settings), int(settings.get('block_frames', 512)), log_level=log_level)
+		_engines[key] = (dict(settings), engine)
+		return engine
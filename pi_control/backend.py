@@ -0,0 +1,82 @@
+# print("Loaded pi_control backend module")
+
+"""
+2026-10-18 Pluggable hardware backend. Devices build pins, buses, and drivers through a backend
+so the same control.yml can drive real hardware or pi_control.simulated.
+
+Hardware libraries are imported the first time a device needs them.
+"""
+
+"""
+import pi_control.backend
+backend = pi_control.backend.get_backend('hardware' || 'simulated')
+"""
+
+class HardwareBackend:
+	"""
+	backend = pi_control.backend.HardwareBackend()
+	"""
+	name = 'hardware'
+
+	def button(self, pin, pull_up=True, hold_time=None):
+		import gpiozero
+		if hold_time is None:
+			return gpiozero.Button(pin, pull_up=pull_up)
+		return gpiozero.Button(pin, pull_up=pull_up, hold_time=hold_time)
+
+	def pwm_led(self, pin):
+		import gpiozero
+		return gpiozero.PWMLED(pin)
+
+	def rotary_encoder(self, pin_a, pin_b):
+		import gpiozero
+		return gpiozero.RotaryEncoder(pin_a, pin_b)
+
+	def adc(self, chip, channel, port=0, device=0):
+		import gpiozero
+		return getattr(gpiozero, chip.upper())(channel=channel, port=port, device=device)
+
+	def spi(self, port=0, device=0, speed=1000000):
+		import spidev
+		spi = spidev.SpiDev()
+		spi.open(port, device)
+		spi.max_speed_hz = speed
+		return spi
+
+	def i2c(self):
+		import board
+		import busio
+		return busio.I2C(board.SCL, board.SDA)
+
+	def drv2605(self, i2c):
+		import adafruit_drv2605
+		return adafruit_drv2605.DRV2605(i2c)
+
+	def haptic_effect(self, effect):
+		import adafruit_drv2605
+		return adafruit_drv2605.Effect(effect)
+
+	def sns(self):
+		import boto3
+		return boto3.client('sns')
+
+	def close(self):
+		pass
+
+
+BACKENDS = ['hardware', 'simulated']
+
+_backends = {}
+
+def get_backend(backend='hardware', log_level=4):
+	if type(backend) is not str:
+		return backend
+	if backend not in BACKENDS:
+		raise ValueError("Invalid backend {}".format(backend))
+	if backend not in _backends:
+		if backend == 'simulated':
+			import pi_control.simulated
+			_backends[backend] = pi_control.simulated.SimulatedBackend(log_level=log_level)
+		else:
+			_backends[backend] = HardwareBackend()
+	return _backends[backend]
@@ -0,0 +1,230 @@
+# print("Loaded pi_control bus module")
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 One shared, locked handle per physical bus for the whole process.
+2026-10-18 Handles are reference counted, so one panel stopping doesn't close another's bus.
+2026-10-18 A bus keeps the tick it was opened with instead of taking the last caller's.
+
+Devices on the same bus used to open their own busio.I2C and could talk over each other. Now
+every transfer goes through the bus lock, and writes queued with submit() are collected for
+one tick and run back to back in a single hold of the bus. A newer write with the same key
+replaces one still waiting in the batch.
+"""
+
+"""
+import pi_control.bus
+bus = pi_control.bus.get_bus(backend, 'i2c')
+pi_control.bus.release_bus(bus)
+"""
+
+BUSES = ['i2c']
+
+# Seconds a batch stays open for more writes once the first one arrives
+DEFAULT_TICK = 0.002
+
+
+class Write:
+	__slots__ = ('function', 'args', 'futures')
+
+	def __init__(self, function, args, future):
+		self.function = function
+		self.args = args
+		self.futures = [future]
+
+
+class Bus(pi_control.log.Logger):
+	"""
+	bus = pi_control.bus.Bus(name, handle, tick=0.002)
+	with bus:
+		driver.read()
+	result = bus.run(function, *args)
+	future = bus.submit(function, *args, key=None)
+	"""
+	def __init__(self, name, handle, tick=DEFAULT_TICK, log_level=4):
+		self._log_level = log_level
+		if type(tick) is not int and type(tick) is not float or tick < 0:
+			raise ValueError("Invalid bus tick {}".format(tick))
+		self._name = name
+		self._handle = handle
+		self._tick = float(tick)
+		self._lock = threading.RLock()
+		self._condition = threading.Condition()
+		self._pending = collections.OrderedDict()
+		self._thread = None
+		self._running = False
+		self._writes = 0
+		self._batches = 0
+		self._replaced = 0
+		self._busy_time = 0.0
+
+	@property
+	def name(self):
+		return self._name
+
+	@property
+	def handle(self):
+		return self._handle
+
+	@property
+	def tick(self):
+		return self._tick
+
+	@tick.setter
+	def tick(self, tick):
+		if type(tick) is not int and type(tick) is not float or tick < 0:
+			raise ValueError("Invalid bus tick {}".format(tick))
+		self._tick = float(tick)
+
+	@property
+	def stats(self):
+		return {
+			"writes": self._writes,
+			"batches": self._batches,
+			"replaced": self._replaced,
+			"writes_per_batch": self._writes / self._batches if self._batches else 0.0,
+			"busy_time": self._busy_time
+		}
+
+	def __enter__(self):
+		self._lock.acquire()
+		return self._handle
+
+	def __exit__(self, *args):
+		self._lock.release()
+
+	"""
+	result = bus.run(function, *args)
+		Runs a transfer now, holding the bus.
+	"""
+	def run(self, function, *args):
+		with self._lock:
+			return function(*args)
+
+	"""
+	future = bus.submit(function, *args, key=None)
+		Queues a write for the next batch. With a key, a write still waiting under the same key
+		is replaced and both futures resolve with the newer write's result.
+	"""
+	def submit(self, function, *args, key=None):
+		future = concurrent.futures.Future()
+		with self._condition:
+			if not self._running:
+				self.start()
+			if key is None:
+				key = object()
+			write = self._pending.get(key)
+			if write:
+				write.function = function
+				write.args = args
+				write.futures.append(future)
+				self._replaced += 1
+			else:
+				self._pending[key] = Write(function, args, future)
+			self._condition.notify()
+		return future
+
+	def start(self):
+		with self._condition:
+			if self._running:
+				return
+			self._running = True
+			self._thread = threading.Thread(target=self.loop, name=self._name + '-bus', daemon=True)
+			self._thread.start()
+
+	def stop(self, timeout=1.0):
+		with self._condition:
+			self._running = False
+			self._condition.notify()
+		if self._thread and self._thread is not threading.current_thread():
+			self._thread.join(timeout)
+		self._thread = None
+
+	def loop(self):
+		while True:
+			with self._condition:
+				while self._running and not self._pending:
+					self._condition.wait()
+				if not self._running and not self._pending:
+					return
+			# Give writes fired by the same event a tick to join the batch
+			if self._tick:
+				time.sleep(self._tick)
+			with self._condition:
+				batch = list(self._pending.values())
+				self._pending.clear()
+			self.flush(batch)
+
+	def flush(self, batch):
+		start = time.perf_counter()
+		with self._lock:
+			for write in batch:
+				try:
+					result = write.function(*write.args)
+				except Exception as err:
+					self.log("{} write failed: {}", 'error', self._name, err)
+					for future in write.futures:
+						future.set_exception(err)
+					continue
+				for future in write.futures:
+					future.set_result(result)
+		self._busy_time += time.perf_counter() - start
+		self._writes += len(batch)
+		self._batches += 1
+
+	def close(self):
+		self.stop()
+		with self._lock:
+			if hasattr(self._handle, 'deinit'):
+				self._handle.deinit()
+
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+"""
+bus = pi_control.bus.get_bus(backend, name='i2c', tick=0.002)
+	The first call for a backend and bus opens the handle and sets its tick; later calls share
+	it, and a different tick is logged and ignored. Each call takes a reference, and the
+	handle is closed once release_bus() has been called as many times.
+"""
+def get_bus(backend, name='i2c', tick=None, log_level=4):
+	if name not in BUSES:
+		raise ValueError("Invalid source bus {}".format(name))
+	key = (id(backend), name)
+	with _buses_lock:
+		if key in _buses:
+			entry = _buses[key]
+			entry[2] += 1
+			if tick is not None and tick != entry[1].tick:
+				entry[1].log("{} is shared with a tick of {}s; ignoring {}s", 'warn', name, entry[1].tick, tick)
+			return entry[1]
+		bus = Bus(name, getattr(backend, name)(), tick=DEFAULT_TICK if tick is None else tick, log_level=log_level)
+		# Keep the backend alive so its id() can't be reused by another backend
+		_buses[key] = [backend, bus, 1]
+		return bus
+
+
+def release_bus(bus):
+	with _buses_lock:
+		for key, entry in list(_buses.items()):
+			if entry[1] is bus:
+				entry[2] -= 1
+				if entry[2] <= 0:
+					bus.close()
+					del _buses[key]
+				return
+
+
+def close_buses(backend=None):
+	with _buses_lock:
+		for key, (owner, bus, refs) in list(_buses.items()):
+			if backend is None or owner is backend:
+				bus.close()
+				del _buses[key]
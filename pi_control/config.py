@@ -0,0 +1,129 @@
+# print("Loaded pi_control config module")
+
+import hashlib
+import marshal
+import os
+import sys
+
+import pi_control.device
+import pi_control.log
+
+"""
+2026-10-18 Loads control.yml through a compiled cache.
+
+The parsed, checked, and normalized config is stored with marshal next to the config file,
+keyed by a SHA-256 of the file's contents. When the hash matches, boot skips YAML entirely,
+including the yaml import. Otherwise the file is parsed with the C loader when PyYAML has
+one, and the cache is rewritten.
+"""
+
+"""
+import pi_control.config
+devices, cached = pi_control.config.load_config(path)
+"""
+
+CACHE_MAGIC = b'PICF\x01'
+SECTIONS = ('panel', 'expanders', 'outputs', 'inputs')
+
+
+def cache_path_for(path):
+	directory, name = os.path.split(os.path.abspath(path))
+	return os.path.join(directory, '.' + name + '.cache')
+
+
+def content_key(content):
+	digest = hashlib.sha256(content)
+	# A cache written by another Python may not load the same way
+	digest.update("{}.{}".format(*sys.version_info[:2]).encode())
+	return digest.digest()
+
+
+def parse_yaml(content):
+	import yaml
+	loader = getattr(yaml, 'CFullLoader', None) or yaml.FullLoader
+	return yaml.load(content, Loader=loader)
+
+
+"""
+devices = pi_control.config.normalize(devices)
+	Checks the layout Panel relies on and fills in empty sections. Device options are checked
+	by each driver when the panel builds it.
+"""
+def normalize(devices):
+	if type(devices) is not dict or not len(devices):
+		raise ValueError("Config is empty")
+	for section in SECTIONS:
+		if devices.get(section) is None:
+			devices[section] = {}
+		if type(devices[section]) is not dict:
+			raise TypeError("Invalid {} section".format(section))
+
+	for section, parent in (('expanders', None), ('outputs', 'output'), ('inputs', 'input')):
+		for name, device_info in devices[section].items():
+			if type(device_info) is not dict:
+				raise TypeError("Invalid settings for {} {}".format(section[:-1], name))
+			if 'type' not in device_info or type(device_info['type']) is not str:
+				raise AttributeError("{} {} is missing a valid type".format(section[:-1].capitalize(), name))
+			if parent and device_info['type'] not in pi_control.device.DRIVERS[parent]:
+				raise ValueError("Device type {} not found".format(device_info['type']))
+	return devices
+
+
+def read_cache(cache_path, key):
+	try:
+		with open(cache_path, 'rb') as file:
+			data = file.read()
+	except OSError:
+		return None
+	header = CACHE_MAGIC + key
+	if not data.startswith(header):
+		return None
+	try:
+		return marshal.loads(data[len(header):])
+	except (EOFError, ValueError, TypeError):
+		return None
+
+
+def write_cache(cache_path, key, devices):
+	try:
+		data = CACHE_MAGIC + key + marshal.dumps(devices)
+	except ValueError:
+		# Tags like !!timestamp load as objects marshal can't store
+		return False
+	tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+	try:
+		with open(tmp_path, 'wb') as file:
+			file.write(data)
+		os.replace(tmp_path, cache_path)
+	except OSError:
+		if os.path.exists(tmp_path):
+			os.unlink(tmp_path)
+		return False
+	return True
+
+
+"""
+devices, cached = pi_control.config.load_config(path, cache_path=None)
+	cached is True when the config came from the cache. cache_path defaults to
+	.{config name}.cache beside the config; pass False to skip the cache.
+"""
+def load_config(path, cache_path=None, log_level=4):
+	logger = pi_control.log.Logger()
+	logger._log_level = log_level
+
+	with open(path, 'rb') as file:
+		content = file.read()
+	if cache_path is None:
+		cache_path = cache_path_for(path)
+
+	key = content_key(content)
+	if cache_path:
+		devices = read_cache(cache_path, key)
+		if devices is not None:
+			logger.log("Loaded {} from {}", 'info', path, cache_path)
+			return devices, True
+
+	devices = normalize(parse_yaml(content))
+	if cache_path and not write_cache(cache_path, key, devices):
+		logger.log("Unable to write config cache {}", 'info', cache_path)
+	return devices, False
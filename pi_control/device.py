@@ -1,19 +1,20 @@
 print("Loaded pi_control device module")
 
-import adafruit_drv2605
-import board
-import boto3
-import busio
-import gpiozero
-import inspect
+import array
+import bisect
+import hashlib
+import importlib
 import json
-import os
-import random
-import re
+import sys
 import threading
 import time
 
 import pi_control.__init__
+import pi_control.backend
+import pi_control.bus
+import pi_control.log
+import pi_control.ratelimit
+import pi_control.timers
 
 """
 2021-12-30 Added debounce, timed checks after debounce, threading on output, canceling threads, init devices.
@@ -25,13 +26,32 @@ import pi_control.__init__
 2022-01-08 Added HTTP, Message, and Sound outputs.
 2022-01-08 Added Haptic device.
 2023-03-29 Improved logging.
+2026-10-18 Moved logging to pi_control.log; level is checked before any formatting.
+2026-10-18 HTTP output uses a pooled keep-alive client instead of curl.
+2026-10-18 Sound output plays preloaded samples through the shared audio engine.
+2026-10-18 LED effects run on the shared animation engine instead of a thread each.
+2026-10-18 Split output action() into prepare() at startup and run() per event.
+2026-10-18 Potentiometer ranges are sorted numerically and found by bisection, with optional hysteresis.
+2026-10-18 ADC expanders own one SPI handle and burst-read all configured channels.
+2026-10-18 Pins, buses, and drivers come from a pluggable backend, real or simulated.
+2026-10-18 Inputs count changes skipped for no change or debounce in the panel's metrics.
+2026-10-18 Input and output types moved to pi_control.drivers and are imported only when a config uses them.
+2026-10-18 Devices on a source bus share one locked handle from pi_control.bus.
+2026-10-18 Added close() so the panel can rebuild a device on reload.
+2026-10-18 Debounce uses the monotonic clock, and re-checks run on the shared timer wheel instead of a thread each.
+2026-10-18 Outputs honor delay as a cooldown, or rate_limit and burst, with a drop, defer, or latest policy.
+2026-10-18 Outputs keep the state their last action requested so the dispatcher can skip repeats.
+2026-10-18 Added snapshot() and restore() for warm restarts, and current_status() on inputs.
+2026-10-18 Added inject() to act on an input status without the hardware, for replays.
+2026-10-18 Removed the output thread helpers, unused since LED effects moved to the animation engine.
+2026-10-18 change_status() and inject() pass an optional step delta through to the panel.
+2026-10-18 Output state can expire after dedupe_ttl seconds, and drivers can keep it out of the snapshot.
 
 To do:
 	Add I2C haptic driver
 	Add I2C MCP23xxx expander
 	Add rotary encoder w/ MCP23xxx
 	Consolidate last_status and last_action?
-	Add cooldown on actions
 	Add outputs
 		wait
 		print
@@ -51,16 +71,62 @@ Log levels:
 
 """
 import pi_control.device
+cls = pi_control.device.get_driver('input' || 'output', device_type)
 """
 
+# Device type to (module, class) for each kind of device in control.yml
+DRIVERS = {
+	'input': {
+		'button': ('pi_control.drivers.button', 'Button'),
+		'potentiometer': ('pi_control.drivers.potentiometer', 'Potentiometer'),
+		'rotary_encoder': ('pi_control.drivers.rotary_encoder', 'RotaryEncoder'),
+		'selector_switch': ('pi_control.drivers.selector_switch', 'SelectorSwitch')
+	},
+	'output': {
+		'led': ('pi_control.drivers.led', 'LED'),
+		'haptic': ('pi_control.drivers.haptic', 'Haptic'),
+		'http': ('pi_control.drivers.http_request', 'HTTP'),
+		'message': ('pi_control.drivers.message', 'Message'),
+		'sound': ('pi_control.drivers.sound', 'Sound')
+	}
+}
 
-class Device:
+# Seconds spent importing each driver module, for the panel's startup report
+driver_import_times = {}
+
+
+def get_driver(parent, device_type):
+	if parent not in DRIVERS:
+		raise ValueError("Invalid device kind {}".format(parent))
+	if device_type not in DRIVERS[parent]:
+		raise ValueError("Device type {} not found".format(device_type))
+	module_name, class_name = DRIVERS[parent][device_type]
+	module = sys.modules.get(module_name)
+	if module is None:
+		start = time.perf_counter()
+		module = importlib.import_module(module_name)
+		driver_import_times[module_name] = time.perf_counter() - start
+	return getattr(module, class_name)
+
+
+# Keeps pi_control.device.LED and friends working for existing scripts
+def __getattr__(name):
+	for drivers in DRIVERS.values():
+		for module_name, class_name in drivers.values():
+			if class_name == name:
+				return getattr(importlib.import_module(module_name), class_name)
+	raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+class Device(pi_control.log.Logger):
 	"""
 	device = pi_control.device.Device(name, args)
 	"""
 	def __init__(self, name, args={}, dry_run=False, log_level=4):
 		self._dry_run = dry_run
 		self._log_level = log_level
+		if log_level is None:
+			self._log_level = 4
 		
 		self._name = str(name)
 		self._type = 'device'
@@ -74,6 +140,12 @@ class Device:
 		if 'panel' in args:
 			self._panel = args['panel']
 		
+		# Pins, buses, and drivers come from the panel's backend
+		if self._panel:
+			self._backend = self._panel.backend
+		else:
+			self._backend = pi_control.backend.get_backend(args.get('backend', 'hardware'))
+		
 		self._gpio_pin = None
 		if 'gpio_pin' in args:
 			self.gpio_pin = args['gpio_pin']
@@ -83,6 +155,7 @@ class Device:
 			self.gpio_pins = args['gpio_pins']
 		
 		self._source_bus = None
+		self._shared_bus = None
 		self._i2c = None
 		if 'source_bus' in args:
 			self.source_bus = args['source_bus']
@@ -91,44 +164,6 @@ class Device:
 		if 'source_channel' in args:
 			self.source_channel = args['source_channel']
 	
-	def convert_log_level(self, name):
-		if name in ['debug', 'start', 'end']:
-			return 7
-		elif name == 'info':
-			return 6
-		elif name == 'notice':
-			return 5
-		elif name == 'warn':
-			return 4
-		elif name == 'error':
-			return 3
-		elif name == 'crit':
-			return 2
-		elif name == 'alert':
-			return 1
-		elif name == 'emerg':
-			return 0
-	
-	def log(self, message, level='debug'):
-		log_level = self.convert_log_level(level)
-		if log_level > self._log_level:
-			return
-		cnt = 0
-		for i in range(len(inspect.stack())):
-			function = inspect.stack()[i].function
-			if function not in ('<module>', '__init__', 'inner'):
-				cnt += 1
-		indent = '  ' * cnt
-		if level not in ['start', 'end']:
-			indent = '  ' + indent
-		function = inspect.stack()[1].function
-		filename = re.sub(r'^.*\/', '', inspect.stack()[1].filename)
-		line = inspect.stack()[1].lineno
-		if log_level < 7:
-			print("  {}:{}() {}: {}".format(filename, function, line, message))
-		else:
-			print("{}{}:{}() {}: {}".format(indent, filename, function, line, message))
-	
 	@property
 	def name(self):
 		return self._name
@@ -194,10 +229,18 @@ class Device:
 	def source_bus(self, source_bus):
 		if type(source_bus) is not str:
 			raise TypeError("Invalid source bus type {}".format(type(source_bus)))
-		if source_bus != 'i2c':
+		if source_bus not in pi_control.bus.BUSES:
 			raise TypeError("Invalid source bus {}".format(source_bus))
 		self._source_bus = source_bus
-		self._i2c = busio.I2C(board.SCL, board.SDA)
+		if self._panel:
+			self._shared_bus = self._panel.get_bus(source_bus)
+		else:
+			self._shared_bus = pi_control.bus.get_bus(self._backend, source_bus, log_level=self._log_level)
+		self._i2c = self._shared_bus.handle
+	
+	@property
+	def shared_bus(self):
+		return self._shared_bus
 	
 	@property
 	def source_channel(self):
@@ -210,11 +253,59 @@ class Device:
 		channel = int(source_channel)
 		self._source_channel = channel
 	
+	"""
+	info = device.snapshot()
+	device.restore(info)
+		Live state as a JSON-safe dict, and putting it back after a restart without touching
+		the hardware. Drivers add their own fields.
+	"""
+	def snapshot(self):
+		return { "type": self._type, "status": self._last_status, "value": self._last_value }
+	
+	def restore(self, info):
+		self._last_status = info.get('status')
+		self._last_value = info.get('value')
+	
+	"""
+	device.close()
+		Releases pins and handles so the device can be rebuilt. Shared buses stay open.
+	"""
+	def close(self):
+		connections = list(self._connections.values())
+		if self._connection is not None:
+			connections.append(self._connection)
+		for connection in connections:
+			if pi_control.is_method(connection, 'close'):
+				connection.close()
+		self._connection = None
+		self._connections = {}
+	
 
 """
 Expander Devices
 """
 
+# SPI request and result decoding for ADCs read directly in a burst. Other chips fall back to
+# one driver device per channel.
+def mcp300x_request(chnl):
+	return [0x01, (0x08 | chnl) << 4, 0x00]
+
+def mcp300x_result(reply):
+	return (((reply[1] & 0x03) << 8) | reply[2]) / 1023
+
+def mcp320x_request(chnl):
+	return [0x06 | (chnl >> 2), (chnl & 0x03) << 6, 0x00]
+
+def mcp320x_result(reply):
+	return (((reply[1] & 0x0F) << 8) | reply[2]) / 4095
+
+ADC_PROTOCOLS = {
+	"mcp3004": (mcp300x_request, mcp300x_result),
+	"mcp3008": (mcp300x_request, mcp300x_result),
+	"mcp3204": (mcp320x_request, mcp320x_result),
+	"mcp3208": (mcp320x_request, mcp320x_result)
+}
+
 class ExpanderDevice(Device):
 	"""
 	device = pi_control.device.ExpanderDevice(name, args)
@@ -227,6 +318,27 @@ class ExpanderDevice(Device):
 		if 'chip' not in args:
 			raise AttributeError("chip is required for {} {}".format(self.type, self.name))
 		self.chip = args['chip']
+		
+		self._spi_port = 0
+		if 'spi_port' in args:
+			self._spi_port = int(args['spi_port'])
+		self._spi_device = 0
+		if 'spi_device' in args:
+			self._spi_device = int(args['spi_device'])
+		self._spi_speed = 1000000
+		if 'spi_speed' in args:
+			self._spi_speed = int(args['spi_speed'])
+		
+		# Bus state shared by every channel
+		self._lock = threading.Lock()
+		self._spi = None
+		self._adcs = {}
+		self._active_channels = []
+		self._sample_ts = None
+		self._bus_time = None
+		self._bus_time_total = 0.0
+		self._bus_time_max = 0.0
+		self._bursts = 0
 	
 	@property
 	def parent(self):
@@ -248,6 +360,7 @@ class ExpanderDevice(Device):
 		self._type = chip_info['type']
 		self._bus = chip_info['bus']
 		self._channels = chip_info['channels']
+		self._values = array.array('d', [0.0] * self._channels)
 	
 	def get_chip_info(self, chip):
 		chips = {
@@ -271,34 +384,98 @@ class ExpanderDevice(Device):
 			return chips[chip]
 		return None
 	
+	"""
+	channel = expander.get_connection(chnl)
+	value = channel.value
+		Channels share one bus handle. Reading any channel reads every configured channel
+		back to back, and the results are reused until they're older than the channel's max_age.
+	"""
 	def get_connection(self, chnl=None):
-		if chnl < 0 or chnl >= self._channels:
+		if type(chnl) is not int or chnl < 0 or chnl >= self._channels:
 			raise ValueError("Invalid channel value {} for expander {} {}".format(chnl, self._chip, self._name))
-		chip = self._chip
-		if chip == 'mcp3001':
-			return gpiozero.MCP3001(channel=chnl)
-		elif chip == 'mcp3002':
-			return gpiozero.MCP3002(channel=chnl)
-		elif chip == 'mcp3004':
-			return gpiozero.MCP3004(channel=chnl)
-		elif chip == 'mcp3008':
-			return gpiozero.MCP3008(channel=chnl)
-		elif chip == 'mcp3201':
-			return gpiozero.MCP3201(channel=chnl)
-		elif chip == 'mcp3202':
-			return gpiozero.MCP3202(channel=chnl)
-		elif chip == 'mcp3204':
-			return gpiozero.MCP3204(channel=chnl)
-		elif chip == 'mcp3208':
-			return gpiozero.MCP3208(channel=chnl)
-		elif chip == 'mcp3301':
-			return gpiozero.MCP3301(channel=chnl)
-		elif chip == 'mcp3302':
-			return gpiozero.MCP3302(channel=chnl)
-		elif chip == 'mcp3304':
-			return gpiozero.MCP3304(channel=chnl)
-		return None
+		if self._bus != 'spi':
+			raise ValueError("Unsupported chip {} for expander {}".format(self._chip, self._name))
+		with self._lock:
+			if chnl not in self._active_channels:
+				self._active_channels.append(chnl)
+				self._active_channels.sort()
+			if self._chip in ADC_PROTOCOLS:
+				if not self._spi:
+					self._spi = self._backend.spi(self._spi_port, self._spi_device, self._spi_speed)
+			elif chnl not in self._adcs:
+				self._adcs[chnl] = self._backend.adc(self._chip, chnl, self._spi_port, self._spi_device)
+		return ExpanderChannel(self, chnl)
+	
+	@property
+	def values(self):
+		return self._values
 	
+	@property
+	def bus_time(self):
+		mean = None
+		if self._bursts:
+			mean = self._bus_time_total / self._bursts
+		return { "last": self._bus_time, "mean": mean, "max": self._bus_time_max, "bursts": self._bursts, "channels": len(self._active_channels) }
+	
+	def burst_read(self):
+		start = time.perf_counter()
+		protocol = ADC_PROTOCOLS.get(self._chip)
+		for chnl in self._active_channels:
+			if protocol:
+				request, result = protocol
+				self._values[chnl] = result(self._spi.xfer2(request(chnl)))
+			else:
+				self._values[chnl] = self._adcs[chnl].value
+		elapsed = time.perf_counter() - start
+		self._sample_ts = time.monotonic()
+		self._bus_time = elapsed
+		self._bus_time_total += elapsed
+		self._bursts += 1
+		if elapsed > self._bus_time_max:
+			self._bus_time_max = elapsed
+	
+	def read(self, chnl, max_age=0):
+		with self._lock:
+			if self._sample_ts is None or time.monotonic() - self._sample_ts >= max_age:
+				self.burst_read()
+			return self._values[chnl]
+	
+	def release_connection(self, chnl):
+		with self._lock:
+			if chnl in self._active_channels:
+				self._active_channels.remove(chnl)
+			adc = self._adcs.pop(chnl, None)
+			if adc and pi_control.is_method(adc, 'close'):
+				adc.close()
+	
+	def close(self):
+		with self._lock:
+			for adc in self._adcs.values():
+				if pi_control.is_method(adc, 'close'):
+					adc.close()
+			self._adcs = {}
+			if self._spi:
+				self._spi.close()
+				self._spi = None
+			self._active_channels = []
+		super().close()
+	
+
+class ExpanderChannel:
+	"""
+	channel = expander.get_connection(chnl)
+	"""
+	def __init__(self, expander, channel, max_age=0):
+		self.expander = expander
+		self.channel = channel
+		self.max_age = max_age
+	
+	@property
+	def value(self):
+		return self.expander.read(self.channel, self.max_age)
+	
+	def close(self):
+		self.expander.release_connection(self.channel)
 	
 
 """
@@ -313,12 +490,20 @@ class InputDevice(Device):
 		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
 		self._type = 'input'
 		self._update_timer = None
+		if self._panel:
+			self._timers = self._panel.timers
+		else:
+			self._timers = pi_control.timers.get_wheel(log_level=self._log_level)
 		
 		# Properties
 		self.debounce = 0.5
 		if 'debounce' in args:
 			self.debounce = args['debounce']
 		
+		self._poll_interval = None
+		if 'poll_interval' in args:
+			self.poll_interval = args['poll_interval']
+		
 		# Actions
 		self._actions = {}
 		if 'actions' in args:
@@ -327,11 +512,23 @@ class InputDevice(Device):
 			self._actions = args['actions']
 		
 		self.last_changed_ts = None
+		
+		# Skip counters, resolved once so change_status() only increments
+		self._skip_no_change = None
+		self._skip_debounce = None
+		if self._panel:
+			skips = self._panel.metrics.counter('pi_control_input_skips_total', 'Input changes skipped', ('input', 'reason'))
+			self._skip_no_change = skips.labels(self._name, 'no_change')
+			self._skip_debounce = skips.labels(self._name, 'debounce')
 	
 	@property
 	def parent(self):
 		return 'input'
 	
+	"""
+	device.last_changed_ts
+		time.monotonic() of the last accepted change
+	"""
 	@property
 	def last_changed_ts(self):
 		return self._last_changed_ts
@@ -340,11 +537,9 @@ class InputDevice(Device):
 	def last_changed_ts(self, ts):
 		self._last_changed_ts = ts
 	
-	
-	
 	@property
 	def on_hold(self):
-		time_now = time.time()
+		time_now = time.monotonic()
 		if self.last_changed_ts and (time_now - self.last_changed_ts) <= self.debounce:
 			return True
 		return False
@@ -361,37 +556,73 @@ class InputDevice(Device):
 			raise TypeError("Invalid debounce type for {} {}".format(self.type, self.name))
 		self._debounce = debounce
 	
+	@property
+	def poll_interval(self):
+		return self._poll_interval
+	
+	@poll_interval.setter
+	def poll_interval(self, poll_interval):
+		if type(poll_interval) is int or type(poll_interval) is str:
+			poll_interval = float(poll_interval)
+		elif type(poll_interval) is not float:
+			raise TypeError("Invalid poll_interval type for {} {}".format(self.type, self.name))
+		if poll_interval <= 0:
+			raise ValueError("Invalid poll_interval value for {} {}".format(self.type, self.name))
+		self._poll_interval = poll_interval
+	
 	def get_actions(self, action_name):
 		if action_name not in self._actions:
 			return []
 		return self._actions[action_name]
 	
+	"""
+	device.process_analog_actions()
+		Action keys are the upper bounds of value ranges. They're sorted numerically once
+		so lookups can bisect self._thresholds.
+	"""
 	def process_analog_actions(self):
-		self._action_keys = list(self._actions.keys())
-		self._action_keys.sort()
+		thresholds = []
+		for key in self._actions.keys():
+			try:
+				thresholds.append((float(key), key))
+			except (TypeError, ValueError):
+				raise ValueError("Invalid range action {} for {} {}".format(key, self.type, self.name))
+		thresholds.sort(key=lambda item: item[0])
+		self._thresholds = [value for value, key in thresholds]
+		self._action_keys = [key for value, key in thresholds]
+	
+	def get_action_index(self, value):
+		index = bisect.bisect_right(self._thresholds, value)
+		if index >= len(self._thresholds):
+			return None
+		return index
 	
-	def change_status(self, status, startup=False, force=False):
+	def change_status(self, status, startup=False, force=False, delta=None):
 		self.log(self.name, 'start')
 		
 		# No change, skip
 		if not force and self.last_status == status:
-			self.log(self.name + ' no change', 'end')
+			self.log("{} no change", 'end', self.name)
+			if self._skip_no_change:
+				self._skip_no_change.inc()
 			return False
 		
 		# Wait for debounce time to finish, skip
 		if self.on_hold:
-			self.log(self.name + ' skipping', 'end')
+			self.log("{} skipping", 'end', self.name)
+			if self._skip_debounce:
+				self._skip_debounce.inc()
 			return False
 		
 		# A change has occurred!
 		self.log('cancel update timer', 'info')
 		self.cancel_update_timer()
-		self.last_changed_ts = time.time()
+		self.last_changed_ts = time.monotonic()
 		self.last_status = status
-		self.log(self.name + ' ' + str(status))
+		self.log("{} {}", 'debug', self.name, status)
 		
 		self.log("panel take action", 'info')
-		self.panel.take_action(self, status, startup)
+		self.panel.take_action(self, status, startup, delta)
 		
 		if not startup:
 			self.log('start update timer', 'info')
@@ -399,15 +630,33 @@ class InputDevice(Device):
 		self.log(self.name, 'end')
 		return True
 	
+	"""
+	future = device.inject(status, startup=False, delta=None)
+		Acts as if the input changed to status, without debounce or reading the hardware,
+		e.g. to replay a journal. Returns the future from panel.take_action().
+	"""
+	def inject(self, status, startup=False, delta=None):
+		self.cancel_update_timer()
+		self.last_changed_ts = time.monotonic()
+		self.last_status = status
+		return self.panel.take_action(self, status, startup, delta)
+	
 	def start_update_timer(self):
 # 		self.log(self.name, 'start')
 		if not pi_control.is_method(self, 'update_status'):
 			return
 		
 		duration = self.debounce + .1
-		self._update_timer = threading.Timer(duration, self.update_status)
+		self._update_timer = self._timers.call_later(duration, self.update_status)
 # 		self.log("{}: Starting {} - {}".format(self.name, self._update_timer, duration))
-		self._update_timer.start()
+	
+	"""
+	status = device.current_status()
+		The status the hardware is in now, read without acting on it, or None if the input
+		has no resting status.
+	"""
+	def current_status(self):
+		return None
 	
 	def cancel_update_timer(self):
 # 		self.log(self.name, 'start')
@@ -415,228 +664,120 @@ class InputDevice(Device):
 			return
 		self._update_timer.cancel()
 		self._update_timer = None
+	
+	def close(self):
+		self.cancel_update_timer()
+		if self.panel:
+			self.panel.scheduler.remove(self)
+		super().close()
 		
 
-class Button(InputDevice):
+class OutputDevice(Device):
 	"""
-	button = pi_control.device.Button(name, args)
+	device = pi_control.device.OutputDevice(name, args)
 	"""
+	# Skip actions that would leave the output as it is; drivers turn this on where a repeat has no effect
+	DEDUPE = False
+	# Seconds the remembered state is trusted, or None for as long as the process runs
+	DEDUPE_TTL = None
+	# Keep the remembered state in the snapshot; off where something else may change the output
+	SNAPSHOT_STATE = True
+	
 	def __init__(self, name, args={}, dry_run=False, log_level=None):
 		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'button'
-		
-		# Properties
-		if 'gpio_pin' not in args:
-			raise AttributeError("GPIO pin required for {} {}".format(self.type, self.name))
+		self._type = 'output'
 		
-		# Internal args
-		pull_up_value = True
-		if 'pull_up' in args:
-			if type(args['pull_up']) is not type(True):
-				raise ValueError("Invalid pull_up type for {}".format(self._name))
-			if not args['pull_up']:
-				pull_up_value = False
+		self.last_action = None
+		self.last_action_ts = None
 		
-		# Init
-		self._connection = gpiozero.Button(self._gpio_pin, pull_up=pull_up_value, hold_time=0.1)
-		self._connection.when_held = self.event_pressed
-		self._connection.when_released = self.event_released
-	
+		self._dedupe = self.DEDUPE
+		if 'dedupe' in args:
+			if type(args['dedupe']) is not bool:
+				raise TypeError("dedupe in output {} must be type bool".format(self.name))
+			self._dedupe = args['dedupe']
+		self._dedupe_ttl = self.DEDUPE_TTL
+		if 'dedupe_ttl' in args:
+			if args['dedupe_ttl'] is not None and (type(args['dedupe_ttl']) is not int and type(args['dedupe_ttl']) is not float or args['dedupe_ttl'] <= 0):
+				raise ValueError("Invalid dedupe_ttl in output {}".format(self.name))
+			self._dedupe_ttl = args['dedupe_ttl']
+		self._state = None
+		self._state_ts = None
+		
+		# Cooldown or token bucket, enforced by the dispatcher
+		policy = 'latest'
+		if 'policy' in args:
+			if args['policy'] not in pi_control.ratelimit.POLICIES:
+				raise ValueError("Invalid policy in output {}".format(self.name))
+			policy = args['policy']
+		self._limiter = None
+		if 'rate_limit' in args:
+			if type(args['rate_limit']) is not int and type(args['rate_limit']) is not float or args['rate_limit'] <= 0:
+				raise ValueError("Invalid rate_limit in output {}".format(self.name))
+			burst = 1
+			if 'burst' in args:
+				if type(args['burst']) is not int or args['burst'] < 1:
+					raise ValueError("Invalid burst in output {}".format(self.name))
+				burst = args['burst']
+			self._limiter = pi_control.ratelimit.RateLimiter(float(args['rate_limit']), burst, policy)
+		elif 'delay' in args:
+			if type(args['delay']) is not int and type(args['delay']) is not float or args['delay'] < 0:
+				raise ValueError("Invalid delay in output {}".format(self.name))
+			if args['delay'] > 0:
+				self._limiter = pi_control.ratelimit.RateLimiter.cooldown(args['delay'], policy)
 	
 	@property
-	def pressed(self):
-		if self._connection.is_pressed:
-			return True
-		return False
-	
-	def event_pressed(self):
-		self.log(self.name + " pressed", 'notice')
-		self._last_value = 100
-		self.change_status('pressed')
+	def limiter(self):
+		return self._limiter
 	
-	def event_released(self):
-		self.log(self.name + " released", 'notice')
-		self._last_value = 0
-		self.change_status('released')
-	
-	def update_status(self, startup=False):
-		self.log(self.name, 'start')
-		if self.pressed:
-			self.log("pressed", 'info')
-			self.change_status('pressed', startup)
-		else:
-			self.log("released", 'info')
-			self.change_status('released', startup)
-		self.log(self.name, 'end')
+	@property
+	def dedupe(self):
+		return self._dedupe
 	
-class Potentiometer(InputDevice):
 	"""
-	button = pi_control.device.Potentiometer(name, args)
+	device.state
+		State key of the last action accepted for this output, or None when unknown. Set by the
+		dispatcher when an action is queued, so it is the state the output is heading to. With a
+		dedupe_ttl it is forgotten that many seconds after it was set.
 	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'potentiometer'
-		self._needs_monitoring = True
-		self._last_value = 0
-		self._last_action_key = 100000
-		
-		# Properties
-		if 'source_device' not in args:
-			raise AttributeError("Source device is required for {} {}".format(self.type, self.name))
-		self._source_device = args['source_device']
-		if type(self.source_channel) is not int:
-			raise AttributeError("Channel is required for {} {}".format(self.type, self.name))
-		
-		self.process_analog_actions()
-		
-		# Init
-		self._connection = self._source_device.get_connection(self.source_channel)
-	
-	
 	@property
-	def value(self):
-		self._last_value = int(self._connection.value * 100)
-		self.log(self.name + " " + self._last_value, 'notice')
-		return self._last_value
-	
-	def update_status(self, startup=False):
-		self.log(self.name, 'start')
-		value = self.value
-		action_key = None
-		for key in self._action_keys:
-			if value < int(key):
-				action_key = key
-				break
-		if type(action_key) is type(None):
-			self.log(self.name + ' no action key', 'end')
+	def state(self):
+		if self._dedupe_ttl is not None and self._state_ts is not None and time.monotonic() - self._state_ts > self._dedupe_ttl:
 			return None
-		if action_key == self._last_action_key:
-			self.log(self.name + ' same as last action', 'end')
+		return self._state
+	
+	@state.setter
+	def state(self, state):
+		self._state = state
+		self._state_ts = time.monotonic()
+	
+	def forget_state(self):
+		self._state = None
+	
+	def snapshot(self):
+		info = super().snapshot()
+		info['action'] = self.last_action
+		info['action_ts'] = self.last_action_ts
+		info['state'] = self.state if self.SNAPSHOT_STATE else None
+		return info
+	
+	def restore(self, info):
+		super().restore(info)
+		self.last_action = info.get('action')
+		self.last_action_ts = info.get('action_ts')
+		if self.SNAPSHOT_STATE:
+			self.state = info.get('state')
+	
+	"""
+	key = device.state_key(params)
+		Hashable state that running params leaves the output in, or None if it can't be known.
+		Defaults to a hash of the payload; drivers override it where state is simpler.
+	"""
+	def state_key(self, params):
+		try:
+			payload = json.dumps(params, sort_keys=True, default=str)
+		except (TypeError, ValueError):
 			return None
-		self.log("{}: {} - {}".format(value, self._last_action_key, action_key))
-		self._last_action_key = action_key
-		self.change_status(action_key, startup)
-		self.log(self.name, 'end')
-		
-class RotaryEncoder(InputDevice):
-	"""
-	rotary_encoder = pi_control.device.RotaryEncoder(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'rotary_encoder'
-		self._value_type = 'absolute'
-		self._total_segments = 16
-		
-		# Properties
-		if 'gpio_pins' not in args:
-			raise AttributeError("GPIO pins required for {} {}".format(self.type, self.name))
-		if 'up' not in args['gpio_pins'] or 'down' not in args['gpio_pins']:
-			raise AttributeError("'up' and 'down' GPIO pins required for {} {}".format(self.type, self.name))
-		
-		if 'value_type' in args:
-			if args['value_type'] == 'directional':
-				self._value_type = args['value_type']
-		
-		# Init
-		self._connection = gpiozero.RotaryEncoder(args['gpio_pins']['up'], args['gpio_pins']['down'])
-		self._connection.when_rotated_clockwise = self.event_up
-		self._connection.when_rotated_counter_clockwise = self.event_down
-		if 'total_segments' in args:
-			self._total_segments = int(args['total_segments']/2)
-	
-	def event_up(self):
-		label = self._connection.steps
-		if self._value_type == 'directional':
-			label = "up"
-		self.log(self.name + " " + label, 'notice')
-		self.change_status(label, False, True)
-	
-	def event_down(self):
-		label = self._connection.steps
-		if self._value_type == 'directional':
-			label = "down"
-		self.log(self.name + " " + label, 'notice')
-		self.change_status(label, False, True)
-	
-	def update_status(self, startup=False):
-		self.log(self.name, 'start')
-		label = self._connection.steps
-		if self._value_type == 'directional':
-			label = self.last_status
-		self.log(self.name + ": Update status - " + str(label))
-# 		self.change_status(label, startup)
-		self.log(self.name, 'end')
-
-
-class SelectorSwitch(InputDevice):
-	"""
-	button = pi_control.device.SelectorSwitch(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'button'
-		
-		# Properties
-		if 'gpio_pins' not in args:
-			raise AttributeError("GPIO pins required for {} {}".format(self.type, self.name))
-		
-		# Internal args
-		pull_up_value = True
-		if 'pull_up' in args:
-			if type(args['pull_up']) is not type(True):
-				raise ValueError("Invalid pull_up type for {}".format(self._name))
-			if not args['pull_up']:
-				pull_up_value = False
-		
-		# Init
-		for label, gpio_pin in self.gpio_pins.items():
-			self._connections[label] = gpiozero.Button(gpio_pin, pull_up=pull_up_value)
-			self._connections[label].when_pressed = self.event_selected
-	
-	
-	@property
-	def selection(self):
-		for label, connection in self._connections.items():
-			if connection.is_pressed:
-				return label
-		return None
-	
-	def event_selected(self):
-		label = self.selection
-		if not label:
-			self.log(self.name + ' no label', 'end')
-			return
-		self.log(self.name + " " + label, 'notice')
-		self.change_status(label)
-	
-	def update_status(self, startup=False):
-		self.log(self.name, 'start')
-		label = self.selection
-		if not label:
-			self.log(self.name + ' no label', 'end')
-			return
-		self.log(self.name + ": Update status - " + label)
-		self.change_status(label, startup)
-		self.log(self.name, 'end')
-	
-
-
-"""
-Output Devices
-"""
-
-class OutputDevice(Device):
-	"""
-	device = pi_control.device.OutputDevice(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'output'
-		self._threads = []
-		
-		self.last_action = None
-		self.last_action_ts = None
+		return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 	
 	@property
 	def parent(self):
@@ -658,512 +799,35 @@ class OutputDevice(Device):
 	def last_action_ts(self, ts):
 		self._last_action_ts = ts
 	
-	def action(self, action_info):
-		self.log(self._type, 'start')
-		if 'action' not in action_info:
-			raise AttributeError("action empty when calling {}".format(self.name))
-		
-		# Stop running threads
-		if len(self._threads):
-			for th in self._threads:
-				th['stop'] = True
-		
-		self.last_action_ts = time.time()
-		self.last_action = action_info['action']
-		self.log(self._type, 'end')
-	
-	def start_thread(self, target_method, method_args):
-		thread = { "stop": False, "id": random.randint(1000000, 10000000) }
-		method_args = method_args + (thread['id'], lambda : thread['stop'], )
-		thread['thread'] = threading.Thread(target=target_method, args=method_args)
-		thread['thread'].start()
-		self._threads.append(thread)
-	
-	def finish_thread(self, id=None):
-		if not id:
-			return True
-		for i in range(len(self._threads)):
-			if self._threads[i]['id'] == id:
-				del self._threads[i]
-				break
-		return True
-	
-
-class LED(OutputDevice):
-	"""
-	led = pi_control.device.LED(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'led'
-		if 'gpio_pin' not in args:
-			raise AttributeError("GPIO pin required for {} {}".format(self.type, self.name))
-		self._connection = gpiozero.PWMLED(self._gpio_pin)
-		self.off()
-		
-	
-	"""
-	led.action()
-	"""
-	def action(self, action_info):
-		super().action(action_info)
-		action = action_info['action']
-		self.log(action, 'info')
-		
-		# No change, skip
-		on_actions = ['on', 'flicker_on', 'fade_on']
-		off_actions = ['off', 'flicker_off', 'fade_off']
-		
-# 		if self._last_status == 'on' and action in on_actions:
-# 			self.log(self.name + ' no change')
-# 			return False
-		if self._last_status == 'off' and action in off_actions:
-			self.log(self.name + ' no change')
-			return False
-		
-		value = None
-		if 'value' in action_info:
-			value = float(action_info['value'])
-		duration = 1
-		if 'duration' in action_info:
-			duration = float(action_info['duration'])
-		iterations = 1
-		if 'iterations' in action_info:
-			iterations = int(action_info['iterations'])
-		
-		if action == 'on':
-			return self.on()
-		elif action == 'off':
-			return self.off()
-		elif action == 'value':
-			return self.on(value)
-		elif action == 'blink':
-			self.start_thread(self.blink, (iterations, duration))
-			return True
-		elif action == 'flicker_on':
-			self.start_thread(self.flicker_on, (duration,))
-			return True
-		elif action == 'flicker_off':
-			self.start_thread(self.flicker_off, (duration,))
-			return True
-		elif action == 'fade_on':
-			self.start_thread(self.fade_on, (duration,))
-			return True
-		elif action == 'fade_off':
-			self.start_thread(self.fade_off, (duration,))
-			return True
-		return False
-	
-	"""
-	led.on()
-	"""
-	def on(self, value=1.0):
-		self._connection.value = value
-		self._last_status = 'on'
-		self._last_value = 100
-		return True
-	
-	"""
-	led.off()
-	"""
-	def off(self):
-		self._connection.value = 0.0
-		self._last_status = 'off'
-		self._last_value = 0
-		return True
-	
-	"""
-	led.blink(iterations, duration)
-		start off
-		end off
-	"""
-	def blink(self, iterations=3, duration=3, id=None, stop_function=lambda:True):
-		for i in range(iterations):
-			off_duration =  duration / (iterations*2 - 1)
-			on_duration = off_duration
-			
-			# Off
-			if i != 0:
-				self._connection.value = 0.0
-				if stop_function():
-					break
-				time.sleep(off_duration)
-			
-			# On
-			self._connection.value = 1.0
-			if stop_function():
-				break
-			time.sleep(on_duration)
-		
-		if stop_function():
-			self.log("STOP")
-		self.off()
-		return self.finish_thread(id)
-	
-	"""
-	led.flicker_on(duration)
-		start off
-		end on
-	"""
-	def flicker_on(self, duration=.5, id=None, stop_function=lambda:True):
-		for i in range(8):
-			off_duration = (8-i) * float(duration) / 45
-			on_duration = i * float(duration) / 45
-			brightness = (i+1) / 8
-			
-			# Off
-			if i != 0:
-				self._connection.value = 0.0
-				if stop_function():
-					break
-				time.sleep(off_duration)
-			
-			# On
-			self._connection.value = brightness
-			if stop_function():
-				break
-			time.sleep(on_duration)
-		
-		if stop_function():
-			self.log("STOP")
-			self.off()
-		else:
-			self.on()
-		return self.finish_thread(id)
-	
-	"""
-	led.flicker_off(duration)
-		start on
-		end off
-	"""
-	def flicker_off(self, duration=.5, id=None, stop_function=lambda:True):
-		for i in range(8):
-			on_duration = (8-i) * float(duration) / 45
-			off_duration = i * float(duration) / 45
-			brightness = (8-i) / 8
-			
-			# On
-			if i != 0:
-				self._connection.value = brightness
-				if stop_function():
-					break
-				time.sleep(on_duration)
-			
-			# Off
-			self._connection.value = 0.0
-			if stop_function():
-				break
-			time.sleep(off_duration)
-		
-		if stop_function():
-			self.log("STOP")
-			self.on()
-		self.off()
-		return self.finish_thread(id)
-	
-	"""
-	led.fade_on(duration)
-		start off
-		end on
-	"""
-	def fade_on(self, duration=.5, id=None, stop_function=lambda:True):
-		increment = 32
-		on_duration = float(duration) / increment
-		for i in range(increment):
-			brightness = (i+1) / increment
-			
-			# On
-			self._connection.value = brightness
-			if stop_function():
-				break
-			time.sleep(on_duration)
-		
-		if stop_function():
-			self.log("STOP")
-			self.off()
-		else:
-			self.on()
-		return self.finish_thread(id)
-	
-	"""
-	led.fade_off(duration)
-		start on
-		end off
-	"""
-	def fade_off(self, duration=.5, id=None, stop_function=lambda:True):
-		increment = 32
-		on_duration = float(duration) / increment
-		for i in range(increment):
-			brightness = (increment-i) / increment
-			
-			# On
-			self._connection.value = brightness
-			if stop_function():
-				break
-			time.sleep(on_duration)
-		
-		if stop_function():
-			self.log("STOP")
-			self.on()
-		self.off()
-		return self.finish_thread(id)
-	
-
-class Haptic(OutputDevice):
-	"""
-	haptic = pi_control.device.Haptic(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'haptic'
-		if 'source_bus' not in args:
-			raise AttributeError("Source bus required for {} {}".format(self.type, self.name))
-		self._connection = adafruit_drv2605.DRV2605(self._i2c)
-		
-		self._motor = 'erm'
-		if 'motor' in args:
-			if type(args['motor']) is not str:
-				raise TypeError("motor in output {} must be type str".format(self.name))
-			args['motor'] = args['motor'].lower()
-			if args['motor'] not in ['erm', 'lra']:
-				raise AttributeError("Invalid motor in output {}".format(self.name))
-			self._motor = args['motor']
-			if self._motor == 'lra':
-				self._connection.use_LRM()
-		
-		self._effect = None
-		if 'effect' in args:
-			if type(args['effect']) is not str and type(args['effect']) is not int and type(args['effect']) is not float:
-				raise TypeError("effect in output {} must be type int".format(self.name))
-			effect = int(args['effect'])
-			if effect < 1 or effect > 123:
-				raise ValueError("Invalid effect value for {}".format(self.name))
-			self._effect = effect
-	
-	"""
-	haptic.action()
-	"""
-	def action(self, action_info):
-		if 'action' not in action_info:
-			action_info['action'] = self._effect
-		super().action(action_info)
-		action = action_info['action']
-		
-		# Set variables
-		effect = self._effect
-		if 'effect' in action_info:
-			if type(action_info['effect']) is not str and type(action_info['effect']) is not int and type(action_info['effect']) is not float:
-				raise TypeError("effect in output {} must be type int".format(self.name))
-			effect = int(action_info['effect'])
-			if effect < 1 or effect > 123:
-				raise ValueError("Invalid effect value for {}".format(self.name))
-			self._effect = effect
-		if not effect:
-			raise KeyError("effect is required for {} action {}".format(self.type, self.name))
-		
-		self._connection.sequence[0] = adafruit_drv2605.Effect(effect)
-		self._connection.play()
+	@property
+	def default_action(self):
+		return None
 	
-
-class HTTP(OutputDevice):
 	"""
-	http = pi_control.device.HTTP(name, args)
+	params = device.prepare(action_info)
+		Validates an action from the config and fills in defaults. Panel calls this once per
+		action at startup; run() then uses the result as is.
 	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'http'
-		self._method = 'get'
-		if 'method' in args:
-			if type(args['method']) is not str:
-				raise TypeError("method in output {} must be type str".format(self.name))
-			self._method = args['method']
-		self._url = None
-		if 'url' in args:
-			if type(args['url']) is not str:
-				raise TypeError("url in output {} must be type str".format(self.name))
-			self._url = args['url']
-		self._bearer_token = None
-		if 'bearer_token' in args:
-			if type(args['bearer_token']) is not str:
-				raise TypeError("bearer_token in output {} must be type str".format(self.name))
-			self._bearer_token = args['bearer_token']
-		self._post_data = {}
-		if 'post_data' in args:
-			if type(args['post_data']) is not dict:
-				raise TypeError("post_data in output {} must be type dict".format(self.name))
-			self._method = 'post'
-			self._post_data = args['post_data']
-		
+	def prepare(self, action_info):
+		params = {}
+		for key, value in action_info.items():
+			if key not in ('name', 'init', 'dedupe'):
+				params[key] = value
+		if 'action' not in params:
+			params['action'] = self.default_action
+		if params['action'] is None:
+			raise AttributeError("action empty when calling {}".format(self.name))
+		return params
 	
 	"""
-	http.action()
+	device.action(action_info)
 	"""
 	def action(self, action_info):
-		if 'action' not in action_info:
-			action_info['action'] = self._method
-		super().action(action_info)
-		action = action_info['action']
-		
-		# Set variables
-		method = self._method
-		if 'method' in action_info:
-			if type(action_info['method']) is not str:
-				raise TypeError("method in action {} must be type str".format(self.name))
-			method = action_info['method']
-		
-		url = self._url
-		if 'url' in action_info:
-			if type(action_info['url']) is not str:
-				raise TypeError("url in action {} must be type str".format(self.name))
-			url = action_info['url']
-		if not url:
-			raise KeyError("url is required for {} action {}".format(self.type, self.name))
-		
-		bearer_token = self._bearer_token
-		if 'bearer_token' in action_info:
-			if type(action_info['bearer_token']) is not str:
-				raise TypeError("bearer_token in action {} must be type str".format(self.name))
-			bearer_token = action_info['bearer_token']
-		
-		post_data = self._post_data.copy()
-		if 'post_data' in action_info:
-			if type(action_info['post_data']) is not dict:
-				raise TypeError("post_data in action {} must be type str".format(self.name))
-			for key, value in action_info['post_data'].items():
-				post_data[key] = value
-		
-		auth_string = ''
-		if bearer_token:
-			auth_string = ' -H "Authorization: Bearer {}"'.format(bearer_token)
-		
-		post_string = ''
-		if len(post_data):
-			data_string = json.dumps(post_data)
-			post_string = ' -X POST -H "Content-Type: application/json" -d \'{}\''.format(data_string)
-		
-		cmd = 'curl -s{}{} {} &'.format(auth_string, post_string, url)
-		if self._dry_run:
-			self.log("cmd: " + cmd, 'notice')
-		else:
-			self.log("cmd: " + cmd, 'info')
-			os.system(cmd)
-		
-		if 'value' in action_info:
-			self._last_status = action_info['value']
+		return self.run(self.prepare(action_info))
 	
-
-class Message(OutputDevice):
-	"""
-	message = pi_control.device.Message(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'message'
-		
-		self._service = 'print'
-		if 'service' in args:
-			if type(args['service']) is not str:
-				raise TypeError("service in output {} must be type str".format(self.name))
-			if args['service'] not in ['print', 'sns']:
-				raise ValueError("Invalid service in output {}".format(self.name))
-			self._service = args['service']
-		
-		self._message = None
-		if 'message' in args:
-			if type(args['message']) is not str:
-				raise TypeError("message in output {} must be type str".format(self.name))
-			self._message = args['message']
-		
-		if self._service == 'sns':
-			self._sns = boto3.client('sns')
-			self._sns.set_sms_attributes(attributes = { 'DefaultSMSType': 'Transactional' })
-			
-			if 'topic_arn' in args:
-				if type(args['topic_arn']) is not str:
-					raise TypeError("topic_arn in output {} must be type str".format(self.name))
-				self._topic_arn = args['topic_arn']
-			if not self._topic_arn:
-				raise KeyError("topic_arn is required for {} action {}".format(self.type, self.name))
-		
-	
-	"""
-	message.action()
-	"""
-	def action(self, action_info):
-		if 'action' not in action_info:
-			action_info['action'] = self._service
-		super().action(action_info)
-		action = action_info['action']
-		
-		# Set variables
-		message = self._message
-		if 'message' in action_info:
-			if type(action_info['message']) is not str:
-				raise TypeError("message in action {} must be type str".format(self.name))
-			message = action_info['message']
-		if not message:
-			raise KeyError("message is required for {} action {}".format(self.type, self.name))
-		
-		if self._service == 'print':
-			print(message)
-		if self._service == 'sns':
-			if self._dry_run:
-				self.log(self._topic_arn + ":\n  " + message, 'notice')
-			else:
-				self.log(self._topic_arn + ":\n  " + message, 'info')
-				response = self._sns.publish(
-					TopicArn = self._topic_arn,
-					Message = message,
-					MessageStructure = 'string'
-				)
-				
-				self.log("response:" + response, 'info')
-				if type(response) is dict and 'ResponseMetadata' in response:
-					if response['ResponseMetadata'].get('HTTPStatusCode') == 200:
-						return response.get('MessageId')
-		
-
-class Sound(OutputDevice):
-	"""
-	sound = pi_control.device.Sound(name, args)
-	"""
-	def __init__(self, name, args={}, dry_run=False, log_level=None):
-		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
-		self._type = 'sound'
-		self._file = None
-		if 'file' in args:
-			if type(args['file']) is not str:
-				raise TypeError("file in output {} must be type str".format(self.name))
-			self._file = args['file']
-		
+	def run(self, params):
+		self.log(self._type, 'start')
+		self.last_action_ts = time.time()
+		self.last_action = params['action']
+		self.log(self._type, 'end')
 	
-	"""
-	sound.action()
-	"""
-	def action(self, action_info):
-		if 'action' not in action_info:
-			action_info['action'] = self._file
-		super().action(action_info)
-		action = action_info['action']
-		
-		# Set variables
-		file = self._file
-		if 'file' in action_info:
-			if type(action_info['file']) is not str:
-				raise TypeError("file in action {} must be type str".format(self.name))
-			file = action_info['file']
-		if not file:
-			raise KeyError("file is required for {} action {}".format(self.type, self.name))
-		
-		cmd = None
-		if re.search(r'\.mp3', file):
-			cmd = 'mpg123 -q -m /opt/control/sounds/{} &'.format(file)
-		elif re.search(r'\.wav', file):
-			cmd = 'aplay -q /opt/control/sounds/{} &'.format(file)
-		
-		if self._dry_run:
-			self.log(cmd, 'notice')
-		else:
-			self.log(cmd, 'info')
-			os.system(cmd)
-
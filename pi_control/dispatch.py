@@ -0,0 +1,326 @@
+# print("Loaded pi_control dispatch module")
+
+import collections
+import concurrent.futures
+import functools
+import threading
+import time
+
+import pi_control.log
+import pi_control.ratelimit
+import pi_control.timers
+
+"""
+2026-10-18 Asynchronous action dispatch on a bounded worker pool with one ordered queue per output.
+2026-10-18 Records actions, failures, drops, queue wait, and run time per output when given a metrics registry.
+2026-10-18 Enforces each output's cooldown or token-bucket limit before its actions are queued.
+2026-10-18 Skips actions that would leave their output in the state it is already headed to.
+2026-10-18 Reports how each action ended to an optional observer, with the tag it was submitted with.
+2026-10-18 Can run on a worker pool shared with other dispatchers.
+2026-10-18 Lanes finish on their worker after shutdown, and futures that never run are resolved outside the lock.
+2026-10-18 An action that returns a future is reported when the future is done, not when it is returned.
+"""
+
+"""
+import pi_control.dispatch
+"""
+
+class QueueFull(Exception):
+	pass
+
+
+class Lane:
+	"""
+	Pending actions for one output. Only one worker runs a lane at a time, so an output
+	always runs its actions in the order they were submitted.
+	"""
+	def __init__(self, output, metrics=None):
+		self.output = output
+		self.queue = collections.deque()
+		self.running = False
+		self.metrics = metrics
+		self.limiter = getattr(output, 'limiter', None)
+		self.deferred = collections.deque()
+		self.release_timer = None
+
+
+class Dispatcher(pi_control.log.Logger):
+	"""
+	dispatcher = pi_control.dispatch.Dispatcher(workers=4, queue_size=32, metrics=registry, observer=None, executor=None)
+	future = dispatcher.submit(action, tag=None)
+	future = dispatcher.gather([future, ...])
+	dispatcher.shutdown(wait=True)
+
+	Given an executor, actions run on it instead of the dispatcher's own pool, and workers should
+	be its size. shutdown() then waits for this dispatcher's queued actions and leaves the executor
+	running for the others.
+
+	observer(action, tag, outcome, seconds) is called once per action, where outcome is 'ok',
+	'failed', 'dropped', 'suppressed', 'deduped', or 'cancelled', and seconds is the time spent
+	running it. An action whose run() returns a Future, like an HTTP request, frees its worker
+	at once and ends when that future does, with its result or error.
+	"""
+	def __init__(self, workers=4, queue_size=32, metrics=None, observer=None, executor=None, log_level=4):
+		self._log_level = log_level
+		if type(workers) is not int or workers < 1:
+			raise ValueError("Invalid dispatcher workers value {}".format(workers))
+		if type(queue_size) is not int or queue_size < 1:
+			raise ValueError("Invalid dispatcher queue_size value {}".format(queue_size))
+		self._shared = executor is not None
+		if not self._shared:
+			executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dispatch')
+		self._workers = workers
+		self._queue_size = queue_size
+		self._executor = executor
+		self._lanes = {}
+		self._lock = threading.Lock()
+		self._idle = threading.Condition(self._lock)
+		self._closed = False
+		self._observer = observer
+
+		self._metrics = None
+		if metrics is not None:
+			self._metrics = (
+				metrics.counter('pi_control_output_actions_total', 'Actions run per output', ('output',)),
+				metrics.counter('pi_control_output_failures_total', 'Actions that raised per output', ('output',)),
+				metrics.counter('pi_control_output_dropped_total', 'Actions dropped because the output queue was full', ('output',)),
+				metrics.histogram('pi_control_action_seconds', 'Time spent in each output action', ('output',)),
+				metrics.histogram('pi_control_action_wait_seconds', 'Time actions waited in the output queue', ('output',)),
+				metrics.counter('pi_control_output_suppressed_total', 'Actions suppressed by the output rate limit', ('output',)),
+				metrics.counter('pi_control_output_deferred_total', 'Actions held back by the output rate limit', ('output',)),
+				metrics.counter('pi_control_output_deduped_total', 'Actions skipped because the output was already in that state', ('output',))
+			)
+			metrics.gauge('pi_control_dispatch_queue_depth', 'Actions waiting per output', self.depths, ('output',))
+
+	@property
+	def workers(self):
+		return self._workers
+
+	@property
+	def queue_size(self):
+		return self._queue_size
+
+	@property
+	def depth(self):
+		with self._lock:
+			return sum(len(lane.queue) + len(lane.deferred) for lane in self._lanes.values())
+
+	def depths(self):
+		with self._lock:
+			return {(lane.output.name,): len(lane.queue) + len(lane.deferred) for lane in self._lanes.values()}
+
+	def lane_metrics(self, output):
+		if not self._metrics:
+			return None
+		return tuple(metric.labels(output.name) for metric in self._metrics)
+
+	def observe(self, action, tag, outcome, seconds=0.0):
+		if not self._observer:
+			return
+		try:
+			self._observer(action, tag, outcome, seconds)
+		except Exception as err:
+			self.log("Dispatch observer failed: {}", 'error', err)
+
+	def submit(self, action, tag=None):
+		output = action.output
+		future = concurrent.futures.Future()
+		settled = []
+		with self._lock:
+			if self._closed:
+				raise RuntimeError("Dispatcher is shut down")
+			lane = self._lanes.get(output)
+			if lane is None:
+				lane = Lane(output, self.lane_metrics(output))
+				self._lanes[output] = lane
+			# output.state is where its last accepted action leaves it, even if that action is still queued
+			if action.dedupe and action.state_key is not None and action.state_key == output.state:
+				self.log("{} already {}, skipping", 'debug', output.name, action)
+				if lane.metrics:
+					lane.metrics[7].inc()
+				settled.append((future, None, action, tag, 'deduped'))
+			# Actions already held back go first, so only take a token when none are waiting
+			elif lane.limiter and (lane.deferred or lane.limiter.take()):
+				self.limit(lane, action, future, tag, settled)
+			elif len(lane.queue) >= self._queue_size:
+				self.queue_full(lane, future, action, tag, settled)
+			else:
+				output.state = action.state_key
+				self.enqueue(lane, action, future, tag)
+		self.settle(settled)
+		return future
+
+	"""
+	Resolves futures that never reach a worker, once the lock is released so their callbacks
+	can submit again.
+	"""
+	def settle(self, settled):
+		for future, error, action, tag, outcome in settled:
+			if outcome == 'cancelled':
+				future.cancel()
+			elif error is None:
+				future.set_result(None)
+			else:
+				future.set_exception(error)
+			self.observe(action, tag, outcome)
+
+	def enqueue(self, lane, action, future, tag=None):
+		lane.queue.append((action, future, time.perf_counter(), tag))
+		if not lane.running:
+			lane.running = True
+			self._executor.submit(self._run, lane)
+
+	def queue_full(self, lane, future, action, tag, settled):
+		self.log("{} queue full, dropping action", 'warn', lane.output.name)
+		if lane.metrics:
+			lane.metrics[2].inc()
+		settled.append((future, QueueFull("Action queue full for {}".format(lane.output.name)), action, tag, 'dropped'))
+
+	def suppress(self, lane, future, reason, action, tag, settled):
+		self.log("{} action {}", 'info', lane.output.name, reason)
+		lane.limiter.suppressed += 1
+		if lane.metrics:
+			lane.metrics[5].inc()
+		settled.append((future, pi_control.ratelimit.RateLimited("Action for {} {}".format(lane.output.name, reason)), action, tag, 'suppressed'))
+
+	"""
+	Applies the lane's policy to an action that arrived with no token left. Called with the
+	lock held; futures it ends are added to settled.
+	"""
+	def limit(self, lane, action, future, tag, settled):
+		policy = lane.limiter.policy
+		if policy == 'drop':
+			self.suppress(lane, future, 'rate limited', action, tag, settled)
+			return
+		if policy == 'latest':
+			while lane.deferred:
+				old_action, old_future, old_tag = lane.deferred.popleft()
+				self.suppress(lane, old_future, 'superseded', old_action, old_tag, settled)
+		elif len(lane.deferred) >= self._queue_size:
+			self.queue_full(lane, future, action, tag, settled)
+			return
+		lane.output.state = action.state_key
+		lane.deferred.append((action, future, tag))
+		lane.limiter.deferred += 1
+		if lane.metrics:
+			lane.metrics[6].inc()
+		if not lane.release_timer:
+			self.arm_release(lane)
+
+	def arm_release(self, lane):
+		lane.release_timer = pi_control.timers.get_wheel(log_level=self._log_level).call_later(lane.limiter.wait_time(), self.release, lane)
+
+	def release(self, lane):
+		with self._lock:
+			lane.release_timer = None
+			if self._closed or not lane.deferred:
+				return
+			if lane.limiter.take():
+				self.arm_release(lane)
+				return
+			action, future, tag = lane.deferred.popleft()
+			self.enqueue(lane, action, future, tag)
+			if lane.deferred:
+				self.arm_release(lane)
+
+	def _run(self, lane):
+		while True:
+			with self._lock:
+				action, future, queued_ts, tag = lane.queue.popleft()
+			if future.set_running_or_notify_cancel():
+				start_ts = time.perf_counter()
+				try:
+					result = action.run()
+				except Exception as err:
+					self.finish(lane, action, future, tag, queued_ts, start_ts, error=err)
+				else:
+					if isinstance(result, concurrent.futures.Future):
+						result.add_done_callback(functools.partial(self.finish_pending, lane, action, future, tag, queued_ts, start_ts))
+					else:
+						self.finish(lane, action, future, tag, queued_ts, start_ts, result)
+			else:
+				self.observe(action, tag, 'cancelled')
+
+			with self._lock:
+				if not lane.queue:
+					lane.running = False
+					self._idle.notify_all()
+					return
+				# Hand the worker back between actions so one busy output can't hold it. Once
+				# shut down, the pool takes no more work, so the lane finishes on this worker.
+				if not self._closed:
+					self._executor.submit(self._run, lane)
+					return
+
+	def finish(self, lane, action, future, tag, queued_ts, start_ts, result=None, error=None):
+		metrics = lane.metrics
+		seconds = time.perf_counter() - start_ts
+		if metrics:
+			metrics[0].inc()
+			metrics[3].observe(seconds)
+			metrics[4].observe(start_ts - queued_ts)
+		if error is None:
+			future.set_result(result)
+			self.observe(action, tag, 'ok', seconds)
+			return
+		self.log("{} action failed: {}", 'error', lane.output.name, error)
+		lane.output.forget_state()
+		if metrics:
+			metrics[1].inc()
+		future.set_exception(error)
+		self.observe(action, tag, 'failed', seconds)
+
+	def finish_pending(self, lane, action, future, tag, queued_ts, start_ts, pending):
+		if pending.cancelled():
+			self.finish(lane, action, future, tag, queued_ts, start_ts, error=concurrent.futures.CancelledError())
+		elif pending.exception() is not None:
+			self.finish(lane, action, future, tag, queued_ts, start_ts, error=pending.exception())
+		else:
+			self.finish(lane, action, future, tag, queued_ts, start_ts, pending.result())
+
+	def gather(self, futures):
+		group = concurrent.futures.Future()
+		group.set_running_or_notify_cancel()
+		if not futures:
+			group.set_result([])
+			return group
+		pending = [len(futures)]
+		lock = threading.Lock()
+
+		def done(future):
+			with lock:
+				pending[0] -= 1
+				if pending[0]:
+					return
+			results = []
+			for item in futures:
+				if item.cancelled():
+					results.append(None)
+				elif item.exception():
+					results.append(item.exception())
+				else:
+					results.append(item.result())
+			group.set_result(results)
+
+		for future in futures:
+			future.add_done_callback(done)
+		return group
+
+	def shutdown(self, wait=True):
+		cancelled = []
+		with self._lock:
+			self._closed = True
+			for lane in self._lanes.values():
+				if lane.release_timer:
+					lane.release_timer.cancel()
+					lane.release_timer = None
+				while lane.deferred:
+					action, future, tag = lane.deferred.popleft()
+					cancelled.append((future, None, action, tag, 'cancelled'))
+		self.settle(cancelled)
+		# Queued actions still run; wait for them before the pool stops taking work
+		if wait:
+			with self._lock:
+				self._idle.wait_for(lambda: not any(lane.running for lane in self._lanes.values()))
+		if not self._shared:
+			self._executor.shutdown(wait=wait)
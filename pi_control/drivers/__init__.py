@@ -0,0 +1,6 @@
+# print("Loaded pi_control drivers")
+
+"""
+2026-10-18 One module per input and output type. pi_control.device.get_driver() imports a module
+the first time a config uses its type, so unused drivers and their libraries never load.
+"""
@@ -0,0 +1,77 @@
+# print("Loaded pi_control button driver")
+
+import pi_control.device
+
+"""
+2021-12-30 Added debounce and timed checks after debounce.
+2026-10-18 Added hold_time.
+2026-10-18 Split out of pi_control.device; imported only when a config has a button.
+2026-10-18 Added current_status() for warm restarts.
+"""
+
+"""
+import pi_control.drivers.button
+"""
+
+class Button(pi_control.device.InputDevice):
+	"""
+	button = pi_control.drivers.button.Button(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'button'
+		
+		# Properties
+		if 'gpio_pin' not in args:
+			raise AttributeError("GPIO pin required for {} {}".format(self.type, self.name))
+		
+		# Internal args
+		pull_up_value = True
+		if 'pull_up' in args:
+			if type(args['pull_up']) is not type(True):
+				raise ValueError("Invalid pull_up type for {}".format(self._name))
+			if not args['pull_up']:
+				pull_up_value = False
+		
+		hold_time = 0.1
+		if 'hold_time' in args:
+			if type(args['hold_time']) is not int and type(args['hold_time']) is not float:
+				raise TypeError("Invalid hold_time type for {}".format(self._name))
+			hold_time = float(args['hold_time'])
+		
+		# Init
+		self._connection = self._backend.button(self._gpio_pin, pull_up=pull_up_value, hold_time=hold_time)
+		self._connection.when_held = self.event_pressed
+		self._connection.when_released = self.event_released
+	
+	
+	@property
+	def pressed(self):
+		if self._connection.is_pressed:
+			return True
+		return False
+	
+	def event_pressed(self):
+		self.log("{} pressed", 'notice', self.name)
+		self._last_value = 100
+		self.change_status('pressed')
+	
+	def event_released(self):
+		self.log("{} released", 'notice', self.name)
+		self._last_value = 0
+		self.change_status('released')
+	
+	def current_status(self):
+		if self.pressed:
+			return 'pressed'
+		return 'released'
+	
+	def update_status(self, startup=False):
+		self.log(self.name, 'start')
+		if self.pressed:
+			self.log("pressed", 'info')
+			self.change_status('pressed', startup)
+		else:
+			self.log("released", 'info')
+			self.change_status('released', startup)
+		self.log(self.name, 'end')
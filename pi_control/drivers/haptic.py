@@ -0,0 +1,89 @@
+# print("Loaded pi_control haptic driver")
+
+import pi_control.device
+
+"""
+2022-01-08 Added Haptic device.
+2026-10-18 Split out of pi_control.device; the DRV2605 driver loads only when a config has a haptic output.
+2026-10-18 Effects are queued on the shared I2C bus; a newer effect replaces one still waiting in the same tick.
+2026-10-18 The effect register is only written when the effect changes; every action still triggers GO.
+"""
+
+"""
+import pi_control.drivers.haptic
+"""
+
+class Haptic(pi_control.device.OutputDevice):
+	"""
+	haptic = pi_control.drivers.haptic.Haptic(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'haptic'
+		if 'source_bus' not in args:
+			raise AttributeError("Source bus required for {} {}".format(self.type, self.name))
+		self._connection = self._shared_bus.run(self._backend.drv2605, self._i2c)
+		self._loaded_effect = None
+		
+		self._motor = 'erm'
+		if 'motor' in args:
+			if type(args['motor']) is not str:
+				raise TypeError("motor in output {} must be type str".format(self.name))
+			args['motor'] = args['motor'].lower()
+			if args['motor'] not in ['erm', 'lra']:
+				raise AttributeError("Invalid motor in output {}".format(self.name))
+			self._motor = args['motor']
+			if self._motor == 'lra':
+				self._shared_bus.run(self._connection.use_LRM)
+		
+		self._effect = None
+		if 'effect' in args:
+			if type(args['effect']) is not str and type(args['effect']) is not int and type(args['effect']) is not float:
+				raise TypeError("effect in output {} must be type int".format(self.name))
+			effect = int(args['effect'])
+			if effect < 1 or effect > 123:
+				raise ValueError("Invalid effect value for {}".format(self.name))
+			self._effect = effect
+	
+	@property
+	def default_action(self):
+		return self._effect
+	
+	"""
+	params = haptic.prepare(action_info)
+	"""
+	def prepare(self, action_info):
+		effect = self._effect
+		if 'effect' in action_info:
+			if type(action_info['effect']) is not str and type(action_info['effect']) is not int and type(action_info['effect']) is not float:
+				raise TypeError("effect in output {} must be type int".format(self.name))
+			effect = int(action_info['effect'])
+			if effect < 1 or effect > 123:
+				raise ValueError("Invalid effect value for {}".format(self.name))
+		if not effect:
+			raise KeyError("effect is required for {} action {}".format(self.type, self.name))
+		
+		if 'action' not in action_info:
+			action_info = dict(action_info, action=effect)
+		params = super().prepare(action_info)
+		params['effect'] = effect
+		return params
+	
+	"""
+	haptic.run(params)
+	"""
+	def run(self, params):
+		super().run(params)
+		return self._shared_bus.submit(self.play, params['effect'], key=self).result()
+	
+	"""
+	haptic.play(effect)
+		Writes the effect register if it changed, then GO. Call through the bus.
+	"""
+	def play(self, effect):
+		if effect != self._loaded_effect:
+			self._loaded_effect = None
+			self._connection.sequence[0] = self._backend.haptic_effect(effect)
+			self._loaded_effect = effect
+		self._connection.play()
+		return effect
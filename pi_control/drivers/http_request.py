@@ -0,0 +1,183 @@
+# print("Loaded pi_control http_request driver")
+
+import concurrent.futures
+import functools
+import json
+import threading
+
+import pi_control.device
+import pi_control.http_pool
+
+"""
+2022-01-08 Added HTTP output.
+2026-10-18 Uses a pooled keep-alive client instead of curl.
+2026-10-18 Split out of pi_control.device; the HTTP client loads only when a config has an http output.
+2026-10-18 A request identical to the last one is skipped; the output's state is forgotten when a request fails.
+2026-10-18 run() returns a future that fails on an error response, so the dispatcher reports how the request ended.
+2026-10-18 A repeated request is only skipped within dedupe_ttl, 1 second by default, and never after a restart.
+"""
+
+"""
+import pi_control.drivers.http_request
+"""
+
+class HTTP(pi_control.device.OutputDevice):
+	"""
+	http = pi_control.drivers.http_request.HTTP(name, args)
+	"""
+	DEDUPE = True
+	# Only collapse bursts; the server, or anyone else, may change what a request applied
+	DEDUPE_TTL = 1.0
+	SNAPSHOT_STATE = False
+	
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'http'
+		self._method = 'get'
+		if 'method' in args:
+			if type(args['method']) is not str:
+				raise TypeError("method in output {} must be type str".format(self.name))
+			self._method = args['method']
+		self._url = None
+		if 'url' in args:
+			if type(args['url']) is not str:
+				raise TypeError("url in output {} must be type str".format(self.name))
+			self._url = args['url']
+		self._bearer_token = None
+		if 'bearer_token' in args:
+			if type(args['bearer_token']) is not str:
+				raise TypeError("bearer_token in output {} must be type str".format(self.name))
+			self._bearer_token = args['bearer_token']
+		self._post_data = {}
+		if 'post_data' in args:
+			if type(args['post_data']) is not dict:
+				raise TypeError("post_data in output {} must be type dict".format(self.name))
+			self._method = 'post'
+			self._post_data = args['post_data']
+		self._timeout = 5.0
+		if 'timeout' in args:
+			if type(args['timeout']) is not int and type(args['timeout']) is not float:
+				raise TypeError("timeout in output {} must be type float".format(self.name))
+			self._timeout = float(args['timeout'])
+		self._max_in_flight = 2
+		if 'max_in_flight' in args:
+			if type(args['max_in_flight']) is not int or args['max_in_flight'] < 1:
+				raise ValueError("Invalid max_in_flight in output {}".format(self.name))
+			self._max_in_flight = args['max_in_flight']
+		self._in_flight = threading.BoundedSemaphore(self._max_in_flight)
+		self._pool = pi_control.http_pool.get_pool()
+		
+		self.last_response_status = None
+		self.last_response_time = None
+		self.last_error = None
+	
+	
+	@property
+	def default_action(self):
+		return self._method
+	
+	"""
+	params = http.prepare(action_info)
+		Resolves the URL, headers, and JSON body once so run() only sends them.
+	"""
+	def prepare(self, action_info):
+		params = super().prepare(action_info)
+		
+		# Set variables
+		method = self._method
+		if 'method' in action_info:
+			if type(action_info['method']) is not str:
+				raise TypeError("method in action {} must be type str".format(self.name))
+			method = action_info['method']
+		
+		url = self._url
+		if 'url' in action_info:
+			if type(action_info['url']) is not str:
+				raise TypeError("url in action {} must be type str".format(self.name))
+			url = action_info['url']
+		if not url:
+			raise KeyError("url is required for {} action {}".format(self.type, self.name))
+		
+		bearer_token = self._bearer_token
+		if 'bearer_token' in action_info:
+			if type(action_info['bearer_token']) is not str:
+				raise TypeError("bearer_token in action {} must be type str".format(self.name))
+			bearer_token = action_info['bearer_token']
+		
+		post_data = self._post_data.copy()
+		if 'post_data' in action_info:
+			if type(action_info['post_data']) is not dict:
+				raise TypeError("post_data in action {} must be type dict".format(self.name))
+			for key, value in action_info['post_data'].items():
+				post_data[key] = value
+		
+		headers = {}
+		if bearer_token:
+			headers['Authorization'] = 'Bearer ' + bearer_token
+		
+		body = None
+		if len(post_data):
+			method = 'post'
+			body = json.dumps(post_data).encode('utf-8')
+			headers['Content-Type'] = 'application/json'
+		
+		params['method'] = method.upper()
+		params['url'] = url
+		params['headers'] = headers
+		params['body'] = body
+		return params
+	
+	"""
+	future = http.run(params)
+		Resolves to the response once it arrives, or raises the request's error, or
+		pi_control.http_pool.HTTPError for an error status.
+	"""
+	def run(self, params):
+		super().run(params)
+		
+		if 'value' in params:
+			self._last_status = params['value']
+		
+		if self._dry_run:
+			self.log("{} {} {}", 'notice', params['method'], params['url'], params['body'])
+			return None
+		
+		# Limit requests waiting on a slow server
+		if not self._in_flight.acquire(blocking=False):
+			self.log("{} has {} requests in flight, dropping {} {}", 'warn', self.name, self._max_in_flight, params['method'], params['url'])
+			self.forget_state()
+			return None
+		self.log("{} {} {}", 'info', params['method'], params['url'], params['body'])
+		try:
+			future = self._pool.request(params['method'], params['url'], params['headers'], params['body'], self._timeout)
+		except Exception:
+			# It never reached the pool, so give its slot back
+			self._in_flight.release()
+			self.forget_state()
+			raise
+		result = concurrent.futures.Future()
+		result.set_running_or_notify_cancel()
+		future.add_done_callback(functools.partial(self.finish_request, result))
+		return result
+	
+	def finish_request(self, result, future):
+		self._in_flight.release()
+		try:
+			response = future.result()
+		except Exception as err:
+			self.last_error = err
+			self.log("{} request failed: {}", 'error', self.name, err)
+			# The server may not have applied it, so don't skip the next identical request
+			self.forget_state()
+			result.set_exception(err)
+			return
+		self.last_response_status = response.status
+		self.last_response_time = response.elapsed
+		self.last_error = None
+		if not response.ok:
+			self.forget_state()
+			self.log("{} response {} {}", 'warn', self.name, response.status, response.reason)
+			result.set_exception(pi_control.http_pool.HTTPError(response))
+		else:
+			self.log("{} response {} in {:.1f}ms", 'info', self.name, response.status, response.elapsed * 1000)
+			result.set_result(response)
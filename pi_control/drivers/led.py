@@ -0,0 +1,213 @@
+# print("Loaded pi_control led driver")
+
+import pi_control.animation
+import pi_control.device
+
+"""
+2021-12-30 Added threading on output and canceling threads.
+2026-10-18 Effects run on the shared animation engine instead of a thread each.
+2026-10-18 Split out of pi_control.device with the animation engine; imported only when a config has an LED.
+2026-10-18 Repeated on, off, and value actions are skipped by the dispatcher instead of in run().
+2026-10-18 restore() puts back the brightness from a snapshot; an effect that was running is not resumed.
+"""
+
+"""
+import pi_control.drivers.led
+"""
+
+# Status while running and status when done for each LED effect
+LED_EFFECTS = {
+	'blink': ('blink', 'off'),
+	'flicker_on': ('on', 'on'),
+	'flicker_off': ('off', 'off'),
+	'fade_on': ('on', 'on'),
+	'fade_off': ('off', 'off')
+}
+LED_ACTIONS = ['on', 'off', 'value'] + list(LED_EFFECTS.keys())
+
+# Brightness each action leaves the LED at; blink is always run
+LED_LEVELS = {
+	'on': 1.0,
+	'off': 0.0,
+	'flicker_on': 1.0,
+	'flicker_off': 0.0,
+	'fade_on': 1.0,
+	'fade_off': 0.0
+}
+
+class LED(pi_control.device.OutputDevice):
+	"""
+	led = pi_control.drivers.led.LED(name, args)
+	"""
+	DEDUPE = True
+	
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'led'
+		if 'gpio_pin' not in args:
+			raise AttributeError("GPIO pin required for {} {}".format(self.type, self.name))
+		self._connection = self._backend.pwm_led(self._gpio_pin)
+		if self.panel:
+			self._animator = self.panel.animator
+		else:
+			self._animator = pi_control.animation.get_animator(log_level=self._log_level)
+		self.off()
+		self.state = self.state_key({ "action": 'off' })
+		
+	
+	"""
+	params = led.prepare(action_info)
+	"""
+	def prepare(self, action_info):
+		params = super().prepare(action_info)
+		action = params['action']
+		if action not in LED_ACTIONS:
+			raise ValueError("Invalid action {} for {} {}".format(action, self.type, self.name))
+		
+		if 'value' in params:
+			params['value'] = float(params['value'])
+		elif action == 'value':
+			raise KeyError("value is required for {} action {}".format(self.type, self.name))
+		params['duration'] = 1.0
+		if 'duration' in action_info:
+			params['duration'] = float(action_info['duration'])
+		params['iterations'] = 1
+		if 'iterations' in action_info:
+			params['iterations'] = int(action_info['iterations'])
+		
+		# Effects are rendered to frames here instead of on every run
+		if action == 'blink':
+			params['frames'] = pi_control.animation.blink(params['iterations'], params['duration'], self._animator.fps)
+		elif action in LED_EFFECTS:
+			params['frames'] = getattr(pi_control.animation, action)(params['duration'], self._animator.fps)
+		return params
+	
+	"""
+	key = led.state_key(params)
+	"""
+	def state_key(self, params):
+		if params.get('action') == 'value':
+			return params['value']
+		return LED_LEVELS.get(params.get('action'))
+	
+	"""
+	led.restore(info)
+	"""
+	def restore(self, info):
+		super().restore(info)
+		level = self.state
+		if type(level) is not float and type(level) is not int:
+			self.off()
+			self.state = self.state_key({ "action": 'off' })
+			return
+		if level > 0:
+			self.on(level)
+		else:
+			self.off()
+	
+	"""
+	led.run(params)
+	"""
+	def run(self, params):
+		super().run(params)
+		action = params['action']
+		self.log(action, 'info')
+		
+		if action == 'on':
+			return self.on()
+		elif action == 'off':
+			return self.off()
+		elif action == 'value':
+			return self.on(params['value'])
+		elif action in LED_EFFECTS:
+			status, end_status = LED_EFFECTS[action]
+			self._last_status = status
+			return self.animate(params['frames'], end_status)
+		return False
+	
+	"""
+	led.on()
+	"""
+	def on(self, value=1.0):
+		self._animator.cancel(self._connection, value)
+		self._last_status = 'on'
+		self._last_value = 100
+		return True
+	
+	"""
+	led.off()
+	"""
+	def off(self):
+		self._animator.cancel(self._connection, 0.0)
+		self._last_status = 'off'
+		self._last_value = 0
+		return True
+	
+	"""
+	led.animate(values, end_status)
+		Replaces any running effect. The LED is left on or off to match end_status.
+	"""
+	def animate(self, values, end_status):
+		if end_status == 'on':
+			self._animator.start(self._connection, values, 1.0, self.finish_on)
+		else:
+			self._animator.start(self._connection, values, 0.0, self.finish_off)
+		return True
+	
+	def close(self):
+		if self._connection is not None:
+			self._animator.cancel(self._connection)
+		super().close()
+	
+	def finish_on(self):
+		self._last_status = 'on'
+		self._last_value = 100
+	
+	def finish_off(self):
+		self._last_status = 'off'
+		self._last_value = 0
+	
+	"""
+	led.blink(iterations, duration)
+		start off
+		end off
+	"""
+	def blink(self, iterations=3, duration=3):
+		self._last_status = 'blink'
+		return self.animate(pi_control.animation.blink(iterations, duration, self._animator.fps), 'off')
+	
+	"""
+	led.flicker_on(duration)
+		start off
+		end on
+	"""
+	def flicker_on(self, duration=.5):
+		self._last_status = 'on'
+		return self.animate(pi_control.animation.flicker_on(duration, self._animator.fps), 'on')
+	
+	"""
+	led.flicker_off(duration)
+		start on
+		end off
+	"""
+	def flicker_off(self, duration=.5):
+		self._last_status = 'off'
+		return self.animate(pi_control.animation.flicker_off(duration, self._animator.fps), 'off')
+	
+	"""
+	led.fade_on(duration)
+		start off
+		end on
+	"""
+	def fade_on(self, duration=.5):
+		self._last_status = 'on'
+		return self.animate(pi_control.animation.fade_on(duration, self._animator.fps), 'on')
+	
+	"""
+	led.fade_off(duration)
+		start on
+		end off
+	"""
+	def fade_off(self, duration=.5):
+		self._last_status = 'off'
+		return self.animate(pi_control.animation.fade_off(duration, self._animator.fps), 'off')
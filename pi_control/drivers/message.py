@@ -0,0 +1,118 @@
+# print("Loaded pi_control message driver")
+
+import threading
+
+import pi_control.device
+
+"""
+2022-01-08 Added Message output.
+2026-10-18 Split out of pi_control.device; boto3 loads only when a config has an sns message.
+2026-10-18 The SNS client and SMS attributes are set up on a background thread instead of during Panel init.
+"""
+
+"""
+import pi_control.drivers.message
+"""
+
+class Message(pi_control.device.OutputDevice):
+	"""
+	message = pi_control.drivers.message.Message(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'message'
+		
+		self._service = 'print'
+		if 'service' in args:
+			if type(args['service']) is not str:
+				raise TypeError("service in output {} must be type str".format(self.name))
+			if args['service'] not in ['print', 'sns']:
+				raise ValueError("Invalid service in output {}".format(self.name))
+			self._service = args['service']
+		
+		self._message = None
+		if 'message' in args:
+			if type(args['message']) is not str:
+				raise TypeError("message in output {} must be type str".format(self.name))
+			self._message = args['message']
+		
+		self._topic_arn = None
+		self._sns = None
+		self._sns_lock = threading.Lock()
+		if self._service == 'sns':
+			if 'topic_arn' in args:
+				if type(args['topic_arn']) is not str:
+					raise TypeError("topic_arn in output {} must be type str".format(self.name))
+				self._topic_arn = args['topic_arn']
+			if not self._topic_arn:
+				raise KeyError("topic_arn is required for {} action {}".format(self.type, self.name))
+			
+			# Importing boto3 and the SMS attributes call are slow, so connect in the background
+			if not self._dry_run:
+				threading.Thread(target=self.get_sns, name=self.name + '-sns', daemon=True).start()
+	
+	"""
+	sns = message.get_sns()
+		Creates the SNS client on first use. A publish that arrives while the background
+		connect is still running waits for it.
+	"""
+	def get_sns(self):
+		with self._sns_lock:
+			if self._sns is None:
+				try:
+					sns = self._backend.sns()
+					sns.set_sms_attributes(attributes = { 'DefaultSMSType': 'Transactional' })
+				except Exception as err:
+					self.log("Unable to connect to SNS for {}: {}", 'error', self.name, err)
+					return None
+				self._sns = sns
+			return self._sns
+	
+	@property
+	def default_action(self):
+		return self._service
+	
+	"""
+	params = message.prepare(action_info)
+	"""
+	def prepare(self, action_info):
+		params = super().prepare(action_info)
+		
+		# Set variables
+		message = self._message
+		if 'message' in action_info:
+			if type(action_info['message']) is not str:
+				raise TypeError("message in action {} must be type str".format(self.name))
+			message = action_info['message']
+		if not message:
+			raise KeyError("message is required for {} action {}".format(self.type, self.name))
+		params['message'] = message
+		return params
+	
+	"""
+	message.run(params)
+	"""
+	def run(self, params):
+		super().run(params)
+		message = params['message']
+		
+		if self._service == 'print':
+			print(message)
+		if self._service == 'sns':
+			if self._dry_run:
+				self.log("{}:\n  {}", 'notice', self._topic_arn, message)
+			else:
+				self.log("{}:\n  {}", 'info', self._topic_arn, message)
+				sns = self.get_sns()
+				if not sns:
+					raise ConnectionError("SNS is not available for {}".format(self.name))
+				response = sns.publish(
+					TopicArn = self._topic_arn,
+					Message = message,
+					MessageStructure = 'string'
+				)
+				
+				self.log("response: {}", 'info', response)
+				if type(response) is dict and 'ResponseMetadata' in response:
+					if response['ResponseMetadata'].get('HTTPStatusCode') == 200:
+						return response.get('MessageId')
@@ -0,0 +1,102 @@
+# print("Loaded pi_control potentiometer driver")
+
+import pi_control.device
+
+"""
+2022-01-01 Added potentiometers.
+2022-01-04 Added update_status and actions based on value ranges.
+2026-10-18 Ranges are found by bisection, with optional hysteresis.
+2026-10-18 Split out of pi_control.device; imported only when a config has a potentiometer.
+2026-10-18 Added current_status() and restore() for warm restarts.
+"""
+
+"""
+import pi_control.drivers.potentiometer
+"""
+
+class Potentiometer(pi_control.device.InputDevice):
+	"""
+	button = pi_control.drivers.potentiometer.Potentiometer(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'potentiometer'
+		self._needs_monitoring = True
+		self._last_value = 0
+		self._last_action_key = 100000
+		self._last_action_index = None
+		
+		# Properties
+		if 'source_device' not in args:
+			raise AttributeError("Source device is required for {} {}".format(self.type, self.name))
+		self._source_device = args['source_device']
+		if type(self.source_channel) is not int:
+			raise AttributeError("Channel is required for {} {}".format(self.type, self.name))
+		
+		# Value must move this far past a range boundary before the range changes
+		self._hysteresis = 0.0
+		if 'hysteresis' in args:
+			if type(args['hysteresis']) is not int and type(args['hysteresis']) is not float:
+				raise TypeError("hysteresis in {} {} must be type float".format(self.type, self.name))
+			if args['hysteresis'] < 0:
+				raise ValueError("Invalid hysteresis value for {} {}".format(self.type, self.name))
+			self._hysteresis = float(args['hysteresis'])
+		
+		self.process_analog_actions()
+		
+		# Init
+		self._connection = self._source_device.get_connection(self.source_channel)
+		
+		# Share a burst read with other inputs on the same expander polled in the same tick
+		poll_interval = self.poll_interval
+		if not poll_interval and self.panel:
+			poll_interval = self.panel._polling_interval
+		if poll_interval:
+			self._connection.max_age = poll_interval / 2
+	
+	
+	@property
+	def value(self):
+		self._last_value = int(self._connection.value * 100)
+		self.log("{} {}", 'notice', self.name, self._last_value)
+		return self._last_value
+	
+	def current_status(self):
+		index = self.get_action_index(self.value)
+		if index is None:
+			return None
+		return self._action_keys[index]
+	
+	def restore(self, info):
+		super().restore(info)
+		if info.get('status') in self._action_keys:
+			self._last_action_key = info['status']
+			self._last_action_index = self._action_keys.index(info['status'])
+	
+	def update_status(self, startup=False):
+		self.log(self.name, 'start')
+		value = self.value
+		index = self.get_action_index(value)
+		if index is None:
+			self.log("{} no action key", 'end', self.name)
+			return None
+		last_index = self._last_action_index
+		if index == last_index:
+			self.log("{} same as last action", 'end', self.name)
+			return None
+		
+		# Stay in the current range until the value clears the boundary by the hysteresis
+		if last_index is not None and self._hysteresis:
+			if index > last_index and value < self._thresholds[last_index] + self._hysteresis:
+				self.log("{} within hysteresis", 'end', self.name)
+				return None
+			if index < last_index and last_index > 0 and value >= self._thresholds[last_index - 1] - self._hysteresis:
+				self.log("{} within hysteresis", 'end', self.name)
+				return None
+		
+		action_key = self._action_keys[index]
+		self.log("{}: {} - {}", 'debug', value, self._last_action_key, action_key)
+		self._last_action_index = index
+		self._last_action_key = action_key
+		self.change_status(action_key, startup)
+		self.log(self.name, 'end')
@@ -0,0 +1,139 @@
+# print("Loaded pi_control rotary_encoder driver")
+
+import threading
+import time
+
+import pi_control.device
+import pi_control.timers
+
+"""
+2022-01-05 Added GPIO rotary encoder.
+2026-10-18 Split out of pi_control.device; imported only when a config has a rotary encoder.
+2026-10-18 Added coalesce and max_rate to turn fast spins into one event per window with the net delta.
+2026-10-18 The net delta goes out with each event, so observers and the journal see it.
+"""
+
+"""
+import pi_control.drivers.rotary_encoder
+"""
+
+class RotaryEncoder(pi_control.device.InputDevice):
+	"""
+	rotary_encoder = pi_control.drivers.rotary_encoder.RotaryEncoder(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'rotary_encoder'
+		self._value_type = 'absolute'
+		self._total_segments = 16
+		
+		# Properties
+		if 'gpio_pins' not in args:
+			raise AttributeError("GPIO pins required for {} {}".format(self.type, self.name))
+		if 'up' not in args['gpio_pins'] or 'down' not in args['gpio_pins']:
+			raise AttributeError("'up' and 'down' GPIO pins required for {} {}".format(self.type, self.name))
+		
+		if 'value_type' in args:
+			if args['value_type'] == 'directional':
+				self._value_type = args['value_type']
+		
+		# Init
+		self._connection = self._backend.rotary_encoder(args['gpio_pins']['up'], args['gpio_pins']['down'])
+		self._connection.when_rotated_clockwise = self.event_up
+		self._connection.when_rotated_counter_clockwise = self.event_down
+		if 'total_segments' in args:
+			self._total_segments = int(args['total_segments']/2)
+		
+		# Step coalescing
+		self._coalesce = 0.0
+		if 'coalesce' in args:
+			if type(args['coalesce']) is not int and type(args['coalesce']) is not float or args['coalesce'] < 0:
+				raise ValueError("Invalid coalesce value for {} {}".format(self.type, self.name))
+			self._coalesce = float(args['coalesce'])
+		
+		self._min_interval = 0.0
+		if 'max_rate' in args:
+			if type(args['max_rate']) is not int and type(args['max_rate']) is not float or args['max_rate'] <= 0:
+				raise ValueError("Invalid max_rate value for {} {}".format(self.type, self.name))
+			self._min_interval = 1.0 / args['max_rate']
+		
+		self._lock = threading.Lock()
+		self._pending_delta = 0
+		self._emit_timer = None
+		self._last_emit_ts = None
+		self._last_delta = 0
+	
+	@property
+	def steps(self):
+		return self._connection.steps
+	
+	"""
+	rotary_encoder.last_delta
+		Net steps in the last event; positive is clockwise
+	"""
+	@property
+	def last_delta(self):
+		return self._last_delta
+	
+	def event_up(self):
+		self.step(1)
+	
+	def event_down(self):
+		self.step(-1)
+	
+	"""
+	rotary_encoder.step(delta)
+		Without coalesce or max_rate each detent is an event. Otherwise steps add up until the
+		window closes, and no more than max_rate events a second go out.
+	"""
+	def step(self, delta):
+		if not self._coalesce and not self._min_interval:
+			self.emit_event(delta)
+			return
+		with self._lock:
+			self._pending_delta += delta
+			if self._emit_timer and self._emit_timer.active:
+				return
+			delay = self._coalesce
+			if self._last_emit_ts is not None:
+				delay = max(delay, self._last_emit_ts + self._min_interval - time.monotonic())
+			self._emit_timer = self._timers.call_later(delay, self.flush)
+	
+	def flush(self):
+		with self._lock:
+			delta = self._pending_delta
+			self._emit_timer = None
+			if not delta:
+				return
+			# Keep gathering until debounce allows the event instead of losing it
+			if self.on_hold:
+				remaining = self.last_changed_ts + self.debounce - time.monotonic()
+				self._emit_timer = self._timers.call_later(max(remaining, 0.0) + pi_control.timers.TICK, self.flush)
+				return
+			self._pending_delta = 0
+			self._last_emit_ts = time.monotonic()
+		self.emit_event(delta)
+	
+	def emit_event(self, delta):
+		self._last_delta = delta
+		label = self._connection.steps
+		if self._value_type == 'directional':
+			label = "up" if delta > 0 else "down"
+		self.log("{} {} ({:+d})", 'notice', self.name, label, delta)
+		self.change_status(label, False, True, delta)
+	
+	def close(self):
+		with self._lock:
+			if self._emit_timer:
+				self._emit_timer.cancel()
+				self._emit_timer = None
+		super().close()
+	
+	def update_status(self, startup=False):
+		self.log(self.name, 'start')
+		label = self._connection.steps
+		if self._value_type == 'directional':
+			label = self.last_status
+		self.log("{}: Update status - {}", 'debug', self.name, label)
+# 		self.change_status(label, startup)
+		self.log(self.name, 'end')
@@ -0,0 +1,72 @@
+# print("Loaded pi_control selector_switch driver")
+
+import pi_control.device
+
+"""
+2026-10-18 Split out of pi_control.device; imported only when a config has a selector switch.
+2026-10-18 Added current_status() for warm restarts.
+"""
+
+"""
+import pi_control.drivers.selector_switch
+"""
+
+class SelectorSwitch(pi_control.device.InputDevice):
+	"""
+	button = pi_control.drivers.selector_switch.SelectorSwitch(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'button'
+		
+		# Properties
+		if 'gpio_pins' not in args:
+			raise AttributeError("GPIO pins required for {} {}".format(self.type, self.name))
+		
+		# Internal args
+		pull_up_value = True
+		if 'pull_up' in args:
+			if type(args['pull_up']) is not type(True):
+				raise ValueError("Invalid pull_up type for {}".format(self._name))
+			if not args['pull_up']:
+				pull_up_value = False
+		
+		# Init
+		for label, gpio_pin in self.gpio_pins.items():
+			self._connections[label] = self._backend.button(gpio_pin, pull_up=pull_up_value)
+			self._connections[label].when_pressed = self.event_selected
+	
+	
+	@property
+	def selection(self):
+		for label, connection in self._connections.items():
+			if connection.is_pressed:
+				return label
+		return None
+	
+	def event_selected(self):
+		label = self.selection
+		if not label:
+			self.log("{} no label", 'end', self.name)
+			return
+		self.log("{} {}", 'notice', self.name, label)
+		self.change_status(label)
+	
+	def current_status(self):
+		return self.selection
+	
+	def update_status(self, startup=False):
+		self.log(self.name, 'start')
+		label = self.selection
+		if not label:
+			self.log("{} no label", 'end', self.name)
+			return
+		self.log("{}: Update status - {}", 'debug', self.name, label)
+		self.change_status(label, startup)
+		self.log(self.name, 'end')
+	
+
+
+"""
+Output Devices
+"""
@@ -0,0 +1,85 @@
+# print("Loaded pi_control sound driver")
+
+import os
+
+import pi_control.audio
+import pi_control.device
+
+"""
+2022-01-08 Added Sound output.
+2026-10-18 Plays preloaded samples through the shared audio engine.
+2026-10-18 Split out of pi_control.device; the audio engine loads only when a config has a sound output.
+"""
+
+"""
+import pi_control.drivers.sound
+"""
+
+SOUND_DIR = '/opt/control/sounds'
+
+
+class Sound(pi_control.device.OutputDevice):
+	"""
+	sound = pi_control.drivers.sound.Sound(name, args)
+	"""
+	def __init__(self, name, args={}, dry_run=False, log_level=None):
+		super().__init__(name, args, dry_run=dry_run, log_level=log_level)
+		self._type = 'sound'
+		if self.panel:
+			self._engine = self.panel.audio
+		else:
+			self._engine = pi_control.audio.get_engine(log_level=self._log_level)
+		self._file = None
+		if 'file' in args:
+			if type(args['file']) is not str:
+				raise TypeError("file in output {} must be type str".format(self.name))
+			self._file = args['file']
+			self.preload(self._file)
+	
+	def get_path(self, file):
+		return os.path.join(SOUND_DIR, file)
+	
+	"""
+	sound.preload(file)
+	"""
+	def preload(self, file):
+		try:
+			self._engine.load(self.get_path(file))
+		except Exception as err:
+			self.log("Unable to load {} for {}: {}", 'error', file, self.name, err)
+			return False
+		return True
+	
+	@property
+	def default_action(self):
+		return self._file
+	
+	"""
+	params = sound.prepare(action_info)
+	"""
+	def prepare(self, action_info):
+		params = super().prepare(action_info)
+		
+		# Set variables
+		file = self._file
+		if 'file' in action_info:
+			if type(action_info['file']) is not str:
+				raise TypeError("file in action {} must be type str".format(self.name))
+			file = action_info['file']
+			self.preload(file)
+		if not file:
+			raise KeyError("file is required for {} action {}".format(self.type, self.name))
+		params['file'] = file
+		params['path'] = self.get_path(file)
+		return params
+	
+	"""
+	sound.run(params)
+	"""
+	def run(self, params):
+		super().run(params)
+		if self._dry_run:
+			self.log("play {}", 'notice', params['file'])
+			return None
+		self.log("play {}", 'info', params['file'])
+		return self._engine.play(params['path'])
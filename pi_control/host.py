@@ -0,0 +1,365 @@
+# print("Loaded pi_control host module")
+
+import concurrent.futures
+import multiprocessing
+import os
+import re
+import signal
+import threading
+import time
+
+import pi_control.config
+import pi_control.log
+import pi_control.panel
+import pi_control.scheduler
+
+"""
+2026-10-18 Runs several panels in one process on shared dispatch workers, poll scheduler, buses,
+and HTTP pool, with optional worker processes for panels that shouldn't share them.
+"""
+
+"""
+import pi_control.host
+panels, settings = pi_control.host.load_host_config(path)
+host = pi_control.host.Host(panels, **settings)
+"""
+
+WORKERS = 8
+# Seconds before restarting a worker process that exited, doubling up to RESTART_MAX
+RESTART_DELAY = 1.0
+RESTART_MAX = 60.0
+# A worker process that ran this long before exiting restarts after RESTART_DELAY again
+RESTART_RESET = 60.0
+READY_TIMEOUT = 60.0
+SETTINGS = ['workers', 'backend']
+
+HOST_CONFIG = re.compile(rb'^panels:', re.M)
+
+
+"""
+panels, settings = pi_control.host.load_host_config(path, name='panel')
+	A file with a top-level panels section is a host config:
+		host:
+		  workers: 8
+		panels:
+		  front_panel: /opt/control/front.yml
+		  studio_panel:
+		    config: studio.yml
+		    process: studio
+	Relative config paths are from the host config's directory. Any other file is a single
+	panel's config, returned as { name: path }.
+"""
+def load_host_config(path, name='panel'):
+	with open(path, 'rb') as file:
+		content = file.read()
+	# Panel configs are loaded through their cache, so only parse host configs here
+	if not HOST_CONFIG.search(content):
+		return { name: path }, {}
+	data = pi_control.config.parse_yaml(content)
+	if type(data.get('panels')) is not dict or not data['panels']:
+		raise TypeError("Invalid panels section in {}".format(path))
+	settings = data.get('host') or {}
+	if type(settings) is not dict:
+		raise TypeError("Invalid host section in {}".format(path))
+	for key in settings:
+		if key not in SETTINGS:
+			raise ValueError("Unknown host setting {} in {}".format(key, path))
+
+	directory = os.path.dirname(os.path.abspath(path))
+	panels = {}
+	for panel_name, spec in data['panels'].items():
+		if type(spec) is str:
+			spec = { "config": spec }
+		if type(spec) is not dict or type(spec.get('config')) is not str:
+			raise TypeError("Invalid config for panel {} in {}".format(panel_name, path))
+		spec = dict(spec, config=os.path.join(directory, spec['config']))
+		panels[str(panel_name)] = spec
+	return panels, dict(settings)
+
+
+def get_specs(panels):
+	if type(panels) is not dict or not panels:
+		raise TypeError("Invalid panels dictionary")
+	specs = {}
+	for name, spec in panels.items():
+		# A dict with a config key is a panel entry; any other dict is the panel's devices
+		if type(spec) is not dict or 'config' not in spec:
+			spec = { "config": spec }
+		if type(spec['config']) is not str and type(spec['config']) is not dict:
+			raise TypeError("Invalid config for panel {}".format(name))
+		process = spec.get('process')
+		if process is not None and type(process) is not str and type(process) is not int:
+			raise TypeError("Invalid process for panel {}".format(name))
+		specs[str(name)] = { "config": spec['config'], "process": None if process is None else str(process) }
+	return specs
+
+
+class Host(pi_control.log.Logger):
+	"""
+	host = pi_control.host.Host(panels, dry_run=False, log_level=4, backend=None, workers=8, setup=None)
+		panels is { name: config_filename || devices_dict || { "config": ..., "process": name } }.
+		Panels with no process run here on the host's dispatch workers and poll scheduler, and
+		share buses and the HTTP pool. Animation engines are shared per frame rate and audio
+		engines per sink; a bus tick or audio setting that differs from the first panel's is
+		logged and ignored. Panels with the same process run together in a worker
+		process, which is restarted if it exits. setup(host) is called in every process once its
+		panels are up; for worker processes it must be picklable.
+	host.panels
+		{ name: Panel } for the panels in this process
+	host.reload()
+	host.check()
+		Restarts worker processes that have exited. Call it every second or so.
+	host.stop()
+	"""
+	def __init__(self, panels, dry_run=False, log_level=4, backend=None, workers=WORKERS, setup=None):
+		self._log_level = log_level
+		if type(workers) is not int or workers < 1:
+			raise ValueError("Invalid host workers value {}".format(workers))
+		specs = get_specs(panels)
+		self._workers = workers
+		self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dispatch')
+		self._scheduler = pi_control.scheduler.PollScheduler('host-poll', log_level=log_level)
+		self._panels = {}
+		self._shards = {}
+		self._lock = threading.Lock()
+		self._stopped = False
+
+		# Worker processes start first so they load while this process builds its panels
+		options = { "dry_run": dry_run, "log_level": log_level, "backend": backend, "workers": workers, "setup": setup }
+		groups = {}
+		for name, spec in specs.items():
+			if spec['process'] is not None:
+				groups.setdefault(spec['process'], {})[name] = spec['config']
+		for process, group in groups.items():
+			self._shards[process] = Shard(process, group, options, log_level=log_level)
+			self._shards[process].start()
+
+		for name, spec in specs.items():
+			if spec['process'] is None:
+				try:
+					self._panels[name] = pi_control.panel.Panel(name, spec['config'], dry_run=dry_run, log_level=log_level, backend=backend, host=self)
+				except Exception as err:
+					self.log("Unable to start panel {}: {}", 'error', name, err)
+
+		for shard in self._shards.values():
+			shard.wait_ready(READY_TIMEOUT)
+		if not self._panels and not any(shard.ready for shard in self._shards.values()):
+			self.stop()
+			raise ValueError("No panels started")
+		if setup and self._panels:
+			setup(self)
+		self.log("Host running {} here{}", 'notice', ", ".join(sorted(self._panels)) or "no panels",
+			"".join("; {} in process {}".format(", ".join(sorted(shard.panels)), shard.name) for shard in self._shards.values()))
+
+	@property
+	def panels(self):
+		return self._panels
+
+	@property
+	def shards(self):
+		return self._shards
+
+	@property
+	def workers(self):
+		return self._workers
+
+	@property
+	def executor(self):
+		return self._executor
+
+	@property
+	def scheduler(self):
+		return self._scheduler
+
+	def get_panel(self, name):
+		if name in self._panels:
+			return self._panels[name]
+		return None
+
+	"""
+	changes = host.reload()
+		Reloads every panel here and asks worker processes to reload theirs. Returns
+		{ name: changes } from Panel.reload() for the panels here.
+	"""
+	def reload(self):
+		for shard in self._shards.values():
+			shard.send('reload')
+		return { name: panel.reload() for name, panel in list(self._panels.items()) }
+
+	def check(self):
+		if self._stopped:
+			return
+		for shard in self._shards.values():
+			shard.check()
+
+	def stop(self):
+		with self._lock:
+			if self._stopped:
+				return
+			self._stopped = True
+		for shard in self._shards.values():
+			shard.stop()
+		# Each panel releases its buses, and the last one closes them
+		for name, panel in list(self._panels.items()):
+			try:
+				panel.stop()
+			except Exception as err:
+				self.log("Unable to stop panel {}: {}", 'error', name, err)
+		self._scheduler.stop()
+		self._executor.shutdown(wait=True)
+
+
+class Shard(pi_control.log.Logger):
+	"""
+	shard = pi_control.host.Shard(name, panels, options)
+	shard.start()
+	shard.send('reload' || 'stop')
+	shard.check()
+	shard.stop()
+
+	A worker process running a Host for some panels. Processes are spawned rather than forked,
+	so they don't inherit this process's threads or hardware handles.
+	"""
+	def __init__(self, name, panels, options, log_level=4):
+		self._log_level = log_level
+		self._name = name
+		self._panels = panels
+		self._options = options
+		self._context = multiprocessing.get_context('spawn')
+		self._process = None
+		self._conn = None
+		self._ready = False
+		self._started = None
+		self._restarts = 0
+		self._failures = 0
+		self._restart_at = None
+		self._stopped = False
+
+	@property
+	def name(self):
+		return self._name
+
+	@property
+	def panels(self):
+		return self._panels
+
+	@property
+	def pid(self):
+		return self._process.pid if self._process else None
+
+	@property
+	def ready(self):
+		return self._ready
+
+	@property
+	def restarts(self):
+		return self._restarts
+
+	@property
+	def alive(self):
+		return self._process is not None and self._process.is_alive()
+
+	def start(self):
+		self._conn, child_conn = self._context.Pipe()
+		self._process = self._context.Process(target=run_shard, args=(self._name, self._panels, self._options, child_conn), name='shard-' + self._name, daemon=True)
+		self._process.start()
+		child_conn.close()
+		self._ready = False
+		self._started = time.monotonic()
+		self._restart_at = None
+
+	def wait_ready(self, timeout):
+		deadline = time.monotonic() + timeout
+		while not self._ready and self.alive:
+			if not self.receive(max(0.0, deadline - time.monotonic())):
+				break
+		if not self._ready:
+			self.log("Process {} didn't start {}", 'error', self._name, ", ".join(sorted(self._panels)))
+		return self._ready
+
+	def receive(self, timeout=0):
+		try:
+			if not self._conn.poll(timeout):
+				return False
+			message = self._conn.recv()
+		except (EOFError, OSError):
+			return False
+		if message[0] == 'ready':
+			self._ready = True
+			self.log("Process {} ({}) running {}", 'info', self._name, message[1], ", ".join(message[2]))
+		elif message[0] == 'error':
+			self.log("Process {} failed to start: {}", 'error', self._name, message[1])
+		return True
+
+	def send(self, command):
+		if not self.alive:
+			return False
+		try:
+			self._conn.send(command)
+		except (BrokenPipeError, OSError) as err:
+			self.log("Unable to reach process {}: {}", 'warn', self._name, err)
+			return False
+		return True
+
+	def check(self):
+		if self._stopped or self._process is None:
+			return
+		while self.receive():
+			pass
+		if self.alive:
+			return
+		now = time.monotonic()
+		if self._restart_at is None:
+			if self._started is not None and now - self._started >= RESTART_RESET:
+				self._failures = 0
+			delay = min(RESTART_MAX, RESTART_DELAY * 2 ** self._failures)
+			self._failures += 1
+			self._restart_at = now + delay
+			self.log("Process {} exited with {}, restarting in {:.0f}s", 'error', self._name, self._process.exitcode, delay)
+			return
+		if now >= self._restart_at:
+			self._conn.close()
+			self._restarts += 1
+			self.start()
+
+	def stop(self, timeout=10.0):
+		self._stopped = True
+		if self._process is None:
+			return
+		self.send('stop')
+		self._process.join(timeout)
+		if self._process.is_alive():
+			self.log("Process {} didn't stop, terminating it", 'warn', self._name)
+			self._process.terminate()
+			self._process.join(timeout)
+		self._conn.close()
+
+
+"""
+Worker process entry point. Runs a Host for its panels until the parent says stop or goes away.
+"""
+def run_shard(name, panels, options, conn):
+	# The parent decides when a worker stops; Ctrl-C in a terminal reaches the whole group
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	stopping = threading.Event()
+	signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+	try:
+		host = Host(panels, **options)
+	except Exception as err:
+		conn.send(('error', str(err)))
+		conn.close()
+		return
+	conn.send(('ready', os.getpid(), sorted(host.panels)))
+	while not stopping.is_set():
+		try:
+			if not conn.poll(0.5):
+				continue
+			command = conn.recv()
+		except (EOFError, OSError):
+			break
+		if command == 'reload':
+			host.reload()
+		elif command == 'stop':
+			break
+	host.stop()
+	conn.close()
@@ -0,0 +1,164 @@
+# print("Loaded pi_control http_pool module")
+
+import concurrent.futures
+import http.client
+import select
+import threading
+import time
+import urllib.parse
+
+"""
+2026-10-18 In-process HTTP client with keep-alive connections pooled per host. Replaces curl in the HTTP output.
+2026-10-18 A request that may have reached the server is only retried for idempotent methods.
+"""
+
+"""
+import pi_control.http_pool
+"""
+
+# Errors that mean a pooled keep-alive connection was closed by the server
+STALE_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest, http.client.BadStatusLine, BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+# Methods safe to send again when a reused connection fails after the request went out
+IDEMPOTENT = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS', 'TRACE')
+
+
+class HTTPError(Exception):
+	"""
+	raise HTTPError(response)
+		A response that came back with an error status
+	"""
+	def __init__(self, response):
+		super().__init__("{} {}".format(response.status, response.reason))
+		self.response = response
+
+
+class Response:
+	"""
+	response = pool.fetch('POST', url, headers, body)
+	response.status, response.reason, response.body, response.elapsed
+	"""
+	def __init__(self, status, reason, body, elapsed):
+		self.status = status
+		self.reason = reason
+		self.body = body
+		self.elapsed = elapsed
+
+	@property
+	def ok(self):
+		return 200 <= self.status < 300
+
+	def __repr__(self):
+		return "<Response {} {} {:.1f}ms>".format(self.status, self.reason, self.elapsed * 1000)
+
+
+class ConnectionPool:
+	"""
+	pool = pi_control.http_pool.get_pool()
+	future = pool.request('POST', url, headers, body, timeout=5)
+	response = future.result()
+
+	Idle connections are kept per (scheme, host, port) and reused most-recent first, so repeated
+	calls to the same host skip DNS and the TCP/TLS handshake. Idle connections the server has
+	closed are dropped at checkout. A reused connection that still fails is retried on a fresh one
+	if the request never went out, or for any idempotent method.
+	"""
+	def __init__(self, workers=8, max_idle=4, idle_timeout=30):
+		self._max_idle = max_idle
+		self._idle_timeout = idle_timeout
+		self._idle = {}
+		self._lock = threading.Lock()
+		self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http')
+
+	def _key(self, url):
+		parts = urllib.parse.urlsplit(url)
+		if parts.scheme not in ('http', 'https'):
+			raise ValueError("Invalid URL scheme in {}".format(url))
+		port = parts.port
+		if not port:
+			port = 443 if parts.scheme == 'https' else 80
+		path = parts.path or '/'
+		if parts.query:
+			path += '?' + parts.query
+		return (parts.scheme, parts.hostname, port), path
+
+	def _checkout(self, key, timeout):
+		now = time.monotonic()
+		with self._lock:
+			idle = self._idle.get(key)
+			while idle:
+				conn, ts = idle.pop()
+				# A closed connection reads as ready, with EOF
+				if now - ts < self._idle_timeout and not self._readable(conn):
+					conn.timeout = timeout
+					if conn.sock:
+						conn.sock.settimeout(timeout)
+					return conn, True
+				conn.close()
+		scheme, host, port = key
+		if scheme == 'https':
+			return http.client.HTTPSConnection(host, port, timeout=timeout), False
+		return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+	def _readable(self, conn):
+		if not conn.sock:
+			return False
+		try:
+			return bool(select.select([conn.sock], [], [], 0)[0])
+		except (OSError, ValueError):
+			return True
+
+	def _checkin(self, key, conn):
+		with self._lock:
+			idle = self._idle.setdefault(key, [])
+			if len(idle) < self._max_idle:
+				idle.append((conn, time.monotonic()))
+				return
+		conn.close()
+
+	def fetch(self, method, url, headers={}, body=None, timeout=5):
+		key, path = self._key(url)
+		method = method.upper()
+		start = time.monotonic()
+		while True:
+			conn, reused = self._checkout(key, timeout)
+			sent = False
+			try:
+				conn.request(method, path, body=body, headers=headers)
+				sent = True
+				response = conn.getresponse()
+				data = response.read()
+			except STALE_ERRORS:
+				conn.close()
+				# A POST the server may have read must not be sent twice
+				if reused and (not sent or method in IDEMPOTENT):
+					continue
+				raise
+			except Exception:
+				conn.close()
+				raise
+			if response.will_close:
+				conn.close()
+			else:
+				self._checkin(key, conn)
+			return Response(response.status, response.reason, data, time.monotonic() - start)
+
+	def request(self, method, url, headers={}, body=None, timeout=5):
+		return self._executor.submit(self.fetch, method, url, headers, body, timeout)
+
+	def close(self):
+		with self._lock:
+			for idle in self._idle.values():
+				for conn, ts in idle:
+					conn.close()
+			self._idle = {}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+	global _pool
+	with _pool_lock:
+		if _pool is None:
+			_pool = ConnectionPool()
+		return _pool
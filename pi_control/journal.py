@@ -0,0 +1,269 @@
+# print("Loaded pi_control journal module")
+
+import collections
+import os
+import struct
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 Append-only binary journal of input changes, output dispatches, and their results.
+
+Records are packed in the caller's thread and handed to a background writer, which appends
+them in batches and rotates the file by size. Timestamps are time.monotonic(); each file
+starts with the wall clock and monotonic time it was opened at, so records map back to wall
+time. Monotonic time restarts with the machine, so a journal that finds its file already
+there rotates it and starts a new one rather than appending under the old header. A crash
+loses at most the last flush_interval of records, and a torn tail is ignored when the
+journal is read.
+"""
+
+"""
+import pi_control.journal
+journal = pi_control.journal.Journal(path)
+panel.add_observer(journal)
+for record in pi_control.journal.read_journal(path):
+	print(record.kind, record.ts, record.fields)
+"""
+
+MAGIC = b'PIJL'
+VERSION = 1
+# Magic, version, wall time, monotonic time
+FILE_HEADER = struct.Struct('<4sBdd')
+# Kind, monotonic time, field count
+RECORD_HEADER = struct.Struct('<BdB')
+KINDS = { "status": 1, "dispatch": 2, "result": 3 }
+KIND_NAMES = { code: kind for kind, code in KINDS.items() }
+
+# Field types
+FIELD_LENGTH = struct.Struct('<H')
+FIELD_INT = struct.Struct('<q')
+FIELD_FLOAT = struct.Struct('<d')
+
+Record = collections.namedtuple('Record', ('kind', 'ts', 'wall', 'fields'))
+
+
+def pack_field(value):
+	if value is None:
+		return b'n'
+	if value is True or value is False:
+		return b'b' + (b'\x01' if value else b'\x00')
+	if type(value) is int:
+		return b'i' + FIELD_INT.pack(value)
+	if type(value) is float:
+		return b'd' + FIELD_FLOAT.pack(value)
+	data = str(value).encode('utf-8')[:65535]
+	return b's' + FIELD_LENGTH.pack(len(data)) + data
+
+
+def pack_record(kind, ts, fields):
+	return RECORD_HEADER.pack(KINDS[kind], ts, len(fields)) + b''.join(pack_field(value) for value in fields)
+
+
+def unpack_fields(data, offset, count):
+	fields = []
+	for i in range(count):
+		field_type = data[offset:offset + 1]
+		offset += 1
+		if field_type == b'n':
+			fields.append(None)
+		elif field_type == b'b':
+			fields.append(data[offset] == 1)
+			offset += 1
+		elif field_type == b'i':
+			fields.append(FIELD_INT.unpack_from(data, offset)[0])
+			offset += FIELD_INT.size
+		elif field_type == b'd':
+			fields.append(FIELD_FLOAT.unpack_from(data, offset)[0])
+			offset += FIELD_FLOAT.size
+		elif field_type == b's':
+			length = FIELD_LENGTH.unpack_from(data, offset)[0]
+			offset += FIELD_LENGTH.size
+			if offset + length > len(data):
+				raise struct.error("field runs past the end of the journal")
+			fields.append(data[offset:offset + length].decode('utf-8'))
+			offset += length
+		else:
+			raise struct.error("unknown field type {}".format(field_type))
+	return fields, offset
+
+
+"""
+for record in pi_control.journal.read_journal(path):
+	record.kind
+		'status', 'dispatch', or 'result'
+	record.ts
+		time.monotonic() in the process that wrote it
+	record.wall
+		time.time() worked out from the file header
+	record.fields
+		status: (input, status, startup, delta); older journals have no delta
+		dispatch: (id, output, action, input)
+		result: (id, output, outcome, seconds)
+"""
+def read_journal(path):
+	with open(path, 'rb') as file:
+		data = file.read()
+	if len(data) < FILE_HEADER.size:
+		raise ValueError("{} is not a journal".format(path))
+	magic, version, wall, mono = FILE_HEADER.unpack_from(data, 0)
+	if magic != MAGIC or version != VERSION:
+		raise ValueError("{} is not a version {} journal".format(path, VERSION))
+	offset = FILE_HEADER.size
+	while offset + RECORD_HEADER.size <= len(data):
+		code, ts, count = RECORD_HEADER.unpack_from(data, offset)
+		if code not in KIND_NAMES:
+			break
+		try:
+			fields, end = unpack_fields(data, offset + RECORD_HEADER.size, count)
+		except (struct.error, IndexError, UnicodeDecodeError):
+			# Torn tail from a crash mid-write
+			break
+		offset = end
+		yield Record(KIND_NAMES[code], ts, wall + (ts - mono), tuple(fields))
+
+
+"""
+paths = pi_control.journal.journal_files(path)
+	The rotated files for path, oldest first, followed by path itself
+"""
+def journal_files(path):
+	paths = []
+	index = 1
+	while os.path.exists("{}.{}".format(path, index)):
+		paths.insert(0, "{}.{}".format(path, index))
+		index += 1
+	if os.path.exists(path):
+		paths.append(path)
+	return paths
+
+
+class Journal(pi_control.log.Logger):
+	"""
+	journal = pi_control.journal.Journal(path, max_bytes=4194304, backups=3, flush_interval=0.5)
+	journal.record(kind, ts, fields)
+	journal(kind, ts, fields)
+		Same as record(), so a journal can be a panel observer
+	journal.close()
+
+	When a file reaches max_bytes, or already has records when the journal opens, it is
+	renamed to path.1, path.1 to path.2, and so on, keeping backups old files. Records are
+	dropped, and counted in dropped, if the writer falls more than max_buffer bytes behind.
+	"""
+	def __init__(self, path, max_bytes=4194304, backups=3, flush_interval=0.5, max_buffer=1048576, log_level=4):
+		self._log_level = log_level
+		if type(max_bytes) is not int or max_bytes < 1024:
+			raise ValueError("Invalid journal max_bytes {}".format(max_bytes))
+		if type(backups) is not int or backups < 0:
+			raise ValueError("Invalid journal backups {}".format(backups))
+		self._path = path
+		self._max_bytes = max_bytes
+		self._backups = backups
+		self._flush_interval = float(flush_interval)
+		self._max_buffer = max_buffer
+		self._lock = threading.Lock()
+		self._buffer = []
+		self._buffered = 0
+		self._wake = threading.Event()
+		self._stopped = False
+		self.records = 0
+		self.dropped = 0
+		self.rotations = 0
+
+		directory = os.path.dirname(os.path.abspath(path))
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		self._file = None
+		# Records after a restart need a header of their own
+		if os.path.exists(path):
+			if os.path.getsize(path) > FILE_HEADER.size:
+				self.shift_files()
+			else:
+				os.unlink(path)
+		self.open_file()
+		self._thread = threading.Thread(target=self.run, name='journal', daemon=True)
+		self._thread.start()
+
+	@property
+	def path(self):
+		return self._path
+
+	def open_file(self):
+		self._file = open(self._path, 'ab')
+		if self._file.tell() == 0:
+			self._file.write(FILE_HEADER.pack(MAGIC, VERSION, time.time(), time.monotonic()))
+			self._file.flush()
+
+	def record(self, kind, ts, fields):
+		data = pack_record(kind, ts, fields)
+		with self._lock:
+			if self._stopped or self._buffered + len(data) > self._max_buffer:
+				self.dropped += 1
+				return False
+			self._buffer.append(data)
+			self._buffered += len(data)
+			self.records += 1
+			wake = self._buffered >= 65536
+		if wake:
+			self._wake.set()
+		return True
+
+	__call__ = record
+
+	def run(self):
+		while True:
+			self._wake.wait(self._flush_interval)
+			self._wake.clear()
+			stopped = self._stopped
+			self.flush()
+			if stopped:
+				return
+
+	def flush(self):
+		with self._lock:
+			chunks = self._buffer
+			self._buffer = []
+			self._buffered = 0
+		if not chunks or not self._file:
+			return
+		data = b''.join(chunks)
+		try:
+			# Start a new file rather than let a batch run far past max_bytes
+			size = self._file.tell()
+			if size > FILE_HEADER.size and size + len(data) > self._max_bytes:
+				self.rotate()
+			self._file.write(data)
+			self._file.flush()
+			if self._file.tell() >= self._max_bytes:
+				self.rotate()
+		except OSError as err:
+			self.log("Unable to write journal {}: {}", 'error', self._path, err)
+
+	def rotate(self):
+		self._file.close()
+		self.shift_files()
+		self.rotations += 1
+		self.open_file()
+
+	def shift_files(self):
+		if self._backups:
+			for index in range(self._backups - 1, 0, -1):
+				source = "{}.{}".format(self._path, index)
+				if os.path.exists(source):
+					os.replace(source, "{}.{}".format(self._path, index + 1))
+			os.replace(self._path, self._path + '.1')
+		else:
+			os.unlink(self._path)
+
+	def close(self):
+		with self._lock:
+			if self._stopped:
+				return
+			self._stopped = True
+		self._wake.set()
+		self._thread.join()
+		if self._file:
+			self._file.close()
+			self._file = None
@@ -0,0 +1,99 @@
+# print("Loaded pi_control log module")
+
+import re
+import sys
+
+"""
+2026-10-18 Shared logging for devices and panels. Replaces the inspect.stack() walking in Device.log and Panel.log.
+
+Log levels:
+    0 - Emergency (emerg)
+    1 - Alerts (alert)
+    2 - Critical (crit)
+    3 - Errors (err)
+    4 - Warnings (warn)
+    5 - Notification (notice)
+    6 - Information (info)
+    7 - Debug (debug, start, end)
+"""
+
+"""
+import pi_control.log
+"""
+
+LEVELS = {
+	'emerg': 0,
+	'alert': 1,
+	'crit': 2,
+	'error': 3,
+	'err': 3,
+	'warn': 4,
+	'notice': 5,
+	'info': 6,
+	'debug': 7,
+	'start': 7,
+	'end': 7
+}
+
+# Functions that don't add a level of indentation to debug output
+SKIP_FUNCTIONS = ('<module>', '__init__', 'inner')
+
+# Caller prefix ("file.py:function()") per code object, built the first time a code object logs
+_callers = {}
+
+
+def convert_log_level(name):
+	return LEVELS.get(name, 7)
+
+def caller_prefix(code):
+	prefix = _callers.get(code)
+	if prefix is None:
+		filename = re.sub(r'^.*\/', '', code.co_filename)
+		prefix = "{}:{}()".format(filename, code.co_name)
+		_callers[code] = prefix
+	return prefix
+
+def frame_depth(frame):
+	cnt = 1
+	while frame is not None:
+		if frame.f_code.co_name not in SKIP_FUNCTIONS:
+			cnt += 1
+		frame = frame.f_back
+	return cnt
+
+def emit(frame, message, level, log_level, args=()):
+	if args:
+		message = message.format(*args)
+	prefix = caller_prefix(frame.f_code)
+	if log_level < 7:
+		print("  {} {}: {}".format(prefix, frame.f_lineno, message))
+		return
+	indent = '  ' * frame_depth(frame)
+	if level != 'start' and level != 'end':
+		indent = '  ' + indent
+	print("{}{} {}: {}".format(indent, prefix, frame.f_lineno, message))
+
+
+class Logger:
+	"""
+	class Device(pi_control.log.Logger):
+		...
+		self.log("{} changed to {}", 'info', name, status)
+
+	Mixin for anything with a self._log_level. The level is checked before the caller is
+	resolved or the message is formatted, so filtered calls cost a dict lookup and a compare.
+	Extra args are applied with str.format() only when the message is printed.
+	"""
+	_log_level = 4
+
+	def convert_log_level(self, name):
+		return LEVELS.get(name, 7)
+
+	def log_enabled(self, level='debug'):
+		return LEVELS.get(level, 7) <= self._log_level
+
+	def log(self, message, level='debug', *args):
+		log_level = LEVELS.get(level, 7)
+		if log_level > self._log_level:
+			return
+		emit(sys._getframe(1), message, level, log_level, args)
@@ -0,0 +1,335 @@
+# print("Loaded pi_control metrics module")
+
+import bisect
+import os
+import threading
+
+import pi_control.log
+
+"""
+2026-10-18 Runtime counters and fixed-bucket latency histograms, served in Prometheus text format.
+
+Recording is an increment or a bisect under a per-metric lock, cheap enough to leave on. Label
+values are resolved once with labels() and the child kept by the caller, so the hot path never
+builds label keys.
+"""
+
+"""
+import pi_control.metrics
+registry = pi_control.metrics.Registry()
+events = registry.counter('pi_control_input_events_total', 'Input events', ('input', 'status'))
+events.labels('switch', 'pressed').inc()
+registry.render()
+"""
+
+# Seconds; suits anything from a GPIO write to a slow HTTP call
+DEFAULT_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value):
+	return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+	pairs = ['{}="{}"'.format(name, escape(value)) for name, value in zip(names, values)]
+	if extra:
+		pairs.append(extra)
+	if not pairs:
+		return ''
+	return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+	if value == float('inf'):
+		return '+Inf'
+	if type(value) is float and value.is_integer():
+		return str(int(value))
+	return str(value)
+
+
+class Metric:
+	kind = 'untyped'
+
+	def __init__(self, name, help='', labels=()):
+		if type(name) is not str or not name:
+			raise ValueError("Invalid metric name {}".format(name))
+		self._name = name
+		self._help = help
+		self._label_names = tuple(labels)
+
+	@property
+	def name(self):
+		return self._name
+
+	def header(self):
+		lines = []
+		if self._help:
+			lines.append("# HELP {} {}".format(self._name, self._help.replace('\\', '\\\\').replace('\n', '\\n')))
+		lines.append("# TYPE {} {}".format(self._name, self.kind))
+		return lines
+
+
+class Family(Metric):
+	"""
+	A metric that records into one child per set of label values; subclasses make the child.
+	"""
+	def __init__(self, name, help='', labels=()):
+		super().__init__(name, help, labels)
+		self._children = {}
+		self._lock = threading.Lock()
+
+	"""
+	child = metric.labels(value, ...)
+	"""
+	def labels(self, *values):
+		if len(values) != len(self._label_names):
+			raise ValueError("Expected {} label values for {}".format(len(self._label_names), self._name))
+		values = tuple(str(value) for value in values)
+		child = self._children.get(values)
+		if child is None:
+			with self._lock:
+				child = self._children.get(values)
+				if child is None:
+					child = self.new_child()
+					self._children[values] = child
+		return child
+
+
+class CounterChild:
+	__slots__ = ('_lock', 'value')
+
+	def __init__(self, lock):
+		self._lock = lock
+		self.value = 0
+
+	def inc(self, amount=1):
+		with self._lock:
+			self.value += amount
+
+
+class Counter(Family):
+	"""
+	counter = registry.counter(name, help, labels=('output',))
+	counter.labels('lights').inc()
+	"""
+	kind = 'counter'
+
+	def new_child(self):
+		return CounterChild(self._lock)
+
+	def inc(self, amount=1):
+		self.labels().inc(amount)
+
+	def render(self):
+		lines = self.header()
+		for values, child in list(self._children.items()):
+			lines.append("{}{} {}".format(self._name, format_labels(self._label_names, values), format_value(child.value)))
+		return lines
+
+
+class HistogramChild:
+	__slots__ = ('_lock', '_bounds', 'counts', 'sum', 'count')
+
+	def __init__(self, lock, bounds):
+		self._lock = lock
+		self._bounds = bounds
+		self.counts = [0] * (len(bounds) + 1)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value):
+		index = bisect.bisect_left(self._bounds, value)
+		with self._lock:
+			self.counts[index] += 1
+			self.sum += value
+			self.count += 1
+
+
+class Histogram(Family):
+	"""
+	histogram = registry.histogram(name, help, labels=('output',), buckets=DEFAULT_BUCKETS)
+	histogram.labels('lights').observe(seconds)
+	"""
+	kind = 'histogram'
+
+	def __init__(self, name, help='', labels=(), buckets=DEFAULT_BUCKETS):
+		super().__init__(name, help, labels)
+		bounds = sorted(float(bound) for bound in buckets)
+		if not bounds:
+			raise ValueError("Histogram {} needs at least one bucket".format(name))
+		self._bounds = tuple(bounds)
+
+	def new_child(self):
+		return HistogramChild(self._lock, self._bounds)
+
+	def observe(self, value):
+		self.labels().observe(value)
+
+	def render(self):
+		lines = self.header()
+		for values, child in list(self._children.items()):
+			with self._lock:
+				counts = list(child.counts)
+				total = child.sum
+				count = child.count
+			cumulative = 0
+			for bound, bucket in zip(self._bounds + (float('inf'),), counts):
+				cumulative += bucket
+				lines.append("{}_bucket{} {}".format(self._name, format_labels(self._label_names, values, 'le="{}"'.format(format_value(bound))), cumulative))
+			labels = format_labels(self._label_names, values)
+			lines.append("{}_sum{} {}".format(self._name, labels, format_value(total)))
+			lines.append("{}_count{} {}".format(self._name, labels, count))
+		return lines
+
+
+class Gauge(Metric):
+	"""
+	gauge = registry.gauge(name, help, function, labels=('output',))
+
+	The function is called at scrape time and returns a number, or a dict of label value tuples
+	to numbers when the gauge has labels.
+	"""
+	kind = 'gauge'
+
+	def __init__(self, name, help='', function=None, labels=()):
+		super().__init__(name, help, labels)
+		if not callable(function):
+			raise TypeError("Gauge {} needs a function".format(name))
+		self._function = function
+
+	def render(self):
+		lines = self.header()
+		value = self._function()
+		if type(value) is dict:
+			for values, item in value.items():
+				if type(values) is not tuple:
+					values = (values,)
+				lines.append("{}{} {}".format(self._name, format_labels(self._label_names, values), format_value(item)))
+		elif value is not None:
+			lines.append("{} {}".format(self._name, format_value(value)))
+		return lines
+
+
+class Registry:
+	"""
+	registry = pi_control.metrics.Registry()
+	counter = registry.counter(name, help, labels)
+	histogram = registry.histogram(name, help, labels, buckets)
+	registry.gauge(name, help, function, labels)
+	text = registry.render()
+
+	Asking for an existing name returns the metric already registered, so each component can
+	declare the metrics it records without coordinating with the others.
+	"""
+	def __init__(self):
+		self._metrics = {}
+		self._lock = threading.Lock()
+
+	def register(self, metric_class, name, *args, **kwargs):
+		with self._lock:
+			metric = self._metrics.get(name)
+			if metric is None:
+				metric = metric_class(name, *args, **kwargs)
+				self._metrics[name] = metric
+			elif type(metric) is not metric_class:
+				raise ValueError("Metric {} is already registered as a {}".format(name, metric.kind))
+			return metric
+
+	def counter(self, name, help='', labels=()):
+		return self.register(Counter, name, help, labels)
+
+	def histogram(self, name, help='', labels=(), buckets=DEFAULT_BUCKETS):
+		return self.register(Histogram, name, help, labels, buckets)
+
+	def gauge(self, name, help='', function=None, labels=()):
+		return self.register(Gauge, name, help, function, labels)
+
+	def get(self, name):
+		return self._metrics.get(name)
+
+	def render(self):
+		lines = []
+		with self._lock:
+			metrics = list(self._metrics.values())
+		for metric in metrics:
+			lines.extend(metric.render())
+		return "\n".join(lines) + "\n"
+
+
+def make_server(registry, address, unix=False):
+	# http.server is only imported when a listener is configured
+	import http.server
+	import socketserver
+
+	class MetricsHandler(http.server.BaseHTTPRequestHandler):
+		protocol_version = 'HTTP/1.1'
+
+		def do_GET(self):
+			body = registry.render().encode()
+			self.wfile.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+		def address_string(self):
+			return str(self.client_address[0]) if self.client_address else 'unix'
+
+		def log_message(self, *args):
+			pass
+
+	if unix:
+		class UnixMetricsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+			daemon_threads = True
+		return UnixMetricsServer(address, MetricsHandler)
+	server = http.server.ThreadingHTTPServer(address, MetricsHandler)
+	server.daemon_threads = True
+	return server
+
+
+class MetricsServer(pi_control.log.Logger):
+	"""
+	server = pi_control.metrics.MetricsServer(registry, port=9105)
+	server = pi_control.metrics.MetricsServer(registry, socket='/run/control/metrics.sock')
+	server.start()
+	server.stop()
+
+	Serves registry.render() to any GET. Listens on localhost unless host is given.
+	"""
+	def __init__(self, registry, port=None, host='127.0.0.1', socket=None, log_level=4):
+		self._log_level = log_level
+		if port is None and socket is None:
+			raise ValueError("Metrics server needs a port or a socket")
+		if port is not None and (type(port) is not int or not 0 <= port < 65536):
+			raise ValueError("Invalid metrics port {}".format(port))
+		self._registry = registry
+		self._port = port
+		self._host = host
+		self._socket = socket
+		self._server = None
+		self._thread = None
+
+	@property
+	def address(self):
+		if not self._server:
+			return None
+		return self._server.server_address
+
+	def start(self):
+		if self._server:
+			return
+		if self._socket:
+			if os.path.exists(self._socket):
+				os.unlink(self._socket)
+			self._server = make_server(self._registry, self._socket, unix=True)
+		else:
+			self._server = make_server(self._registry, (self._host, self._port))
+		self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+		self._thread.start()
+		self.log("Serving metrics on {}", 'info', self.address)
+
+	def stop(self):
+		if not self._server:
+			return
+		self._server.shutdown()
+		self._server.server_close()
+		if self._socket and os.path.exists(self._socket):
+			os.unlink(self._socket)
+		self._server = None
+		self._thread = None
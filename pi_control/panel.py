@@ -1,167 +1,463 @@
 print("Loaded pi_control panel module")
 
-import inspect
+import time
+IMPORT_START = time.perf_counter()
+
+import copy
+import itertools
 import os
-import re
 import threading
-import time
-import yaml
 
 import pi_control.__init__
+import pi_control.action
+import pi_control.animation
+import pi_control.backend
+import pi_control.bus
+import pi_control.config
 import pi_control.device
+import pi_control.dispatch
+import pi_control.journal
+import pi_control.log
+import pi_control.metrics
+import pi_control.scheduler
+import pi_control.snapshot
+import pi_control.timers
+import pi_control.watch
+
+# Seconds spent importing this module and everything it pulls in
+IMPORT_TIME = time.perf_counter() - IMPORT_START
 
 """
 2022-01-01 Added option to read from a config file.
 2022-01-02 Added monitoring for devices without events.
 2022-01-08 Separated expanders, outputs, and inputs in the config.
 2023-03-29 Improved logging.
+2026-10-18 Moved logging to pi_control.log.
+2026-10-18 Replaced monitor_devices with a per-device polling scheduler.
+2026-10-18 take_action() queues actions on a worker pool and returns a future.
+2026-10-18 Actions are compiled into a plan per input at startup.
+2026-10-18 Added backend option for running on simulated hardware.
+2026-10-18 Added runtime metrics with an optional Prometheus text endpoint.
+2026-10-18 Device drivers load on demand; added a startup time report.
+2026-10-18 Added shared bus handles with batched writes.
+2026-10-18 Added reload() to rebuild only changed devices, on config file changes or SIGHUP.
+2026-10-18 Config files load through a hash-keyed compiled cache.
+2026-10-18 Inputs share one monotonic timer wheel for debounce re-checks.
+2026-10-18 Device state is kept in a snapshot file; on start, inputs that haven't moved are restored without init actions.
+2026-10-18 Added observers of input changes and action results, and an optional event journal.
+2026-10-18 stop() cancels pending debounce re-checks before shutting down the dispatcher.
+2026-10-18 Panels in a pi_control.host.Host share its dispatch workers, poll scheduler, and buses.
+2026-10-18 Added fire_output() and an optional local control API.
+2026-10-18 stop() releases the panel's references to shared buses instead of closing every bus on its backend.
+2026-10-18 Status events carry the encoder step delta, and encoder events are counted by direction.
 
 To do:
-  Separate actions into class
-  Should take_action() run in a thread?
 """
 
 """
 import pi_control.panel
 """
 
-class Panel:
+# Seconds to gather state changes before writing the snapshot
+SNAPSHOT_DELAY = 0.1
+
+class Panel(pi_control.log.Logger):
 	"""
-	panel = pi_control.panel.Panel(name, config_filename || devices_dict)
+	panel = pi_control.panel.Panel(name, config_filename || devices_dict, backend='hardware' || 'simulated' || backend, host=None)
+		Given a pi_control.host.Host, the panel runs its actions on the host's workers and polls
+		from the host's scheduler. stop() releases the panel's buses, which close once no other
+		panel in the process holds them.
 	"""
-	def __init__(self, panel_name, devices={}, dry_run=False, log_level=4):
+	def __init__(self, panel_name, devices={}, dry_run=False, log_level=4, backend=None, host=None):
 		self._dry_run = dry_run
 		self._log_level = log_level
+		self._host = host
+		
+		init_start = time.perf_counter()
+		drivers_before = dict(pi_control.device.driver_import_times)
+		self._startup_times = { "import": IMPORT_TIME, "config": 0.0, "config_cached": False, "drivers": 0.0, "expanders": 0.0, "outputs": 0.0, "inputs": 0.0, "devices": {} }
 		
 		self._name = str(panel_name)
+		config_path = None
 		if type(devices) is str:
+			config_path = devices
+			start = time.perf_counter()
 			devices = self.read_conf(devices)
+			self._startup_times['config'] = time.perf_counter() - start
 		if type(devices) is not dict:
 			raise TypeError("Invalid devices dictionary")
 		
+		# Panel settings
+		settings = {}
+		if 'panel' in devices:
+			if type(devices['panel']) is not dict:
+				raise TypeError("Invalid panel settings in {}".format(self._name))
+			settings = devices['panel']
+		
+		# Backend from the argument, then the config, then real hardware
+		if backend is None:
+			backend = settings.get('backend', 'hardware')
+		self._backend = pi_control.backend.get_backend(backend, log_level=self._log_level)
+		
 		self._polling_interval = 2.5
+		if 'polling_interval' in settings:
+			self._polling_interval = float(settings['polling_interval'])
+		if host:
+			self._scheduler = host.scheduler
+		else:
+			self._scheduler = pi_control.scheduler.PollScheduler(self._name + '-poll', log_level=self._log_level)
+		
+		# Metrics are always recorded; the listener only runs when configured
+		self._metrics = pi_control.metrics.Registry()
+		self._events = self._metrics.counter('pi_control_input_events_total', 'Input status changes that fired actions', ('input', 'status'))
+		# { (input, status): counter child }, filled as statuses are first seen
+		self._event_counters = {}
+		self._metrics_server = None
+		if 'metrics' in settings:
+			metrics_settings = settings['metrics']
+			if type(metrics_settings) is not dict:
+				raise TypeError("Invalid metrics settings in {}".format(self._name))
+			self._metrics_server = pi_control.metrics.MetricsServer(
+				self._metrics,
+				port=metrics_settings.get('port'),
+				host=metrics_settings.get('host', '127.0.0.1'),
+				socket=metrics_settings.get('socket'),
+				log_level=self._log_level
+			)
+		
+		# Local clients can stream events and fire outputs and inputs
+		self._api_server = None
+		if 'api' in settings:
+			self._api_server = self.make_api_server(settings['api'])
+		
+		# Observers see every input change, dispatch, and result
+		self._observers = ()
+		self._action_ids = itertools.count(1)
+		self._journal = None
+		if settings.get('journal'):
+			journal_settings = settings['journal']
+			if type(journal_settings) is str:
+				journal_settings = { "path": journal_settings }
+			if type(journal_settings) is not dict or type(journal_settings.get('path')) is not str:
+				raise TypeError("Invalid journal settings in {}".format(self._name))
+			options = { key: journal_settings[key] for key in ('max_bytes', 'backups', 'flush_interval') if key in journal_settings }
+			self._journal = pi_control.journal.Journal(journal_settings['path'], log_level=self._log_level, **options)
+			self.add_observer(self._journal)
+		
+		workers = 4
+		if 'workers' in settings:
+			workers = int(settings['workers'])
+		queue_size = 32
+		if 'queue_size' in settings:
+			queue_size = int(settings['queue_size'])
+		executor = None
+		if host:
+			workers = host.workers
+			executor = host.executor
+		self._dispatcher = pi_control.dispatch.Dispatcher(workers, queue_size, metrics=self._metrics, observer=self.action_done, executor=executor, log_level=self._log_level)
+		
+		self._audio_settings = {}
+		if 'audio' in settings:
+			if type(settings['audio']) is not dict:
+				raise TypeError("Invalid audio settings in {}".format(self._name))
+			self._audio_settings = settings['audio']
+		elif self._backend.name == 'simulated':
+			self._audio_settings = { "sink": "null" }
+		self._audio = None
+		
+		self._bus_tick = pi_control.bus.DEFAULT_TICK
+		if 'bus_tick' in settings:
+			self._bus_tick = float(settings['bus_tick'])
+		self._buses = {}
+		
+		self._animation_fps = pi_control.animation.FPS
+		if 'animation_fps' in settings:
+			self._animation_fps = int(settings['animation_fps'])
+		self._animator = None
 		
 		if self._log_level >= 6:
 			print("devices:", devices)
 		self._expanders = {}
 		self._outputs = {}
 		self._inputs = {}
+		self._plans = {}
+		self._starting = True
+		self._reload_lock = threading.Lock()
+		self._config_path = config_path
+		self._config = copy.deepcopy(devices)
+		
+		# State from the last run, beside the config file unless set
+		self._snapshot = None
+		self._snapshot_timer = None
+		self._snapshot_lock = threading.Lock()
+		self._restore = {}
+		self._restored = []
+		snapshot_path = None
+		if config_path:
+			snapshot_path = pi_control.snapshot.path_for(config_path)
+		if 'snapshot' in settings:
+			if settings['snapshot'] is not False and type(settings['snapshot']) is not str:
+				raise TypeError("Invalid snapshot setting in {}".format(self._name))
+			snapshot_path = settings['snapshot']
+		if snapshot_path:
+			try:
+				self._snapshot = pi_control.snapshot.Snapshot(snapshot_path, log_level=self._log_level)
+				self._restore = self._snapshot.read() or {}
+			except (OSError, ValueError) as err:
+				self.log("Unable to open snapshot {}: {}", 'warn', snapshot_path, err)
 		
 		# Init expanders
-		if 'expanders' in devices:
-			for name, device_info in devices['expanders'].items():
-				if 'type' not in device_info or type(device_info['type']) is not str:
-					raise AttributeError("Expander {} is missing a valid type".format(name))
-				device_info['panel'] = self
-				
-				self._expanders[name] = pi_control.device.ExpanderDevice(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
+		for name, device_info in (devices.get('expanders') or {}).items():
+			self.add_expander(name, device_info)
 		
 		# Fill source_devices and init outputs
-		if 'outputs' in devices:
-			for name, device_info in devices['outputs'].items():
-				if 'type' not in device_info or type(device_info['type']) is not str:
-					raise AttributeError("Output {} is missing a valid type".format(name))
-				device_info['panel'] = self
-				
-				if 'source_device' in device_info:
-					if device_info['source_device'] not in self._expanders:
-						raise AttributeError("Source device {} for {} not found".format(device_info['source_device'], name))
-					if not self._expanders[device_info['source_device']]._chip:
-						raise AttributeError("Source device {} for {} must be an expander device".format(device_info['source_device'], name))
-					device_info['source_device'] = self._expanders[device_info['source_device']]
-				
-				if device_info['type'] == 'led':
-					self._outputs[name] = pi_control.device.LED(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'haptic':
-					self._outputs[name] = pi_control.device.Haptic(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'http':
-					self._outputs[name] = pi_control.device.HTTP(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'message':
-					self._outputs[name] = pi_control.device.Message(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'sound':
-					self._outputs[name] = pi_control.device.Sound(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				else:
-					raise ValueError("Device type {} not found".format(device_info['type']))
+		for name, device_info in (devices.get('outputs') or {}).items():
+			self.add_output(name, device_info)
 		
 		# Fill actions and init inputs
-		needs_monitoring = False
-		if 'inputs' in devices:
-			for name, device_info in devices['inputs'].items():
-				if 'type' not in device_info or type(device_info['type']) is not str:
-					raise AttributeError("Input {} is missing a valid type".format(name))
-				device_info['panel'] = self
-				
-				if 'source_device' in device_info:
-					if device_info['source_device'] not in self._expanders:
-						raise AttributeError("Source device {} for {} not found".format(device_info['source_device'], name))
-					if not self._expanders[device_info['source_device']]._chip:
-						raise AttributeError("Source device {} for {} must be an expander device".format(device_info['source_device'], name))
-					device_info['source_device'] = self._expanders[device_info['source_device']]
-				
-				# Process actions
-				device = None
-				if device_info['type'] == 'button':
-					device = pi_control.device.Button(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'potentiometer':
-					device = pi_control.device.Potentiometer(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'rotary_encoder':
-					device = pi_control.device.RotaryEncoder(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				elif device_info['type'] == 'selector_switch':
-					device = pi_control.device.SelectorSwitch(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
-				else:
-					raise ValueError("Device type {} not found".format(device_info['type']))
-				
-				if device._needs_monitoring:
-					needs_monitoring = True
-				if pi_control.is_method(device, 'update_status'):
-					device.update_status(True)
-				self._inputs[name] = device
-		
-		# Set monitoring thread
-		if needs_monitoring:
-			if self._log_level >= 6:
-				print("Starting monitoring")
-			self._monitor_stop = False
-			self._monitor_thread = threading.Thread(target=self.monitor_devices, args=(lambda : self._monitor_stop, ))
-			self._monitor_thread.start()
-
-	def convert_log_level(self, name):
-		if name in ['debug', 'start', 'end']:
-			return 7
-		elif name == 'info':
-			return 6
-		elif name == 'notice':
-			return 5
-		elif name == 'warn':
-			return 4
-		elif name == 'error':
-			return 3
-		elif name == 'crit':
-			return 2
-		elif name == 'alert':
-			return 1
-		elif name == 'emerg':
-			return 0
-	
-	def log(self, message, level='debug'):
-		log_level = self.convert_log_level(level)
-		if log_level > self._log_level:
+		for name, device_info in (devices.get('inputs') or {}).items():
+			self.add_input(name, device_info)
+		
+		# Start polling devices without events
+		if len(self._scheduler):
+			self.log("Starting monitoring", 'info')
+			self._scheduler.start()
+		
+		if self._metrics_server:
+			self._metrics_server.start()
+		if self._api_server:
+			self._api_server.start()
+		
+		# Reload when the config file changes
+		self._watcher = None
+		if self._config_path and settings.get('watch_config', True):
+			self._watcher = pi_control.watch.FileWatcher(self._config_path, self.reload, log_level=self._log_level)
+			self._watcher.start()
+		
+		self._starting = False
+		self._restore = {}
+		if self._restored:
+			self.log("Restored {} from the snapshot", 'info', ", ".join(self._restored))
+		self.save_snapshot()
+		for module_name, seconds in pi_control.device.driver_import_times.items():
+			if module_name not in drivers_before:
+				self._startup_times['drivers'] += seconds
+		self._startup_times['total'] = time.perf_counter() - init_start
+		# The report sorts every device, so only build it when it will be printed
+		if self.log_enabled('notice'):
+			self.log(self.startup_report(), 'notice')
+	
+	def get_source_device(self, name, device_info):
+		if device_info['source_device'] not in self._expanders:
+			raise AttributeError("Source device {} for {} not found".format(device_info['source_device'], name))
+		if not self._expanders[device_info['source_device']]._chip:
+			raise AttributeError("Source device {} for {} must be an expander device".format(device_info['source_device'], name))
+		return self._expanders[device_info['source_device']]
+	
+	"""
+	expander = panel.add_expander(name, device_info)
+	output = panel.add_output(name, device_info)
+	input = panel.add_input(name, device_info)
+		device_info is the device's section of control.yml. It isn't modified.
+	"""
+	def add_expander(self, name, device_info):
+		if 'type' not in device_info or type(device_info['type']) is not str:
+			raise AttributeError("Expander {} is missing a valid type".format(name))
+		device_info = dict(device_info, panel=self)
+		
+		start = time.perf_counter()
+		self._expanders[name] = pi_control.device.ExpanderDevice(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
+		self.startup_time('expanders', name, start)
+		return self._expanders[name]
+	
+	def add_output(self, name, device_info):
+		if 'type' not in device_info or type(device_info['type']) is not str:
+			raise AttributeError("Output {} is missing a valid type".format(name))
+		device_info = dict(device_info, panel=self)
+		if 'source_device' in device_info:
+			device_info['source_device'] = self.get_source_device(name, device_info)
+		
+		saved = self.get_restore('outputs', name)
+		driver = pi_control.device.get_driver('output', device_info['type'])
+		start = time.perf_counter()
+		device = driver(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
+		if saved:
+			device.restore(saved)
+		self._outputs[name] = device
+		self.startup_time('outputs', name, start)
+		return device
+	
+	def add_input(self, name, device_info):
+		if 'type' not in device_info or type(device_info['type']) is not str:
+			raise AttributeError("Input {} is missing a valid type".format(name))
+		device_info = dict(device_info, panel=self)
+		if 'source_device' in device_info:
+			device_info['source_device'] = self.get_source_device(name, device_info)
+		
+		# Process actions
+		saved = self.get_restore('inputs', name)
+		driver = pi_control.device.get_driver('input', device_info['type'])
+		start = time.perf_counter()
+		device = driver(name, device_info, dry_run=self._dry_run, log_level=self._log_level)
+		
+		self._plans[name] = pi_control.action.compile_plan(device, self._outputs)
+		if pi_control.is_method(device, 'update_status'):
+			# Init actions only fire for inputs that moved while the daemon was down
+			if saved and saved.get('status') is not None and device.current_status() == saved['status']:
+				device.restore(saved)
+				self._restored.append(name)
+			else:
+				device.update_status(True)
+			if device._needs_monitoring:
+				self._scheduler.add(device, device.poll_interval or self._polling_interval)
+		self._inputs[name] = device
+		self.startup_time('inputs', name, start)
+		return device
+	
+	"""
+	info = panel.get_restore(section, name)
+		The device's state from the snapshot, if the panel is starting and the device's
+		config section hasn't changed since it was saved.
+	"""
+	def get_restore(self, section, name):
+		if not self._starting:
+			return None
+		saved = (self._restore.get(section) or {}).get(name)
+		if type(saved) is not dict:
+			return None
+		device_info = (self._config.get(section) or {}).get(name)
+		if saved.get('config') != pi_control.snapshot.config_hash(device_info):
+			return None
+		return saved
+	
+	"""
+	panel.snapshot_changed()
+	panel.save_snapshot()
+		State changes are gathered for SNAPSHOT_DELAY seconds, then written in one go.
+	"""
+	def snapshot_changed(self):
+		if not self._snapshot or self._starting:
 			return
-		cnt = 0
-		for i in range(len(inspect.stack())):
-			function = inspect.stack()[i].function
-			if function not in ('<module>', '__init__', 'inner'):
-				cnt += 1
-		indent = '  ' * cnt
-		if level not in ['start', 'end']:
-			indent = '  ' + indent
-		function = inspect.stack()[1].function
-		filename = re.sub(r'^.*\/', '', inspect.stack()[1].filename)
-		line = inspect.stack()[1].lineno
-		if log_level < 7:
-			print("  {}:{}() {}: {}".format(filename, function, line, message))
-		else:
-			print("{}{}:{}() {}: {}".format(indent, filename, function, line, message))
+		with self._snapshot_lock:
+			if self._snapshot_timer is None:
+				self._snapshot_timer = self.timers.call_later(SNAPSHOT_DELAY, self.save_snapshot)
+	
+	def save_snapshot(self):
+		with self._snapshot_lock:
+			self._snapshot_timer = None
+			if not self._snapshot:
+				return None
+			data = { "panel": self._name, "ts": time.time() }
+			for section, group in (('outputs', self._outputs), ('inputs', self._inputs)):
+				config = self._config.get(section) or {}
+				data[section] = {}
+				for name, device in list(group.items()):
+					info = device.snapshot()
+					info['config'] = pi_control.snapshot.config_hash(config.get(name))
+					data[section][name] = info
+			try:
+				return self._snapshot.write(data)
+			except (OSError, ValueError) as err:
+				self.log("Unable to write snapshot {}: {}", 'error', self._snapshot.path, err)
+				return None
+	
+	@property
+	def snapshot(self):
+		return self._snapshot
+	
+	"""
+	changes = panel.reload()
+	changes = panel.reload(devices_dict)
+		Re-reads the config file, or uses devices_dict, and rebuilds only the devices whose
+		sections changed. Untouched devices keep their pins, state, and running effects. A device
+		is also rebuilt when its source_device is, and inputs recompile their actions when an
+		output they use is rebuilt. Returns { "expanders": [names], "outputs": [names], "inputs": [names] }
+		of the devices rebuilt, added, or removed, or None if the config couldn't be loaded.
+	"""
+	def reload(self, devices=None):
+		with self._reload_lock:
+			try:
+				if devices is None:
+					if not self._config_path:
+						raise ValueError("Panel {} has no config file to reload".format(self._name))
+					devices = self.read_conf(self._config_path)
+				if type(devices) is not dict:
+					raise TypeError("Invalid devices dictionary")
+			except Exception as err:
+				self.log("Reload failed, keeping the running config: {}", 'error', err)
+				return None
+			
+			old = self._config
+			if devices.get('panel') != old.get('panel'):
+				self.log("Panel settings changed; restart to apply them", 'warn')
+			
+			changes = {}
+			for section in ('expanders', 'outputs', 'inputs'):
+				old_section = old.get(section) or {}
+				new_section = devices.get(section) or {}
+				changes[section] = set(name for name in set(old_section) | set(new_section) if old_section.get(name) != new_section.get(name))
+			
+			# Devices on a rebuilt expander are rebuilt with it
+			for section in ('outputs', 'inputs'):
+				for name, device_info in (devices.get(section) or {}).items():
+					if type(device_info) is dict and device_info.get('source_device') in changes['expanders']:
+						changes[section].add(name)
+			
+			# Inputs that act on a rebuilt output recompile their plans
+			recompile = set()
+			for name, device_info in (devices.get('inputs') or {}).items():
+				if name in changes['inputs'] or type(device_info) is not dict:
+					continue
+				for action_list in (device_info.get('actions') or {}).values():
+					if any(type(action) is dict and action.get('name') in changes['outputs'] for action in action_list or []):
+						recompile.add(name)
+						break
+			
+			if not any(changes.values()):
+				self.log("Reloaded {}, nothing changed", 'info', self._name)
+				self._config = copy.deepcopy(devices)
+				return { section: [] for section in changes }
+			
+			# Tear down in dependency order, then rebuild the other way round
+			for section, group in (('inputs', self._inputs), ('outputs', self._outputs), ('expanders', self._expanders)):
+				for name in changes[section]:
+					device = group.pop(name, None)
+					if section == 'inputs':
+						self._plans.pop(name, None)
+					if device:
+						device.close()
+			
+			for section, add in (('expanders', self.add_expander), ('outputs', self.add_output)):
+				for name in changes[section]:
+					if name in (devices.get(section) or {}):
+						try:
+							add(name, devices[section][name])
+						except Exception as err:
+							self.log("Unable to rebuild {} {}: {}", 'error', section[:-1], name, err)
+			
+			plans = dict(self._plans)
+			for name in recompile:
+				try:
+					plans[name] = pi_control.action.compile_plan(self._inputs[name], self._outputs)
+				except Exception as err:
+					self.log("Unable to recompile actions for {}: {}", 'error', name, err)
+					plans.pop(name, None)
+			self._plans = plans
+			
+			for name in changes['inputs']:
+				if name in (devices.get('inputs') or {}):
+					try:
+						self.add_input(name, devices['inputs'][name])
+					except Exception as err:
+						self.log("Unable to rebuild input {}: {}", 'error', name, err)
+			
+			if len(self._scheduler):
+				self._scheduler.start()
+			
+			self._config = copy.deepcopy(devices)
+			changes = { section: sorted(names) for section, names in changes.items() }
+			self.log("Reloaded {}: {}", 'notice', self._name, changes)
+			return changes
 	
 	@property
 	def name(self):
@@ -194,55 +490,234 @@ class Panel:
 			return self.inputs[device_name]
 		return None
 	
-	def take_action(self, input_device, action_name, startup=False):
+	def get_plan(self, device_name):
+		if device_name in self._plans:
+			return self._plans[device_name]
+		return None
+	
+	"""
+	future = panel.take_action(input_device, action_name, startup=False, delta=None)
+	results = future.result()
+	
+	Actions are queued per output and run on the dispatcher's workers, so this returns as soon as
+	they are queued. The future resolves to a list with each action's result or exception.
+	delta is the net steps for inputs like rotary encoders, whose statuses can be positions.
+	"""
+	def take_action(self, input_device, action_name, startup=False, delta=None):
 		self.log(input_device.name, 'start')
-		actions = input_device.get_actions(action_name)
-		cnt = 0
-		for action in actions:
-			if 'name' not in action:
-				raise KeyError("Name is required in action {} in action for {}.{}".format(cnt, device_name, action_name))
-			cnt += 1
-			
-			# On init, skip non-init actions
-			if startup and ('init' not in action or not action['init']):
-				continue
-			
-			# Defined actions
-			if 'name' in action:
-				if action['name'] not in self._outputs:
-					raise ValueError("Output {} in action for {}.{} not found".format(action['name'], device_name, action_name))
-# 				self.log("  action()")
-				device = self._outputs[action['name']]
-				if pi_control.is_method(device, 'action'):
-					device.action(action)
+		futures = []
+		plan = self._plans.get(input_device.name)
+		# Steps are counted by direction, so positions don't each become a metric label
+		label = action_name
+		if delta is not None:
+			label = 'up' if delta > 0 else 'down'
+		key = (input_device.name, label)
+		counter = self._event_counters.get(key)
+		if counter is None:
+			counter = self._event_counters[key] = self._events.labels(input_device.name, label)
+		counter.inc()
+		observed = bool(self._observers)
+		if observed:
+			self.notify('status', input_device.name, action_name, startup, delta)
+		if plan:
+			for action in plan.get(action_name, startup):
+				tag = None
+				if observed:
+					tag = next(self._action_ids)
+					self.notify('dispatch', tag, action.name, action.params.get('action'), input_device.name)
+				futures.append(self._dispatcher.submit(action, tag))
 		self.log(input_device.name, 'end')
+		group = self._dispatcher.gather(futures)
+		# Once for the input's new status, again when its outputs have run
+		self.snapshot_changed()
+		group.add_done_callback(lambda future: self.snapshot_changed())
+		return group
 	
-	# Main monitoring loop
-	def monitor_devices(self, stop_function=lambda:True):
-		while 42:
-			for name, device in self._inputs.items():
-				if not device._needs_monitoring:
-					continue
-				if pi_control.is_method(device, 'update_status'):
-					device.update_status()
-# 					action_key = device.monitor()
-# 					if action_key:
-# 						device.change_status(action_key)
-				if stop_function():
-					break
-			if stop_function():
-				return
-			time.sleep(self._polling_interval)
-		return True
+	def make_api_server(self, api_settings):
+		# asyncio only loads for panels that use the API
+		import pi_control.api
+		if type(api_settings) is not dict:
+			raise TypeError("Invalid api settings in {}".format(self._name))
+		for key in api_settings:
+			if key not in pi_control.api.SETTINGS:
+				raise ValueError("Unknown api setting {} in {}".format(key, self._name))
+		return pi_control.api.ApiServer({ self._name: self }, metrics=self._metrics, log_level=self._log_level, **api_settings)
+	
+	"""
+	future = panel.fire_output(output_name, action_info)
+		Runs one action on an output outside any input's plan, as the control API does.
+		action_info holds what an action in an input's list would, without the name. The
+		future resolves to the action's result, or raises if it failed or wasn't queued.
+	"""
+	def fire_output(self, output_name, action_info={}):
+		output = self._outputs.get(output_name)
+		if output is None:
+			raise ValueError("Output {} not found".format(output_name))
+		if type(action_info) is not dict:
+			raise TypeError("Invalid action for {}".format(output_name))
+		if type(action_info.get('dedupe', False)) is not bool:
+			raise TypeError("dedupe in action for {} must be type bool".format(output_name))
+		params = output.prepare(dict(action_info, name=output_name))
+		action = pi_control.action.Action(output, params, dedupe=action_info.get('dedupe'))
+		tag = None
+		if self._observers:
+			tag = next(self._action_ids)
+			self.notify('dispatch', tag, output_name, params.get('action'), None)
+		future = self._dispatcher.submit(action, tag)
+		future.add_done_callback(lambda future: self.snapshot_changed())
+		return future
+	
+	"""
+	panel.add_observer(observer)
+	panel.remove_observer(observer)
+		observer(kind, ts, fields) is called with time.monotonic() as ts and:
+			'status', (input, status, startup, delta) when an input changes; delta is the
+				net steps for a rotary encoder, and None for other inputs
+			'dispatch', (id, output, action, input) for each action queued; input is None
+				for fire_output()
+			'result', (id, output, outcome, seconds) when that action ends
+		Observers run on the thread that caused the event and must not block.
+	"""
+	def add_observer(self, observer):
+		if not callable(observer):
+			raise TypeError("Invalid observer {}".format(observer))
+		self._observers = self._observers + (observer,)
+	
+	def remove_observer(self, observer):
+		self._observers = tuple(item for item in self._observers if item is not observer)
+	
+	def notify(self, kind, *fields):
+		ts = time.monotonic()
+		for observer in self._observers:
+			try:
+				observer(kind, ts, fields)
+			except Exception as err:
+				self.log("Observer {} failed: {}", 'error', observer, err)
+	
+	def action_done(self, action, tag, outcome, seconds):
+		if tag is not None and self._observers:
+			self.notify('result', tag, action.name, outcome, seconds)
+	
+	@property
+	def journal(self):
+		return self._journal
+	
+	@property
+	def api_server(self):
+		return self._api_server
+	
+	@property
+	def scheduler(self):
+		return self._scheduler
+	
+	@property
+	def host(self):
+		return self._host
+	
+	@property
+	def backend(self):
+		return self._backend
+	
+	@property
+	def audio(self):
+		if not self._audio:
+			import pi_control.audio
+			self._audio = pi_control.audio.get_engine(self._audio_settings, log_level=self._log_level)
+		return self._audio
+	
+	@property
+	def animator(self):
+		if not self._animator:
+			self._animator = pi_control.animation.get_animator(self._animation_fps, log_level=self._log_level)
+		return self._animator
+	
+	@property
+	def dispatcher(self):
+		return self._dispatcher
+	
+	@property
+	def timers(self):
+		return pi_control.timers.get_wheel(log_level=self._log_level)
+	
+	def get_bus(self, bus_name):
+		# One reference per bus for the panel, released when it stops
+		if bus_name not in self._buses:
+			self._buses[bus_name] = pi_control.bus.get_bus(self._backend, bus_name, tick=self._bus_tick, log_level=self._log_level)
+		return self._buses[bus_name]
+	
+	@property
+	def metrics(self):
+		return self._metrics
+	
+	def startup_time(self, kind, name, start):
+		if not self._starting:
+			return
+		seconds = time.perf_counter() - start
+		self._startup_times[kind] += seconds
+		self._startup_times['devices'][name] = seconds
+	
+	"""
+	panel.startup_times
+		{ "import": seconds, "config": seconds, "config_cached": bool, "drivers": seconds, "expanders": seconds, "outputs": seconds, "inputs": seconds, "total": seconds, "devices": { name: seconds } }
+		total covers Panel() itself; import is the import of pi_control.panel, and drivers is the
+		part of device init spent importing driver modules.
+	"""
+	@property
+	def startup_times(self):
+		return self._startup_times
+	
+	def startup_report(self):
+		times = self._startup_times
+		report = "Startup {:.3f}s: import {:.3f}s, config {:.3f}s{}, drivers {:.3f}s, expanders {:.3f}s, outputs {:.3f}s, inputs {:.3f}s".format(
+			times['import'] + times['total'], times['import'], times['config'], ' (cached)' if times['config_cached'] else '', times['drivers'], times['expanders'], times['outputs'], times['inputs']
+		)
+		slowest = sorted(times['devices'].items(), key=lambda item: item[1], reverse=True)[:3]
+		if slowest:
+			report += "; slowest " + ", ".join("{} {:.3f}s".format(name, seconds) for name, seconds in slowest)
+		return report
+	
+	def stop(self):
+		if self._watcher:
+			self._watcher.stop()
+		# Clients can't fire anything once the dispatcher is shutting down
+		if self._api_server:
+			self._api_server.stop()
+		if self._host:
+			for device in list(self._inputs.values()):
+				self._scheduler.remove(device)
+		else:
+			self._scheduler.stop()
+		# Debounce re-checks would act on a stopped dispatcher
+		for device in list(self._inputs.values()):
+			device.cancel_update_timer()
+		self._dispatcher.shutdown()
+		if self._snapshot:
+			with self._snapshot_lock:
+				if self._snapshot_timer:
+					self._snapshot_timer.cancel()
+			self.save_snapshot()
+			self._snapshot.close()
+			self._snapshot = None
+		if self._journal:
+			self.remove_observer(self._journal)
+			self._journal.close()
+			self._journal = None
+		# Other panels in this process may still be using the same buses
+		for bus in self._buses.values():
+			pi_control.bus.release_bus(bus)
+		self._buses = {}
+		if self._metrics_server:
+			self._metrics_server.stop()
 	
 	def read_conf(self, path):
 		if os.path.exists(path):
-			with open(path) as file:
-				data = yaml.load(file, Loader=yaml.FullLoader)
-				if not len(data):
-					self.log("Config file is empty.", 'error')
-					raise ValueError;
-				return data
+			try:
+				data, cached = pi_control.config.load_config(path, log_level=self._log_level)
+			except (AttributeError, TypeError, ValueError) as err:
+				self.log("Invalid config file {}: {}", 'error', path, err)
+				raise
+			self._startup_times['config_cached'] = cached
+			return data
 		else:
 			self.log("Config file not found at '{}'".format(path), 'error')
 			raise FileNotFoundError;
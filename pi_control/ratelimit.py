@@ -0,0 +1,93 @@
+# print("Loaded pi_control ratelimit module")
+
+import time
+
+"""
+2026-10-18 Per-output cooldown and token-bucket limits, applied by the dispatcher before an
+action is queued.
+
+An output's delay is a cooldown, i.e. one action per delay seconds. rate_limit and burst give
+a token bucket instead. When no token is left the output's policy decides:
+	drop - the action is suppressed
+	defer - the action waits and runs when the window ends, in order
+	latest - only the newest waiting action runs when the window ends; older ones are suppressed
+"""
+
+"""
+import pi_control.ratelimit
+limiter = pi_control.ratelimit.RateLimiter(rate=0.2, burst=1, policy='latest')
+"""
+
+POLICIES = ['drop', 'defer', 'latest']
+
+
+class RateLimited(Exception):
+	pass
+
+
+class RateLimiter:
+	"""
+	limiter = pi_control.ratelimit.RateLimiter(rate, burst=1, policy='latest')
+	limiter = pi_control.ratelimit.RateLimiter.cooldown(delay, policy='latest')
+	wait = limiter.take()
+		0 when a token was taken, otherwise seconds until the next one
+	"""
+	def __init__(self, rate, burst=1, policy='latest'):
+		if type(rate) is int:
+			rate = float(rate)
+		if type(rate) is not float or rate <= 0:
+			raise ValueError("Invalid rate {}".format(rate))
+		if type(burst) is not int or burst < 1:
+			raise ValueError("Invalid burst {}".format(burst))
+		if policy not in POLICIES:
+			raise ValueError("Invalid rate limit policy {}".format(policy))
+		self._rate = rate
+		self._burst = burst
+		self._policy = policy
+		self._tokens = float(burst)
+		self._updated = time.monotonic()
+		self.suppressed = 0
+		self.deferred = 0
+
+	@classmethod
+	def cooldown(cls, delay, policy='latest'):
+		if type(delay) is not int and type(delay) is not float or delay <= 0:
+			raise ValueError("Invalid delay {}".format(delay))
+		return cls(1.0 / delay, 1, policy)
+
+	@property
+	def rate(self):
+		return self._rate
+
+	@property
+	def burst(self):
+		return self._burst
+
+	@property
+	def policy(self):
+		return self._policy
+
+	def refill(self, now):
+		if now > self._updated:
+			self._tokens = min(float(self._burst), self._tokens + (now - self._updated) * self._rate)
+			self._updated = now
+
+	def wait_time(self, now=None):
+		if now is None:
+			now = time.monotonic()
+		self.refill(now)
+		if self._tokens >= 1.0:
+			return 0.0
+		return (1.0 - self._tokens) / self._rate
+
+	def take(self, now=None):
+		if now is None:
+			now = time.monotonic()
+		self.refill(now)
+		if self._tokens >= 1.0:
+			self._tokens -= 1.0
+			return 0.0
+		return (1.0 - self._tokens) / self._rate
+
+	def __repr__(self):
+		return "<RateLimiter {:.3g}/s burst {} {}>".format(self._rate, self._burst, self._policy)
@@ -0,0 +1,129 @@
+# print("Loaded pi_control scheduler module")
+
+import heapq
+import itertools
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 Heap-based polling scheduler with a per-device interval. Replaces Panel.monitor_devices.
+"""
+
+"""
+import pi_control.scheduler
+"""
+
+class PollScheduler(pi_control.log.Logger):
+	"""
+	scheduler = pi_control.scheduler.PollScheduler()
+	scheduler.add(device, interval)
+	scheduler.start()
+	scheduler.stop()
+
+	Devices are kept in a heap ordered by their next due time, so only due devices are visited and
+	the thread sleeps until the earliest one. A slow read only delays devices due during that read.
+	stop() wakes the thread immediately.
+	"""
+	def __init__(self, name='poll', log_level=4):
+		self._name = str(name)
+		self._log_level = log_level
+		self._heap = []
+		self._entries = {}
+		self._counter = itertools.count()
+		self._condition = threading.Condition()
+		self._stopped = False
+		self._thread = None
+
+	@property
+	def name(self):
+		return self._name
+
+	@property
+	def running(self):
+		return self._thread is not None and self._thread.is_alive()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def add(self, device, interval, delay=None):
+		if type(interval) is int or type(interval) is str:
+			interval = float(interval)
+		if type(interval) is not float:
+			raise TypeError("Invalid poll interval type for {}".format(device.name))
+		if interval <= 0:
+			raise ValueError("Invalid poll interval for {}".format(device.name))
+		if delay is None:
+			delay = interval
+		with self._condition:
+			self._remove(device)
+			entry = [time.monotonic() + delay, next(self._counter), interval, device, True]
+			self._entries[device] = entry
+			heapq.heappush(self._heap, entry)
+			self._condition.notify()
+
+	def remove(self, device):
+		with self._condition:
+			self._remove(device)
+
+	def _remove(self, device):
+		entry = self._entries.pop(device, None)
+		if entry:
+			entry[4] = False
+
+	def start(self):
+		if self.running:
+			return
+		with self._condition:
+			self._stopped = False
+		self._thread = threading.Thread(target=self.run, name=self._name, daemon=True)
+		self._thread.start()
+
+	def stop(self, timeout=None):
+		with self._condition:
+			self._stopped = True
+			self._condition.notify_all()
+		if self._thread and self._thread is not threading.current_thread():
+			self._thread.join(timeout)
+		self._thread = None
+
+	def next_due(self):
+		with self._condition:
+			while True:
+				if self._stopped:
+					return None
+				if not self._heap:
+					self._condition.wait()
+					continue
+				entry = self._heap[0]
+				if not entry[4]:
+					heapq.heappop(self._heap)
+					continue
+				wait = entry[0] - time.monotonic()
+				if wait <= 0:
+					return heapq.heappop(self._heap)
+				self._condition.wait(wait)
+
+	def run(self):
+		while True:
+			entry = self.next_due()
+			if not entry:
+				return True
+			due, seq, interval, device, active = entry
+			try:
+				device.update_status()
+			except Exception as err:
+				self.log("{} poll failed: {}", 'error', device.name, err)
+
+			# Keep the cadence, but don't try to catch up on missed ticks
+			now = time.monotonic()
+			due += interval
+			if due < now:
+				due = now + interval
+			with self._condition:
+				if not entry[4] or self._entries.get(device) is not entry:
+					continue
+				entry[0] = due
+				entry[1] = next(self._counter)
+				heapq.heappush(self._heap, entry)
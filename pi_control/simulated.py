@@ -0,0 +1,356 @@
+# print("Loaded pi_control simulated module")
+
+import collections
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 In-memory hardware for running a full Panel off the Pi.
+
+Simulated pins follow the gpiozero attributes the devices use. Inputs are driven by
+injecting edges, directly or from a script, ADC channels hold virtual values, and every
+output write is recorded with a perf_counter() timestamp.
+"""
+
+"""
+import pi_control.simulated
+backend = pi_control.simulated.SimulatedBackend()
+panel = pi_control.panel.Panel(name, config, backend=backend)
+backend.press(17)
+backend.writes
+"""
+
+class SimButton:
+	"""
+	gpiozero.Button stand-in. when_held fires hold_time after a press, or right away when
+	hold_time is 0.
+	"""
+	def __init__(self, backend, pin, pull_up=True, hold_time=1.0):
+		self._backend = backend
+		self.pin = pin
+		self.pull_up = pull_up
+		self.hold_time = hold_time
+		self.is_pressed = False
+		self.when_pressed = None
+		self.when_released = None
+		self.when_held = None
+		self._hold_timer = None
+
+	def press(self):
+		if self.is_pressed:
+			return False
+		self.is_pressed = True
+		if self.when_pressed:
+			self.when_pressed()
+		if self.when_held:
+			if self.hold_time:
+				self._hold_timer = threading.Timer(self.hold_time, self.held)
+				self._hold_timer.daemon = True
+				self._hold_timer.start()
+			else:
+				self.when_held()
+		return True
+
+	def held(self):
+		self._hold_timer = None
+		if self.is_pressed and self.when_held:
+			self.when_held()
+
+	def release(self):
+		if not self.is_pressed:
+			return False
+		if self._hold_timer:
+			self._hold_timer.cancel()
+			self._hold_timer = None
+		self.is_pressed = False
+		if self.when_released:
+			self.when_released()
+		return True
+
+	def close(self):
+		if self._hold_timer:
+			self._hold_timer.cancel()
+
+
+class SimPWMLED:
+	def __init__(self, backend, pin):
+		self._backend = backend
+		self.pin = pin
+		self._value = 0.0
+
+	@property
+	def value(self):
+		return self._value
+
+	@value.setter
+	def value(self, value):
+		self._value = value
+		self._backend.record('gpio', self.pin, value)
+
+	def close(self):
+		pass
+
+
+class SimRotaryEncoder:
+	def __init__(self, backend, pin_a, pin_b):
+		self._backend = backend
+		self.pin = pin_a
+		self.pins = (pin_a, pin_b)
+		self.steps = 0
+		self.when_rotated_clockwise = None
+		self.when_rotated_counter_clockwise = None
+
+	def rotate(self, steps=1):
+		for i in range(abs(steps)):
+			if steps > 0:
+				self.steps += 1
+				if self.when_rotated_clockwise:
+					self.when_rotated_clockwise()
+			else:
+				self.steps -= 1
+				if self.when_rotated_counter_clockwise:
+					self.when_rotated_counter_clockwise()
+
+	def close(self):
+		pass
+
+
+class SimSPI:
+	"""
+	spidev.SpiDev stand-in that answers MCP300x and MCP320x conversion requests from
+	virtual channel values between 0.0 and 1.0.
+	"""
+	def __init__(self, backend, port=0, device=0):
+		self._backend = backend
+		self.port = port
+		self.device = device
+		self.values = collections.defaultdict(float)
+		self.transfers = 0
+
+	def xfer2(self, request):
+		self.transfers += 1
+		if request[0] == 0x01:
+			channel = (request[1] >> 4) & 0x07
+			raw = int(round(min(max(self.values[channel], 0.0), 1.0) * 1023))
+			return [0, (raw >> 8) & 0x03, raw & 0xFF]
+		channel = ((request[0] & 0x01) << 2) | (request[1] >> 6)
+		raw = int(round(min(max(self.values[channel], 0.0), 1.0) * 4095))
+		return [0, (raw >> 8) & 0x0F, raw & 0xFF]
+
+	def close(self):
+		pass
+
+
+class SimADC:
+	def __init__(self, spi, channel):
+		self._spi = spi
+		self.channel = channel
+
+	@property
+	def value(self):
+		self._spi.transfers += 1
+		return self._spi.values[self.channel]
+
+	def close(self):
+		pass
+
+
+class SimI2C:
+	def __init__(self, backend):
+		self._backend = backend
+		self.lock = threading.Lock()
+
+	def try_lock(self):
+		return self.lock.acquire(False)
+
+	def unlock(self):
+		self.lock.release()
+
+	def deinit(self):
+		pass
+
+
+class SimEffect:
+	def __init__(self, effect):
+		self.id = effect
+
+
+class SimDRV2605:
+	def __init__(self, backend, i2c):
+		self._backend = backend
+		self._i2c = i2c
+		self.sequence = [None] * 8
+		self.motor = 'erm'
+
+	def use_LRM(self):
+		self.motor = 'lra'
+
+	def use_ERM(self):
+		self.motor = 'erm'
+
+	def play(self):
+		effect = self.sequence[0]
+		self._backend.record('drv2605', self.motor, effect.id if effect else None)
+
+	def stop(self):
+		pass
+
+
+class SimSNS:
+	def __init__(self, backend):
+		self._backend = backend
+		self._count = 0
+
+	def set_sms_attributes(self, attributes={}):
+		return {}
+
+	def publish(self, TopicArn=None, Message=None, MessageStructure=None):
+		self._count += 1
+		self._backend.record('sns', TopicArn, Message)
+		return { "MessageId": "sim-{}".format(self._count), "ResponseMetadata": { "HTTPStatusCode": 200 } }
+
+
+class SimulatedBackend(pi_control.log.Logger):
+	"""
+	backend = pi_control.simulated.SimulatedBackend()
+	backend.press(pin), backend.release(pin), backend.rotate(pin_a, steps)
+	backend.set_adc(channel, value, port=0, device=0)
+	backend.run_script([(delay, 'press', 17), (0.5, 'release', 17), ...])
+	backend.add_listener(function)
+	backend.writes
+	"""
+	name = 'simulated'
+
+	def __init__(self, max_writes=100000, log_level=4):
+		self._log_level = log_level
+		self._lock = threading.Lock()
+		self._buttons = {}
+		self._encoders = {}
+		self._leds = {}
+		self._spis = {}
+		self._i2c = None
+		self._listeners = []
+		self.writes = collections.deque(maxlen=max_writes)
+
+	"""
+	Devices
+	"""
+	def button(self, pin, pull_up=True, hold_time=None):
+		if hold_time is None:
+			hold_time = 1.0
+		button = SimButton(self, pin, pull_up, hold_time)
+		self._buttons[pin] = button
+		return button
+
+	def pwm_led(self, pin):
+		led = SimPWMLED(self, pin)
+		self._leds[pin] = led
+		return led
+
+	def rotary_encoder(self, pin_a, pin_b):
+		encoder = SimRotaryEncoder(self, pin_a, pin_b)
+		self._encoders[pin_a] = encoder
+		return encoder
+
+	def spi(self, port=0, device=0, speed=1000000):
+		key = (port, device)
+		if key not in self._spis:
+			self._spis[key] = SimSPI(self, port, device)
+		return self._spis[key]
+
+	def adc(self, chip, channel, port=0, device=0):
+		return SimADC(self.spi(port, device), channel)
+
+	def i2c(self):
+		if not self._i2c:
+			self._i2c = SimI2C(self)
+		return self._i2c
+
+	def drv2605(self, i2c):
+		return SimDRV2605(self, i2c)
+
+	def haptic_effect(self, effect):
+		return SimEffect(effect)
+
+	def sns(self):
+		return SimSNS(self)
+
+	def close(self):
+		for button in self._buttons.values():
+			button.close()
+
+	"""
+	Recording
+	"""
+	def record(self, kind, target, value):
+		entry = (time.perf_counter(), kind, target, value)
+		self.writes.append(entry)
+		for listener in self._listeners:
+			listener(entry)
+
+	def add_listener(self, listener):
+		with self._lock:
+			self._listeners = self._listeners + [listener]
+
+	def remove_listener(self, listener):
+		with self._lock:
+			self._listeners = [item for item in self._listeners if item is not listener]
+
+	def clear(self):
+		self.writes.clear()
+
+	def led_value(self, pin):
+		return self._leds[pin].value
+
+	"""
+	Injection
+	"""
+	def get_button(self, pin):
+		if pin not in self._buttons:
+			raise KeyError("No simulated button on GPIO {}".format(pin))
+		return self._buttons[pin]
+
+	def press(self, pin):
+		return self.get_button(pin).press()
+
+	def release(self, pin):
+		return self.get_button(pin).release()
+
+	def rotate(self, pin, steps=1):
+		if pin not in self._encoders:
+			raise KeyError("No simulated rotary encoder on GPIO {}".format(pin))
+		self._encoders[pin].rotate(steps)
+
+	def set_adc(self, channel, value, port=0, device=0):
+		self.spi(port, device).values[channel] = float(value)
+
+	"""
+	backend.run_script(steps, wait=True)
+		steps: [(delay, 'press' || 'release', pin), (delay, 'rotate', pin, steps), (delay, 'adc', channel, value), ...]
+		Each delay is seconds after the previous step.
+	"""
+	def run_script(self, steps, wait=True):
+		if not wait:
+			thread = threading.Thread(target=self.run_script, args=(steps, True), name='sim-script', daemon=True)
+			thread.start()
+			return thread
+		next_ts = time.monotonic()
+		for step in steps:
+			delay, action = step[0], step[1]
+			next_ts += delay
+			pause = next_ts - time.monotonic()
+			if pause > 0:
+				time.sleep(pause)
+			if action == 'press':
+				self.press(step[2])
+			elif action == 'release':
+				self.release(step[2])
+			elif action == 'rotate':
+				self.rotate(step[2], step[3] if len(step) > 3 else 1)
+			elif action == 'adc':
+				self.set_adc(step[2], step[3])
+			else:
+				raise ValueError("Invalid script action {}".format(action))
+		return True
@@ -0,0 +1,176 @@
+# print("Loaded pi_control snapshot module")
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+import pi_control.log
+
+"""
+2026-10-18 Live input and output state in a small memory-mapped file, for warm restarts.
+
+The file holds two slots after a short header, and each write goes to the slot not holding
+the latest snapshot, with a sequence number and CRC. A write torn by a crash only spoils its
+own slot, so the previous snapshot still loads. Writes land in the page cache, which survives
+a daemon restart; close() also flushes them to disk.
+"""
+
+"""
+import pi_control.snapshot
+snapshot = pi_control.snapshot.Snapshot(path)
+data = snapshot.read()
+snapshot.write(data)
+"""
+
+MAGIC = b'PISS'
+# Magic, version, slot size
+HEADER = struct.Struct('<4sII')
+# Sequence, payload length, payload CRC-32
+SLOT = struct.Struct('<QII')
+VERSION = 1
+SLOT_SIZE = 16384
+
+
+def path_for(config_path):
+	directory, name = os.path.split(os.path.abspath(config_path))
+	return os.path.join(directory, '.' + name + '.state')
+
+
+"""
+key = pi_control.snapshot.config_hash(device_info)
+	Short hash of a device's config section, so state is only restored onto a device
+	configured the same way.
+"""
+def config_hash(device_info):
+	payload = json.dumps(device_info, sort_keys=True, default=str)
+	return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class Snapshot(pi_control.log.Logger):
+	"""
+	snapshot = pi_control.snapshot.Snapshot(path, slot_size=16384)
+	data = snapshot.read()
+		The latest complete snapshot, or None
+	snapshot.write(data)
+		data must be JSON serializable. The file grows if data doesn't fit.
+	snapshot.close()
+	"""
+	def __init__(self, path, slot_size=SLOT_SIZE, log_level=4):
+		self._log_level = log_level
+		if type(slot_size) is not int or slot_size <= SLOT.size:
+			raise ValueError("Invalid snapshot slot size {}".format(slot_size))
+		self._path = path
+		self._lock = threading.Lock()
+		self._file = None
+		self._map = None
+		self._slot_size = slot_size
+		self._sequence = 0
+		self._current = None
+		self.open()
+
+	@property
+	def path(self):
+		return self._path
+
+	@property
+	def sequence(self):
+		return self._sequence
+
+	def open(self):
+		fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+		self._file = os.fdopen(fd, 'r+b')
+		size = os.fstat(fd).st_size
+		slot_size = None
+		if size >= HEADER.size:
+			magic, version, slot_size = HEADER.unpack(self._file.read(HEADER.size))
+			if magic != MAGIC or version != VERSION or size != HEADER.size + 2 * slot_size:
+				slot_size = None
+		if slot_size is None:
+			self.log("Starting a new snapshot at {}", 'info', self._path)
+			self.resize(self._slot_size)
+		else:
+			self._slot_size = slot_size
+			self._map = mmap.mmap(fd, size)
+		self.latest()
+
+	def resize(self, slot_size):
+		if self._map is not None:
+			self._map.close()
+		self._file.seek(0)
+		self._file.truncate(HEADER.size + 2 * slot_size)
+		self._file.write(HEADER.pack(MAGIC, VERSION, slot_size))
+		self._file.flush()
+		self._slot_size = slot_size
+		self._map = mmap.mmap(self._file.fileno(), HEADER.size + 2 * slot_size)
+
+	def slot_offset(self, index):
+		return HEADER.size + index * self._slot_size
+
+	def read_slot(self, index):
+		offset = self.slot_offset(index)
+		sequence, length, crc = SLOT.unpack_from(self._map, offset)
+		if not sequence or length > self._slot_size - SLOT.size:
+			return None
+		payload = self._map[offset + SLOT.size:offset + SLOT.size + length]
+		if zlib.crc32(payload) != crc:
+			return None
+		return sequence, payload
+
+	def latest(self):
+		best = None
+		for index in (0, 1):
+			slot = self.read_slot(index)
+			if slot and (best is None or slot[0] > best[1][0]):
+				best = (index, slot)
+		# The next write goes to the other slot, so a torn one is overwritten first
+		self._current = best
+		self._sequence = best[1][0] if best else 0
+		return best
+
+	def read(self):
+		with self._lock:
+			best = self.latest()
+		if best is None:
+			return None
+		try:
+			return json.loads(best[1][1].decode('utf-8'))
+		except ValueError as err:
+			self.log("Ignoring unreadable snapshot {}: {}", 'warn', self._path, err)
+			return None
+
+	def write(self, data):
+		payload = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+		with self._lock:
+			if self._map is None:
+				raise ValueError("Snapshot {} is closed".format(self._path))
+			if SLOT.size + len(payload) > self._slot_size:
+				slot_size = self._slot_size
+				while SLOT.size + len(payload) > slot_size:
+					slot_size *= 2
+				# Both slots move, so the new file starts from this snapshot
+				self.resize(slot_size)
+				self._current = None
+			index = 0 if self._current is None or self._current[0] == 1 else 1
+			sequence = self._sequence + 1
+			offset = self.slot_offset(index)
+			# Clear the header first so a torn write never looks complete
+			SLOT.pack_into(self._map, offset, 0, 0, 0)
+			self._map[offset + SLOT.size:offset + SLOT.size + len(payload)] = payload
+			SLOT.pack_into(self._map, offset, sequence, len(payload), zlib.crc32(payload))
+			self._sequence = sequence
+			self._current = (index, (sequence, payload))
+		return sequence
+
+	def close(self):
+		with self._lock:
+			if self._map is not None:
+				self._map.flush()
+				self._map.close()
+				self._map = None
+			if self._file is not None:
+				self._file.close()
+				self._file = None
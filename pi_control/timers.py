@@ -0,0 +1,191 @@
+# print("Loaded pi_control timers module")
+
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 One monotonic timer wheel shared by every input for debounce re-checks.
+
+Replaces a threading.Timer, and so a new thread, per accepted status change. Timers hash into
+slots by due tick, so arming and cancelling are O(1) and a chattering contact only re-arms an
+entry. The wheel's thread sleeps until the next occupied slot, or indefinitely when no timers
+are armed. time.monotonic() is used throughout, so NTP steps at boot don't move due times.
+"""
+
+"""
+import pi_control.timers
+wheel = pi_control.timers.get_wheel()
+timer = wheel.call_later(0.5, function, *args)
+timer.cancel()
+"""
+
+# Seconds per slot; timers fire up to one tick late, never early
+TICK = 0.005
+SLOTS = 256
+
+
+class Timer:
+	"""
+	timer = wheel.call_later(delay, function, *args)
+	timer.cancel()
+	timer.active
+	"""
+	__slots__ = ('due', 'tick', 'function', 'args', 'cancelled', 'fired')
+
+	def __init__(self, due, tick, function, args):
+		self.due = due
+		self.tick = tick
+		self.function = function
+		self.args = args
+		self.cancelled = False
+		self.fired = False
+
+	@property
+	def active(self):
+		return not self.cancelled and not self.fired
+
+	def cancel(self):
+		self.cancelled = True
+
+
+class TimerWheel(pi_control.log.Logger):
+	"""
+	wheel = pi_control.timers.TimerWheel(tick=0.005, slots=256)
+	timer = wheel.call_later(delay, function, *args)
+	wheel.stop()
+
+	Callbacks run on the wheel's thread, one at a time, so they should hand slow work off.
+	"""
+	def __init__(self, tick=TICK, slots=SLOTS, name='timers', log_level=4):
+		self._log_level = log_level
+		if type(tick) is not int and type(tick) is not float or tick <= 0:
+			raise ValueError("Invalid timer tick {}".format(tick))
+		if type(slots) is not int or slots < 1:
+			raise ValueError("Invalid timer slots {}".format(slots))
+		self._name = name
+		self._tick = float(tick)
+		self._slots = [[] for i in range(slots)]
+		self._origin = time.monotonic()
+		self._current = 0
+		self._armed = 0
+		self._condition = threading.Condition()
+		self._stopped = False
+		self._thread = None
+
+	@property
+	def tick(self):
+		return self._tick
+
+	def __len__(self):
+		return self._armed
+
+	def now_tick(self, now=None):
+		if now is None:
+			now = time.monotonic()
+		return int((now - self._origin) / self._tick)
+
+	def call_later(self, delay, function, *args):
+		if type(delay) is int:
+			delay = float(delay)
+		if type(delay) is not float:
+			raise TypeError("Invalid timer delay type {}".format(type(delay)))
+		due = time.monotonic() + max(delay, 0.0)
+		# Round up so a timer never fires before its delay is over
+		tick = -int(-(due - self._origin) // self._tick)
+		with self._condition:
+			if tick <= self._current:
+				tick = self._current + 1
+			timer = Timer(due, tick, function, args)
+			self._slots[tick % len(self._slots)].append(timer)
+			self._armed += 1
+			if not self._thread:
+				self.start()
+			self._condition.notify()
+		return timer
+
+	def start(self):
+		with self._condition:
+			if self._thread:
+				return
+			self._stopped = False
+			self._thread = threading.Thread(target=self.run, name=self._name, daemon=True)
+			self._thread.start()
+
+	def stop(self):
+		with self._condition:
+			self._stopped = True
+			self._condition.notify()
+			thread = self._thread
+		if thread and thread is not threading.current_thread():
+			thread.join()
+		with self._condition:
+			self._thread = None
+
+	def next_tick(self):
+		# First occupied slot after the current one; its timers may be for a later lap
+		count = len(self._slots)
+		for offset in range(1, count + 1):
+			slot = self._slots[(self._current + offset) % count]
+			for timer in slot:
+				if not timer.cancelled:
+					return self._current + offset
+		return None
+
+	def expire(self, until):
+		due = []
+		count = len(self._slots)
+		while self._current < until:
+			self._current += 1
+			index = self._current % count
+			slot = self._slots[index]
+			if not slot:
+				continue
+			keep = []
+			for timer in slot:
+				if timer.cancelled:
+					self._armed -= 1
+				elif timer.tick <= self._current:
+					self._armed -= 1
+					due.append(timer)
+				else:
+					keep.append(timer)
+			self._slots[index] = keep
+			# A long stall only needs one lap to see every slot
+			if until - self._current >= count:
+				self._current = until - count
+		return due
+
+	def run(self):
+		while True:
+			with self._condition:
+				if self._stopped:
+					return
+				due = self.expire(self.now_tick())
+				if not due:
+					target = self.next_tick() if self._armed else None
+					if target is None:
+						self._condition.wait()
+					else:
+						self._condition.wait(max(self._origin + target * self._tick - time.monotonic(), 0.0))
+					continue
+			for timer in due:
+				if timer.cancelled:
+					continue
+				timer.fired = True
+				try:
+					timer.function(*timer.args)
+				except Exception as err:
+					self.log("Timer {} failed: {}", 'error', timer.function, err)
+
+
+_wheel = None
+_wheel_lock = threading.Lock()
+
+def get_wheel(log_level=4):
+	global _wheel
+	with _wheel_lock:
+		if _wheel is None:
+			_wheel = TimerWheel(log_level=log_level)
+		return _wheel
@@ -0,0 +1,159 @@
+# print("Loaded pi_control watch module")
+
+import os
+import select
+import struct
+import threading
+import time
+
+import pi_control.log
+
+"""
+2026-10-18 Calls back when a file is rewritten. Uses inotify on Linux and falls back to polling
+the file's mtime elsewhere.
+
+The file's directory is watched rather than the file, so editors that save by writing a temp
+file and renaming it over the original are still seen.
+"""
+
+"""
+import pi_control.watch
+watcher = pi_control.watch.FileWatcher(path, callback)
+watcher.start()
+"""
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def inotify_watch(directory, mask):
+	import ctypes
+	import ctypes.util
+	libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+	fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+	if fd < 0:
+		raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+	if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+		errno = ctypes.get_errno()
+		os.close(fd)
+		raise OSError(errno, "inotify_add_watch failed for {}".format(directory))
+	return fd
+
+
+def event_names(data):
+	offset = 0
+	while offset + EVENT_HEADER.size <= len(data):
+		wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+		offset += EVENT_HEADER.size
+		yield data[offset:offset + length].rstrip(b'\0')
+		offset += length
+
+
+class FileWatcher(pi_control.log.Logger):
+	"""
+	watcher = pi_control.watch.FileWatcher(path, callback, delay=0.25, interval=1.0)
+	watcher.start()
+	watcher.stop()
+
+	callback() runs on the watcher's thread once the file has been quiet for delay seconds.
+	interval is how often the file is checked when inotify isn't available.
+	"""
+	def __init__(self, path, callback, delay=0.25, interval=1.0, log_level=4):
+		self._log_level = log_level
+		if not callable(callback):
+			raise TypeError("Invalid callback for watcher on {}".format(path))
+		self._path = os.path.abspath(path)
+		self._name = os.path.basename(self._path)
+		self._callback = callback
+		self._delay = delay
+		self._interval = interval
+		self._fd = None
+		self._thread = None
+		self._stopped = threading.Event()
+
+	@property
+	def path(self):
+		return self._path
+
+	@property
+	def method(self):
+		if not self._thread:
+			return None
+		return 'inotify' if self._fd is not None else 'poll'
+
+	def start(self):
+		if self._thread:
+			return
+		self._stopped.clear()
+		try:
+			self._fd = inotify_watch(os.path.dirname(self._path), IN_CLOSE_WRITE | IN_MOVED_TO)
+			target = self.run_inotify
+		except (OSError, AttributeError) as err:
+			self.log("inotify unavailable, polling {}: {}", 'info', self._path, err)
+			self._fd = None
+			target = self.run_poll
+		self._thread = threading.Thread(target=target, name='watch-' + self._name, daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stopped.set()
+		if self._thread and self._thread is not threading.current_thread():
+			self._thread.join()
+		self._thread = None
+		if self._fd is not None:
+			os.close(self._fd)
+			self._fd = None
+
+	def fire(self):
+		if not os.path.exists(self._path):
+			return
+		try:
+			self._callback()
+		except Exception as err:
+			self.log("Callback for {} failed: {}", 'error', self._path, err)
+
+	def read_events(self, timeout):
+		ready, _, _ = select.select([self._fd], [], [], timeout)
+		if not ready:
+			return False
+		changed = False
+		while True:
+			try:
+				data = os.read(self._fd, 4096)
+			except BlockingIOError:
+				break
+			if not data:
+				break
+			for name in event_names(data):
+				if os.fsdecode(name) == self._name:
+					changed = True
+		return changed
+
+	def run_inotify(self):
+		while not self._stopped.is_set():
+			if not self.read_events(0.5):
+				continue
+			# Let a burst of writes settle before reloading
+			while self.read_events(self._delay):
+				pass
+			if not self._stopped.is_set():
+				self.fire()
+
+	def signature(self):
+		try:
+			stat = os.stat(self._path)
+		except OSError:
+			return None
+		return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+	def run_poll(self):
+		last = self.signature()
+		while not self._stopped.wait(self._interval):
+			current = self.signature()
+			if current != last:
+				time.sleep(self._delay)
+				last = self.signature()
+				self.fire()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+
+"""
+Replays an event journal into a panel on simulated hardware.
+
+  ./replay.py [options] /var/log/control/events.journal
+
+Input changes from the journal are fed to a Panel built from the config, at their recorded
+pace or faster, and the actions they fire are compared with the ones in the journal. The
+panel runs with dry_run, so HTTP and SNS outputs log instead of sending, and its snapshot,
+journal, metrics listener, and control API are off.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pi_control.config
+import pi_control.journal
+import pi_control.panel
+import pi_control.ui
+
+ui = pi_control.ui.Interface(log_level=4, usage_message = """
+Usage:
+  ./replay.py [options] journal
+
+  Options:
+    -c,  --config         Panel config; defaults to /opt/control/control.yml
+    -x,  --speed          1 replays in real time, 10 ten times faster, 0 as fast as possible; defaults to 1
+    -a,  --all            Also replay the journal's rotated files, oldest first
+    -o,  --output         Also write the JSON results to this file
+    -h,  --help           This help text
+    -v,  --verbose        Print extra output.
+""")
+
+
+class Recorder:
+	"""
+	Panel observer that times each replayed action from its input change to its result.
+	"""
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._dispatched = {}
+		self._pending = 0
+		self._done = threading.Condition(self._lock)
+		self.outcomes = {}
+		self.run_seconds = {}
+		self.latency = {}
+		self.status_ts = None
+
+	def __call__(self, kind, ts, fields):
+		with self._lock:
+			if kind == 'status':
+				self.status_ts = ts
+			elif kind == 'dispatch':
+				self._dispatched[fields[0]] = self.status_ts if self.status_ts is not None else ts
+				self._pending += 1
+			elif kind == 'result':
+				action_id, output, outcome, seconds = fields
+				count_outcome(self.outcomes, output, outcome)
+				if outcome in ('ok', 'failed'):
+					self.run_seconds.setdefault(output, []).append(seconds)
+					start = self._dispatched.pop(action_id, None)
+					if start is not None:
+						self.latency.setdefault(output, []).append(ts - start)
+				else:
+					self._dispatched.pop(action_id, None)
+				self._pending -= 1
+				if self._pending <= 0:
+					self._done.notify_all()
+
+	def wait(self, timeout):
+		with self._lock:
+			return self._done.wait_for(lambda: self._pending <= 0, timeout)
+
+
+def count_outcome(outcomes, output, outcome):
+	counts = outcomes.setdefault(output, {})
+	counts[outcome] = counts.get(outcome, 0) + 1
+
+
+def summarize(values):
+	values = sorted(values)
+	if not values:
+		return { "count": 0 }
+	return {
+		"count": len(values),
+		"p50_ms": values[len(values) // 2] * 1000,
+		"p99_ms": values[min(len(values) - 1, int(len(values) * .99))] * 1000,
+		"max_ms": values[-1] * 1000
+	}
+
+
+def load_devices(config_path):
+	devices, cached = pi_control.config.load_config(config_path, cache_path=False)
+	settings = dict(devices.get('panel') or {})
+	settings['snapshot'] = False
+	settings['journal'] = False
+	settings.pop('metrics', None)
+	settings.pop('api', None)
+	settings.pop('backend', None)
+	devices['panel'] = settings
+	return devices
+
+
+def replay(config_path, paths, speed=1.0, log_level=4):
+	panel = pi_control.panel.Panel('replay', load_devices(config_path), dry_run=True, log_level=log_level, backend='simulated')
+	# Injected statuses are the only input; don't let polling read the simulated pins
+	panel.scheduler.stop()
+	recorder = Recorder()
+	panel.add_observer(recorder)
+
+	recorded = {}
+	recorded_seconds = {}
+	missing = {}
+	events = 0
+	late = []
+	first_wall = None
+	start = time.monotonic()
+	for path in paths:
+		for record in pi_control.journal.read_journal(path):
+			if record.kind == 'dispatch':
+				continue
+			if record.kind == 'result':
+				action_id, output, outcome, seconds = record.fields
+				count_outcome(recorded, output, outcome)
+				if outcome in ('ok', 'failed'):
+					recorded_seconds.setdefault(output, []).append(seconds)
+				continue
+
+			input_name, status, startup = record.fields[:3]
+			delta = record.fields[3] if len(record.fields) > 3 else None
+			device = panel.get_input(input_name)
+			if device is None:
+				missing[input_name] = missing.get(input_name, 0) + 1
+				continue
+			if first_wall is None:
+				first_wall = record.wall
+			if speed:
+				due = start + (record.wall - first_wall) / speed
+				delay = due - time.monotonic()
+				if delay > 0:
+					time.sleep(delay)
+				else:
+					late.append(-delay)
+			device.inject(status, startup, delta)
+			events += 1
+
+	injected = time.monotonic() - start
+	settled = recorder.wait(30.0)
+	elapsed = time.monotonic() - start
+	panel.stop()
+
+	outputs = sorted(set(recorded) | set(recorder.outcomes))
+	return {
+		"replay": [os.path.relpath(path) for path in paths],
+		"config": config_path,
+		"speed": speed,
+		"events": events,
+		"missing_inputs": missing,
+		"inject_seconds": injected,
+		"seconds": elapsed,
+		"settled": settled,
+		"late_ms": summarize(late),
+		"outputs": {
+			output: {
+				"recorded": recorded.get(output, {}),
+				"replayed": recorder.outcomes.get(output, {}),
+				"recorded_run": summarize(recorded_seconds.get(output, [])),
+				"replayed_run": summarize(recorder.run_seconds.get(output, [])),
+				"latency": summarize(recorder.latency.get(output, []))
+			} for output in outputs
+		}
+	}
+
+
+def main():
+	args, opts = ui.get_options({
+		"options": [ {
+			"short": "c",
+			"long": "config",
+			"type": "input"
+		}, {
+			"short": "x",
+			"long": "speed",
+			"type": "input"
+		}, {
+			"short": "a",
+			"long": "all"
+		}, {
+			"short": "o",
+			"long": "output",
+			"type": "input"
+		}, {
+			"short": "v",
+			"long": "verbose"
+		} ],
+		"args": [ {
+			"name": "journal",
+			"required": True,
+			"type": "file"
+		} ]
+	})
+
+	config_path = opts['config'] or '/opt/control/control.yml'
+	speed = float(opts['speed'] or 1.0)
+	if speed < 0:
+		ui.error("speed must be 0 or more")
+		sys.exit(2)
+	log_level = 5 if opts['verbose'] else 3
+
+	paths = [args['journal']]
+	if opts['all']:
+		paths = pi_control.journal.journal_files(args['journal'])
+
+	results = replay(config_path, paths, speed, log_level)
+
+	print("{} events in {:.3f}s{}".format(results['events'], results['seconds'], "" if results['settled'] else ", some actions never finished"))
+	if results['missing_inputs']:
+		print("inputs not in the config: {}".format(", ".join(sorted(results['missing_inputs']))))
+	print("{:<16} {:>24} {:>24} {:>9} {:>9}".format('output', 'recorded', 'replayed', 'p50_ms', 'p99_ms'))
+	for output, stats in results['outputs'].items():
+		recorded = " ".join("{}={}".format(key, value) for key, value in sorted(stats['recorded'].items()))
+		replayed = " ".join("{}={}".format(key, value) for key, value in sorted(stats['replayed'].items()))
+		latency = stats['latency']
+		if latency['count']:
+			print("{:<16} {:>24} {:>24} {:>9.3f} {:>9.3f}".format(output, recorded, replayed, latency['p50_ms'], latency['p99_ms']))
+		else:
+			print("{:<16} {:>24} {:>24} {:>9} {:>9}".format(output, recorded, replayed, '-', '-'))
+
+	if opts['output']:
+		with open(opts['output'], 'w') as file:
+			json.dump(results, file, indent=2)
+			file.write("\n")
+
+
+main()